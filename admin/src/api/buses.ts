@@ -1,10 +1,9 @@
-import { api } from './client';
+import { api, listAll } from './client';
 
 export type Bus = { id:number; bus_number:string; route_id:number|null; is_active:boolean; current_latitude?:number|null; current_longitude?:number|null };
 
 export async function listBuses(): Promise<Bus[]> {
-  const res = await api.get('/authority/buses/all');
-  return res.data;
+  return listAll<Bus>('/authority/buses/all');
 }
 
 export async function createBus(input: { bus_number: string; route_id?: number | null }): Promise<Bus> {
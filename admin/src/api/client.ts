@@ -44,3 +44,15 @@ api.interceptors.response.use(
 );
 
 
+
+// List endpoints return pages (100 items by default); follow X-Next-Cursor until the last page
+export async function listAll<T>(url: string, params: Record<string, unknown> = {}): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const res = await api.get(url, { params: { ...params, limit: 500, cursor } });
+    items.push(...res.data);
+    cursor = res.headers['x-next-cursor'] || undefined;
+  } while (cursor);
+  return items;
+}
@@ -1,4 +1,4 @@
-import { api } from './client';
+import { api, listAll } from './client';
 
 export type Driver = {
   id: number;
@@ -19,12 +19,8 @@ export type DriverRouteAssignment = {
 };
 
 export async function listDrivers(): Promise<Driver[]> {
-  // Get all users and filter for drivers
-  const res = await api.get('/authority/users');
-  const users = res.data;
-  
-  // Filter for drivers and get their route assignments
-  const drivers = users.filter((user: any) => user.role === 'driver');
+  // Get all drivers (every page) and their route assignments
+  const drivers = await listAll<any>('/authority/users', { role: 'driver' });
   
   // For each driver, get their assigned routes
   const driversWithRoutes = await Promise.all(
@@ -59,8 +55,8 @@ export async function listDrivers(): Promise<Driver[]> {
 
 export async function getDriver(driverId: number): Promise<Driver> {
   // Get user info
-  const usersRes = await api.get('/authority/users');
-  const driver = usersRes.data.find((user: any) => user.id === driverId && user.role === 'driver');
+  const drivers = await listAll<any>('/authority/users', { role: 'driver' });
+  const driver = drivers.find((user: any) => user.id === driverId);
   
   if (!driver) {
     throw new Error('Driver not found');
@@ -113,8 +109,8 @@ export async function getDriverAssignedRoutes(driverId: number): Promise<{ route
   const routeIds = await getDriverRoutes(driverId);
   
   // Get all routes and filter for assigned ones
-  const allRoutesRes = await api.get('/authority/routes/all');
-  const assignedRoutes = allRoutesRes.data.filter((route: any) => routeIds.includes(route.id));
+  const allRoutes = await listAll<any>('/authority/routes/all');
+  const assignedRoutes = allRoutes.filter((route: any) => routeIds.includes(route.id));
   
   return {
     routes: assignedRoutes,
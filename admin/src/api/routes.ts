@@ -1,11 +1,10 @@
-import { api } from './client';
+import { api, listAll } from './client';
 
 export type Stop = { id:number; name:string; latitude:number; longitude:number; sequence_order:number };
 export type Route = { id:number; name:string; description?:string|null; is_active:boolean; stops: Stop[] };
 
 export async function listRoutes(): Promise<Route[]> { 
-  const res = await api.get('/authority/routes/all'); 
-  return res.data; 
+  return listAll<Route>('/authority/routes/all'); 
 }
 
 export async function createRoute(input: { name:string; description?:string|null }): Promise<Route> { 
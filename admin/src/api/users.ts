@@ -1,10 +1,9 @@
-import { api } from './client';
+import { api, listAll } from './client';
 
 export type User = { id: number; email: string; role: string; name?: string; phone?: string; is_active: boolean };
 
 export async function listUsers(): Promise<User[]> {
-  const res = await api.get('/authority/users');
-  return res.data;
+  return listAll<User>('/authority/users');
 }
 
 export async function createUser(input: { email: string; password: string; role: string; name?: string; phone?: string }): Promise<User> {
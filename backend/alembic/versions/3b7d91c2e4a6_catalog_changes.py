@@ -0,0 +1,35 @@
+"""catalog changes
+
+Revision ID: 3b7d91c2e4a6
+Revises: f04f0c8269f5
+Create Date: 2026-10-19 10:20:41.318502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3b7d91c2e4a6'
+down_revision = 'f04f0c8269f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'catalog_changes',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('entity', sa.String(length=10), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('route_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index(op.f('ix_catalog_changes_id'), 'catalog_changes', ['id'], unique=False)
+    op.create_index(op.f('ix_catalog_changes_route_id'), 'catalog_changes', ['route_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_catalog_changes_route_id'), table_name='catalog_changes')
+    op.drop_index(op.f('ix_catalog_changes_id'), table_name='catalog_changes')
+    op.drop_table('catalog_changes')
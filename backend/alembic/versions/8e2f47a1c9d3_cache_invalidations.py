@@ -0,0 +1,33 @@
+"""cache invalidations
+
+Revision ID: 8e2f47a1c9d3
+Revises: 3b7d91c2e4a6
+Create Date: 2026-10-19 11:02:17.604831
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8e2f47a1c9d3'
+down_revision = '3b7d91c2e4a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cache_invalidations',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('scope', sa.String(length=30), nullable=False),
+        sa.Column('key', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index(op.f('ix_cache_invalidations_id'), 'cache_invalidations', ['id'], unique=False)
+    op.create_index(op.f('ix_cache_invalidations_created_at'), 'cache_invalidations', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cache_invalidations_created_at'), table_name='cache_invalidations')
+    op.drop_index(op.f('ix_cache_invalidations_id'), table_name='cache_invalidations')
+    op.drop_table('cache_invalidations')
@@ -0,0 +1,37 @@
+"""analytics counters
+
+Revision ID: a7c3e59d1f20
+Revises: d91b6f24a0e5
+Create Date: 2026-10-19 13:14:42.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e59d1f20'
+down_revision = 'd91b6f24a0e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_counters',
+        sa.Column('name', sa.String(length=30), primary_key=True, nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    # Backfill from the source tables; from here on writers keep the counters current
+    op.execute("""
+        INSERT INTO analytics_counters (name, value)
+        SELECT 'total_trips', COUNT(*) FROM trips
+        UNION ALL SELECT 'active_trips', COUNT(*) FROM trips WHERE status = 'ACTIVE'
+        UNION ALL SELECT 'total_buses', COUNT(*) FROM buses
+        UNION ALL SELECT 'active_buses', COUNT(*) FROM buses WHERE is_active
+        UNION ALL SELECT 'total_feedbacks', COUNT(*) FROM feedbacks
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_counters')
@@ -0,0 +1,58 @@
+"""driver stats
+
+Revision ID: b4f1a7c2d9e8
+Revises: e2b8d4f61c93
+Create Date: 2026-10-19 16:41:09.582311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b4f1a7c2d9e8'
+down_revision = 'e2b8d4f61c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'driver_stats',
+        sa.Column('driver_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True, nullable=False),
+        sa.Column('trips', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('km_driven', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('driving_seconds', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('arrivals', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('on_time_arrivals', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('load_reports', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('load_score', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('passengers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+    )
+    op.create_index('ix_feedbacks_bus_id_created_at', 'feedbacks', ['bus_id', 'created_at'])
+    # Backfill trip totals and load from completed trips; stop arrivals are
+    # only scored per trip as trips stop, so punctuality starts from here
+    op.execute("""
+        INSERT INTO driver_stats (driver_id, trips, km_driven, driving_seconds, load_reports, load_score)
+        SELECT trips.driver_id,
+               COUNT(*),
+               COALESCE(SUM(trips.distance_traveled), 0),
+               COALESCE(SUM(EXTRACT(EPOCH FROM trips.end_time - trips.start_time)), 0),
+               COALESCE(SUM(load.reports), 0),
+               COALESCE(SUM(load.score), 0)
+        FROM trips
+        LEFT JOIN LATERAL (
+            SELECT COUNT(*) AS reports,
+                   SUM(CASE feedbacks.occupancy WHEN 'HIGH' THEN 1.0 WHEN 'MEDIUM' THEN 0.5 ELSE 0 END) AS score
+            FROM feedbacks
+            WHERE feedbacks.bus_id = trips.bus_id
+              AND feedbacks.created_at BETWEEN trips.start_time AND trips.end_time
+        ) AS load ON TRUE
+        WHERE trips.status = 'COMPLETED' AND trips.driver_id IS NOT NULL AND trips.end_time IS NOT NULL
+        GROUP BY trips.driver_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_feedbacks_bus_id_created_at', table_name='feedbacks')
+    op.drop_table('driver_stats')
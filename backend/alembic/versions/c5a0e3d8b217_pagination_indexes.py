@@ -0,0 +1,35 @@
+"""pagination indexes
+
+Revision ID: c5a0e3d8b217
+Revises: 8e2f47a1c9d3
+Create Date: 2026-10-19 11:48:52.190274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5a0e3d8b217'
+down_revision = '8e2f47a1c9d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+    op.create_index('ix_users_role_created_at_id', 'users', ['role', 'created_at', 'id'])
+    op.create_index('ix_buses_route_id_id', 'buses', ['route_id', 'id'])
+    op.create_index('ix_buses_is_active_id', 'buses', ['is_active', 'id'])
+    op.create_index('ix_trips_start_time_id', 'trips', ['start_time', 'id'])
+    op.create_index('ix_trips_driver_id_start_time_id', 'trips', ['driver_id', 'start_time', 'id'])
+    op.create_index('ix_trips_route_id_start_time_id', 'trips', ['route_id', 'start_time', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trips_route_id_start_time_id', table_name='trips')
+    op.drop_index('ix_trips_driver_id_start_time_id', table_name='trips')
+    op.drop_index('ix_trips_start_time_id', table_name='trips')
+    op.drop_index('ix_buses_is_active_id', table_name='buses')
+    op.drop_index('ix_buses_route_id_id', table_name='buses')
+    op.drop_index('ix_users_role_created_at_id', table_name='users')
+    op.drop_index('ix_users_created_at_id', table_name='users')
@@ -0,0 +1,23 @@
+"""active trip index
+
+Revision ID: d91b6f24a0e5
+Revises: c5a0e3d8b217
+Create Date: 2026-10-19 12:31:05.774120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd91b6f24a0e5'
+down_revision = 'c5a0e3d8b217'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_trips_status_bus_id', 'trips', ['status', 'bus_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trips_status_bus_id', table_name='trips')
@@ -0,0 +1,48 @@
+"""stop arrivals and on-time rollups
+
+Revision ID: e2b8d4f61c93
+Revises: a7c3e59d1f20
+Create Date: 2026-10-19 14:02:51.377140
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8d4f61c93'
+down_revision = 'a7c3e59d1f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stop_arrivals',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('route_id', sa.Integer(), nullable=False),
+        sa.Column('stop_id', sa.Integer(), nullable=False),
+        sa.Column('bus_id', sa.Integer(), nullable=False),
+        sa.Column('arrived_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index(op.f('ix_stop_arrivals_id'), 'stop_arrivals', ['id'], unique=False)
+    op.create_index(op.f('ix_stop_arrivals_arrived_at'), 'stop_arrivals', ['arrived_at'], unique=False)
+    op.create_index('ix_stop_arrivals_route_id_stop_id_arrived_at', 'stop_arrivals', ['route_id', 'stop_id', 'arrived_at'])
+    op.create_table(
+        'ontime_rollups',
+        sa.Column('route_id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=4), nullable=False),
+        sa.Column('period_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('arrivals', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('on_time', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('route_id', 'granularity', 'period_start'),
+    )
+    op.create_index('ix_ontime_rollups_granularity_period_start', 'ontime_rollups', ['granularity', 'period_start'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ontime_rollups_granularity_period_start', table_name='ontime_rollups')
+    op.drop_table('ontime_rollups')
+    op.drop_index('ix_stop_arrivals_route_id_stop_id_arrived_at', table_name='stop_arrivals')
+    op.drop_index(op.f('ix_stop_arrivals_arrived_at'), table_name='stop_arrivals')
+    op.drop_index(op.f('ix_stop_arrivals_id'), table_name='stop_arrivals')
+    op.drop_table('stop_arrivals')
@@ -1,4 +1,5 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.db.session import get_db
@@ -6,13 +7,16 @@ from app.models.user import User
 from app.core.security import verify_token
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
     """Get current authenticated user"""
-    token = credentials.credentials
+    return _user_from_token(credentials.credentials, db)
+
+def _user_from_token(token: str, db: Session) -> User:
     payload = verify_token(token)
     
     if payload is None:
@@ -47,3 +51,18 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
             detail="Inactive user"
         )
     return current_user
+
+def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    access_token: Optional[str] = Query(None, description="Bearer token for clients that cannot set headers (EventSource)"),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current active user from the Authorization header or an `access_token` query parameter"""
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return get_current_active_user(_user_from_token(token, db))
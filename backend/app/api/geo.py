@@ -0,0 +1,26 @@
+"""
+Shared parsing of geographic query parameters
+"""
+
+from typing import Tuple
+
+from fastapi import HTTPException, status
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lng, max_lat, max_lng)
+
+
+def parse_bbox(bbox: str) -> BBox:
+    """Parse a `minLng,minLat,maxLng,maxLat` query value (GeoJSON order)"""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox must be minLng,minLat,maxLng,maxLat"
+        )
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox must lie within WGS84 bounds with minimums not exceeding maximums"
+        )
+    return min_lat, min_lng, max_lat, max_lng
@@ -0,0 +1,87 @@
+"""
+Keyset (cursor) pagination and total-count estimates for list endpoints
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+import orjson
+from fastapi import HTTPException, Response, status
+from sqlalchemy import func, literal, text, tuple_
+from sqlalchemy.orm import Query, Session
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+COUNT_CAP = 10_000  # counting stops here; larger totals are reported as estimates
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor holding the sort-key values of a page's last row"""
+    return base64.urlsafe_b64encode(orjson.dumps(list(values))).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for value, kind in zip(values, types)
+        )
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor must be the X-Next-Cursor value of a previous page"
+        )
+
+
+def keyset_page(query: Query, keys: Sequence, cursor: Optional[str], limit: int = DEFAULT_PAGE_SIZE,
+                descending: bool = False) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of `query` ordered by `keys`, columns that together are unique
+    and sort in one direction so a composite index serves both the seek
+    past `cursor` and the order: every page costs one index range scan,
+    however deep. Returns the rows and the next page's cursor (None on the
+    last page).
+    """
+    query = query.order_by(*(key.desc() if descending else key.asc() for key in keys))
+    if cursor is not None:
+        after = tuple_(*(
+            literal(value, key.type)
+            for key, value in zip(keys, decode_cursor(cursor, [key.type.python_type for key in keys]))
+        ))
+        query = query.filter(tuple_(*keys) < after if descending else tuple_(*keys) > after)
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], key.key) for key in keys])
+
+
+def count_estimate(db: Session, query: Query, table: str, filtered: bool) -> Tuple[int, bool]:
+    """
+    Rows matching `query` and whether that is an estimate: the planner's row
+    count for a large unfiltered Postgres table, otherwise a count that
+    stops at COUNT_CAP
+    """
+    if not filtered and db.get_bind().dialect.name == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"), {"table": table}
+        ).scalar()
+        if estimate is not None and estimate >= COUNT_CAP:
+            return int(estimate), True
+    count = db.query(func.count()).select_from(query.limit(COUNT_CAP + 1).subquery()).scalar()
+    return (COUNT_CAP, True) if count > COUNT_CAP else (count, False)
+
+
+def set_page_headers(response: Response, next_cursor: Optional[str],
+                     total: Optional[Tuple[int, bool]] = None) -> None:
+    """`X-Next-Cursor` when there are more pages; `X-Total-Count` (first page only) when counted"""
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total[0])
+        if total[1]:
+            response.headers["X-Total-Count-Estimated"] = "true"
@@ -1,16 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import bisect
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.db.session import get_db
-from app.models.user import User
-from app.models.trip import Bus, Trip, Feedback, Route, Stop, DriverRouteAssignment
+from app.models.user import User, UserRole
+from app.models.trip import Bus, Trip, TripStatus, Feedback, Route, Stop, DriverRouteAssignment, CatalogChange, OnTimeRollup, DriverStats
 from app.api.deps import get_current_active_user
+from app.api.geo import parse_bbox
+from app.api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, count_estimate, decode_cursor, encode_cursor, keyset_page, set_page_headers
+from app.core.compression import precompressed_response
+from app.core.representation import Representation, get_representation
+from app.core.http_cache import etag_matches, make_etag, not_modified, set_etag
+from app.core.serialization import FastJSONResponse, FragmentCache, dumps
+from app.realtime.socket import broadcast_catalog_version
+from app.services.analytics import bump, live_speed, read_counters
+from app.services.clustering import Cluster, map_clusters
+from app.services.driver_routes import driver_assignments
+from app.services.driver_stats import remove_trip
+from app.services.fleet_state import fleet_state
+from app.services.invalidation import cache_invalidator
+from app.services.ontime import DAY, HOUR, on_time_rate
+from app.services.route_catalog import CatalogRoute, route_catalog
+from app.services.route_stops import route_stops_cache
+from app.services.stop_locator import locate_buses
+from app.services.trip_history import trip_history_item, trip_history_query
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import and_
 
 router = APIRouter()
 
+# Serialized `ActiveBusResponse` / `RouteOut` objects keyed by bus / route id
+active_bus_fragments = FragmentCache()
+route_fragments = FragmentCache()
+
 class ActiveBusResponse(BaseModel):
     id: int
     busNumber: str
@@ -35,6 +58,15 @@ class AnalyticsResponse(BaseModel):
     totalFeedbacks: int
     averageSpeed: float
     onTimeRate: float
+    onTimeArrivals: int  # scored stop arrivals behind onTimeRate; 0 means no data yet
+
+class OnTimeRollupResponse(BaseModel):
+    routeId: int
+    routeName: str
+    periodStart: datetime
+    arrivals: int
+    onTime: int
+    onTimeRate: float
 
 class TripHistoryResponse(BaseModel):
     id: int
@@ -43,9 +75,23 @@ class TripHistoryResponse(BaseModel):
     driverName: str
     startTime: str
     endTime: Optional[str]
+    durationSeconds: Optional[float]
     status: str
     distance: float
 
+class ClusterOut(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+    id: Optional[str] = None  # set for single-point clusters; graph stops are "graph:<id>"
+
+class MapClustersResponse(BaseModel):
+    zoom: int
+    level: int  # grid level used; coarser than zoom when the viewport is large
+    cellDeg: float
+    buses: List[ClusterOut]
+    stops: List[ClusterOut]
+
 class UserOut(BaseModel):
     id: int
     email: str
@@ -122,8 +168,23 @@ class StopUpdate(BaseModel):
 class DriverRoutesPayload(BaseModel):
     route_ids: List[int]
 
+def _log_catalog_change(db: Session, entity: str, entity_id: int, route_id: Optional[int], action: str) -> int:
+    """Record a route/stop mutation in the catalog change log (committed with it); returns the new catalog version"""
+    change = CatalogChange(entity=entity, entity_id=entity_id, route_id=route_id, action=action)
+    db.add(change)
+    cache_invalidator.publish(db, "route_catalog")
+    db.flush()
+    return change.id
+
+def _route_data_changed(background_tasks: BackgroundTasks, version: int) -> None:
+    """Drop caches derived from routes and stops after a committed mutation and announce the new catalog version"""
+    route_catalog.invalidate()
+    background_tasks.add_task(broadcast_catalog_version, version)
+
 @router.get("/buses", response_model=List[ActiveBusResponse])
 def get_all_buses(
+    request: Request,
+    rep: Representation = Depends(get_representation),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -134,34 +195,179 @@ def get_all_buses(
             detail="Access denied. Authority role required."
         )
     
-    # Get active buses with their routes
-    buses = db.query(Bus).filter(Bus.is_active == True).all()
-    
-    result = []
-    for bus in buses:
-        # Mock data for demonstration
-        result.append(ActiveBusResponse(
-            id=bus.id,
-            busNumber=bus.bus_number,
-            routeName=f"Route {bus.bus_number}",
-            currentStop="Market St & 5th St",
-            nextStop="Mission St & 6th St",
-            latitude=bus.current_latitude or 0.0,
-            longitude=bus.current_longitude or 0.0,
-            speed=bus.speed or 0.0,
-            occupancy=bus.occupancy.value,
-            driverName=f"Driver {bus.id}",
-            lastUpdated=bus.last_updated.isoformat() if bus.last_updated else datetime.utcnow().isoformat()
-        ))
+    # Every bus write goes through fleet_state (and it re-syncs from the
+    # database), so its generation versions this listing
+    fleet_state.ensure_loaded(db)
+    etag = make_etag("authority-buses", fleet_state.generation, route_stops_cache.version, rep.variant)
+    if etag_matches(request, etag):
+        return not_modified(etag)
     
+    result = rep.response(_live_buses_body(db, rep))
+    set_etag(result, etag)
     return result
 
+def _live_buses_body(db: Session, rep: Representation) -> bytes:
+    """
+    Serialized `List[ActiveBusResponse]` in one pass: every active bus and
+    its active trip's driver from one narrow query, live positions from the
+    fleet state, route names from the catalog snapshot, and nearest / next
+    stops located in a single vectorized call. A bus's fragment is reused
+    while none of those inputs changed.
+    """
+    roster = (
+        db.query(Bus.id, Bus.bus_number, Bus.route_id, User.name.label("driver_name"))
+        .outerjoin(Trip, and_(Trip.bus_id == Bus.id, Trip.status == TripStatus.ACTIVE))
+        .outerjoin(User, User.id == Trip.driver_id)
+        .filter(Bus.is_active == True)
+        .order_by(Bus.id)
+        .all()
+    )
+    snapshot = route_catalog.snapshot(db)
+    routes = route_stops_cache.all(db)
+    positions = fleet_state.positions
+    
+    # Buses the fleet state does not track have no fix yet; only those few
+    # need the rest of their row
+    unplaced = {}
+    missing = [bus_id for bus_id, _, _, _ in roster if bus_id not in positions]
+    if missing:
+        unplaced = {
+            row.id: row for row in
+            db.query(Bus.id, Bus.current_latitude, Bus.current_longitude, Bus.speed, Bus.occupancy, Bus.last_updated)
+            .filter(Bus.id.in_(missing))
+            .all()
+        }
+    
+    buses, versions, seen = [], [], set()
+    for bus_id, bus_number, route_id, driver_name in roster:
+        if bus_id in seen:
+            continue  # more than one active trip: keep the first
+        seen.add(bus_id)
+        position = positions.get(bus_id)
+        if position is not None:
+            bus = (bus_id, bus_number, route_id, position.latitude, position.longitude,
+                   position.speed, position.occupancy, position.last_updated, driver_name)
+            versions.append((position.seq, bus_number, route_id, driver_name, snapshot.version))
+        else:
+            row = unplaced[bus_id]
+            bus = (bus_id, bus_number, route_id, row.current_latitude, row.current_longitude, row.speed or 0.0,
+                   row.occupancy.value if row.occupancy else "low", row.last_updated, driver_name)
+            versions.append((bus, snapshot.version))
+        buses.append(bus)
+    
+    fragments = [active_bus_fragments.peek(bus[0], v) for bus, v in zip(buses, versions)]
+    stale = [i for i, fragment in enumerate(fragments) if fragment is None]
+    
+    # Nearest / next stop for every stale placed bus in one vectorized pass
+    placed = [i for i in stale if buses[i][2] in routes and buses[i][3] is not None and buses[i][4] is not None]
+    stop_labels = {}
+    if placed:
+        packed = route_stops_cache.packed(db)
+        located = locate_buses(
+            [buses[i][3] for i in placed],
+            [buses[i][4] for i in placed],
+            packed.rows(buses[i][2] for i in placed),
+            packed,
+        )
+        stop_labels = dict(zip(placed, located.all_labels(routes[buses[i][2]].names for i in placed)))
+    
+    built = []
+    for i in stale:
+        bus_id, bus_number, route_id, latitude, longitude, speed, occupancy, last_updated, driver_name = buses[i]
+        route = snapshot.by_id.get(route_id)
+        current_stop, next_stop = stop_labels.get(i, ("Route Start", "Route End"))
+        fragments[i] = dumps({
+            "id": bus_id,
+            "busNumber": bus_number,
+            "routeName": route.name if route else "Unassigned",
+            "currentStop": current_stop,
+            "nextStop": next_stop,
+            "latitude": latitude or 0.0,
+            "longitude": longitude or 0.0,
+            "speed": speed or 0.0,
+            "occupancy": occupancy,
+            "driverName": driver_name or "Unassigned",
+            "lastUpdated": last_updated.isoformat() if last_updated else datetime.utcnow().isoformat()
+        })
+        built.append((bus_id, versions[i], fragments[i]))
+    active_bus_fragments.put_many(built)
+    
+    return rep.array(
+        rep.convert(active_bus_fragments, bus[0], v, fragment)
+        for bus, v, fragment in zip(buses, versions, fragments)
+    )
+
+def _cluster_payload(cluster: Cluster) -> dict:
+    return {
+        "latitude": round(cluster.latitude, 6),
+        "longitude": round(cluster.longitude, 6),
+        "count": cluster.count,
+        "id": None if cluster.key is None else str(cluster.key)
+    }
+
+@router.get("/map/clusters", response_model=MapClustersResponse)
+def get_map_clusters(
+    bbox: str = Query(..., description="minLng,minLat,maxLng,maxLat"),
+    zoom: int = Query(..., ge=0, le=22),
+    layers: str = Query("buses,stops", description="Comma-separated: buses, stops"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get bus and stop clusters (counts and centroids) for a map viewport"""
+    if current_user.role.value != "authority":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Authority role required."
+        )
+    
+    min_lat, min_lng, max_lat, max_lng = parse_bbox(bbox)
+    wanted = {layer.strip() for layer in layers.split(",") if layer.strip()}
+    if not wanted <= {"buses", "stops"}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="layers may only contain buses and stops"
+        )
+    
+    # Both layers share one level, so payload size is bounded by the cell count
+    level = map_clusters.buses.level_for(min_lat, min_lng, max_lat, max_lng, zoom)
+    buses, stops = [], []
+    if "buses" in wanted:
+        fleet_state.ensure_loaded(db)
+        buses = map_clusters.buses.clusters(min_lat, min_lng, max_lat, max_lng, level)
+    if "stops" in wanted:
+        stops = map_clusters.stop_grid(db).clusters(min_lat, min_lng, max_lat, max_lng, level)
+    
+    return FastJSONResponse(dumps({
+        "zoom": zoom,
+        "level": level,
+        "cellDeg": map_clusters.buses.cell_degs[level],
+        "buses": [_cluster_payload(cluster) for cluster in buses],
+        "stops": [_cluster_payload(cluster) for cluster in stops]
+    }))
+
 # Buses CRUD
 @router.get("/buses/all", response_model=List[BusOut])
-def list_buses(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+def list_buses(
+    response: Response,
+    routeId: Optional[int] = None,
+    active: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
     if current_user.role.value != "authority":
         raise HTTPException(status_code=403, detail="Access denied. Authority role required.")
-    buses = db.query(Bus).all()
+    query = db.query(Bus)
+    if routeId is not None:
+        query = query.filter(Bus.route_id == routeId)
+    if active is not None:
+        query = query.filter(Bus.is_active == active)
+    buses, next_cursor = keyset_page(query, (Bus.id,), cursor, limit)
+    if cursor is None:
+        set_page_headers(response, next_cursor, count_estimate(db, query, "buses", routeId is not None or active is not None))
+    else:
+        set_page_headers(response, next_cursor)
     return [BusOut(
         id=b.id,
         bus_number=b.bus_number,
@@ -179,6 +385,7 @@ def create_bus(payload: BusCreate, current_user: User = Depends(get_current_acti
         raise HTTPException(status_code=400, detail="Bus number already exists")
     b = Bus(bus_number=payload.bus_number, route_id=payload.route_id or None, is_active=False)
     db.add(b)
+    bump(db, total_buses=1)
     db.commit()
     db.refresh(b)
     return BusOut(id=b.id, bus_number=b.bus_number, route_id=b.route_id, is_active=b.is_active, current_latitude=b.current_latitude, current_longitude=b.current_longitude)
@@ -192,42 +399,80 @@ def update_bus(bus_id: int, payload: BusUpdate, current_user: User = Depends(get
         raise HTTPException(status_code=404, detail="Bus not found")
     if payload.route_id is not None:
         b.route_id = payload.route_id
-    if payload.is_active is not None:
+    if payload.is_active is not None and payload.is_active != b.is_active:
         b.is_active = payload.is_active
+        bump(db, active_buses=1 if payload.is_active else -1)
     db.commit()
     db.refresh(b)
+    fleet_state.update_from_bus(b)
     return BusOut(id=b.id, bus_number=b.bus_number, route_id=b.route_id, is_active=b.is_active, current_latitude=b.current_latitude, current_longitude=b.current_longitude)
 
 # Routes CRUD
+def _routes_body(db: Session, rep: Representation, routes: Optional[List[CatalogRoute]] = None) -> bytes:
+    """Serialized `List[RouteOut]` (every route by default) from the catalog snapshot; route fragments are reused for a whole catalog version"""
+    snapshot = route_catalog.snapshot(db)
+    return rep.array(
+        rep.convert(route_fragments, r.id, snapshot.version, route_fragments.get(r.id, snapshot.version, lambda: {
+            "id": r.id,
+            "name": r.name,
+            "description": r.description,
+            "is_active": r.is_active,
+            "stops": [
+                {"id": s.id, "name": s.name, "latitude": s.latitude, "longitude": s.longitude, "sequence_order": s.sequence_order}
+                for s in r.stops
+            ]
+        }))
+        for r in (snapshot.routes if routes is None else routes)
+    )
+
 @router.get("/routes/all", response_model=List[RouteOut])
-def list_routes(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+def list_routes(
+    request: Request,
+    active: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    rep: Representation = Depends(get_representation),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
     if current_user.role.value != "authority":
         raise HTTPException(status_code=403, detail="Access denied. Authority role required.")
-    routes = db.query(Route).all()
-    result: List[RouteOut] = []
-    for r in routes:
-        stops = db.query(Stop).filter(Stop.route_id == r.id).order_by(Stop.sequence_order).all()
-        result.append(RouteOut(
-            id=r.id,
-            name=r.name,
-            description=r.description,
-            is_active=r.is_active,
-            stops=[StopOut(id=s.id, name=s.name, latitude=s.latitude, longitude=s.longitude, sequence_order=s.sequence_order) for s in stops]
-        ))
-    return result
+    # Pages are slices of the in-memory catalog (routes by id)
+    snapshot = route_catalog.snapshot(db)
+    routes = [r for r in snapshot.routes if active is None or r.is_active == active]
+    if cursor is not None:
+        (after,) = decode_cursor(cursor, (int,))
+        routes = routes[bisect.bisect_right([r.id for r in routes], after):]
+    page = routes[:limit]
+    next_cursor = encode_cursor([page[-1].id]) if len(routes) > len(page) else None
+    if active is None and cursor is None:
+        # Concurrent first pages of one catalog version share a single build,
+        # which is compressed once per encoding
+        version = snapshot.version
+        response = precompressed_response(
+            request, rep, ("routes/all", limit), version,
+            lambda: _routes_body(db, rep, page)
+        )
+    else:
+        response = rep.response(_routes_body(db, rep, page))
+    set_page_headers(response, next_cursor, (len(routes), False) if cursor is None else None)
+    return response
 
 @router.post("/routes", response_model=RouteOut, status_code=201)
-def create_route(payload: RouteCreate, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+def create_route(payload: RouteCreate, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
     if current_user.role.value != "authority":
         raise HTTPException(status_code=403, detail="Access denied. Authority role required.")
     r = Route(name=payload.name, description=payload.description, is_active=True)
     db.add(r)
+    db.flush()
+    version = _log_catalog_change(db, "route", r.id, r.id, "create")
     db.commit()
     db.refresh(r)
+    _route_data_changed(background_tasks, version)
     return RouteOut(id=r.id, name=r.name, description=r.description, is_active=r.is_active, stops=[])
 
 @router.patch("/routes/{route_id}", response_model=RouteOut)
-def update_route(route_id: int, payload: RouteUpdate, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+def update_route(route_id: int, payload: RouteUpdate, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
     if current_user.role.value != "authority":
         raise HTTPException(status_code=403, detail="Access denied. Authority role required.")
     r = db.query(Route).filter(Route.id == route_id).first()
@@ -239,19 +484,24 @@ def update_route(route_id: int, payload: RouteUpdate, current_user: User = Depen
         r.description = payload.description
     if payload.is_active is not None:
         r.is_active = payload.is_active
+    version = _log_catalog_change(db, "route", r.id, r.id, "update")
     db.commit()
+    _route_data_changed(background_tasks, version)
     stops = db.query(Stop).filter(Stop.route_id == r.id).order_by(Stop.sequence_order).all()
     return RouteOut(id=r.id, name=r.name, description=r.description, is_active=r.is_active, stops=[StopOut(id=s.id, name=s.name, latitude=s.latitude, longitude=s.longitude, sequence_order=s.sequence_order) for s in stops])
 
 # Stops CRUD
 @router.post("/stops", response_model=StopOut, status_code=201)
-def create_stop(payload: StopCreate, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+def create_stop(payload: StopCreate, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
     if current_user.role.value != "authority":
         raise HTTPException(status_code=403, detail="Access denied. Authority role required.")
     s = Stop(route_id=payload.route_id, name=payload.name, latitude=payload.latitude, longitude=payload.longitude, sequence_order=payload.sequence_order)
     db.add(s)
+    db.flush()
+    version = _log_catalog_change(db, "stop", s.id, s.route_id, "create")
     db.commit()
     db.refresh(s)
+    _route_data_changed(background_tasks, version)
     return StopOut(id=s.id, name=s.name, latitude=s.latitude, longitude=s.longitude, sequence_order=s.sequence_order)
 
 @router.get("/drivers/{driver_id}/routes", response_model=List[int])
@@ -270,11 +520,13 @@ def set_driver_routes(driver_id: int, payload: DriverRoutesPayload, current_user
     # Add new
     for rid in payload.route_ids:
         db.add(DriverRouteAssignment(driver_id=driver_id, route_id=rid))
+    cache_invalidator.publish(db, "driver_routes", driver_id)
     db.commit()
+    driver_assignments.invalidate(driver_id)
     return payload.route_ids
 
 @router.patch("/stops/{stop_id}", response_model=StopOut)
-def update_stop(stop_id: int, payload: StopUpdate, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+def update_stop(stop_id: int, payload: StopUpdate, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
     if current_user.role.value != "authority":
         raise HTTPException(status_code=403, detail="Access denied. Authority role required.")
     s = db.query(Stop).filter(Stop.id == stop_id).first()
@@ -288,8 +540,10 @@ def update_stop(stop_id: int, payload: StopUpdate, current_user: User = Depends(
         s.longitude = payload.longitude
     if payload.sequence_order is not None:
         s.sequence_order = payload.sequence_order
+    version = _log_catalog_change(db, "stop", s.id, s.route_id, "update")
     db.commit()
     db.refresh(s)
+    _route_data_changed(background_tasks, version)
     return StopOut(id=s.id, name=s.name, latitude=s.latitude, longitude=s.longitude, sequence_order=s.sequence_order)
 
 
@@ -305,33 +559,74 @@ def get_analytics(
             detail="Access denied. Authority role required."
         )
     
-    # Get statistics
-    total_trips = db.query(Trip).count()
-    active_trips = db.query(Trip).filter(Trip.status == "active").count()
-    total_buses = db.query(Bus).count()
-    active_buses = db.query(Bus).filter(Bus.is_active == True).count()
-    total_feedbacks = db.query(Feedback).count()
+    # Counters are updated in the same transactions as the rows they count;
+    # the average speed follows this worker's live fleet state
+    counts = read_counters(db)
+    fleet_state.ensure_loaded(db)
     
-    # Calculate average speed
-    avg_speed_result = db.query(func.avg(Bus.speed)).filter(Bus.is_active == True).scalar()
-    average_speed = float(avg_speed_result) if avg_speed_result else 0.0
-    
-    # Mock on-time rate (in production, calculate based on actual data)
-    on_time_rate = 94.2
+    # Last 24 hours of the precomputed hourly on-time rollups
+    rate, scored = on_time_rate(db)
     
     return AnalyticsResponse(
-        totalTrips=total_trips,
-        activeTrips=active_trips,
-        totalBuses=total_buses,
-        activeBuses=active_buses,
-        totalFeedbacks=total_feedbacks,
-        averageSpeed=round(average_speed, 2),
-        onTimeRate=on_time_rate
+        totalTrips=counts["total_trips"],
+        activeTrips=counts["active_trips"],
+        totalBuses=counts["total_buses"],
+        activeBuses=counts["active_buses"],
+        totalFeedbacks=counts["total_feedbacks"],
+        averageSpeed=round(live_speed.average(), 2),
+        onTimeRate=rate,
+        onTimeArrivals=scored
+    )
+
+@router.get("/analytics/ontime", response_model=List[OnTimeRollupResponse])
+def get_on_time_rollups(
+    granularity: str = Query(HOUR, description="hour or day"),
+    routeId: Optional[int] = None,
+    dateFrom: Optional[datetime] = Query(None, description="Periods starting at or after this time (UTC)"),
+    dateTo: Optional[datetime] = Query(None, description="Periods starting before this time (UTC)"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """On-time performance per route per hour or day, oldest first; defaults to the last 24 hours or 30 days"""
+    if current_user.role.value != "authority":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Authority role required."
+        )
+    if granularity not in (HOUR, DAY):
+        raise HTTPException(status_code=400, detail="granularity must be 'hour' or 'day'")
+    
+    if dateFrom is None:
+        dateFrom = datetime.utcnow() - (timedelta(hours=24) if granularity == HOUR else timedelta(days=30))
+    query = db.query(OnTimeRollup).filter(
+        OnTimeRollup.granularity == granularity, OnTimeRollup.period_start >= dateFrom
     )
+    if dateTo is not None:
+        query = query.filter(OnTimeRollup.period_start < dateTo)
+    if routeId is not None:
+        query = query.filter(OnTimeRollup.route_id == routeId)
+    routes = route_catalog.snapshot(db).by_id
+    return [
+        OnTimeRollupResponse(
+            routeId=row.route_id,
+            routeName=routes[row.route_id].name if row.route_id in routes else f"Route {row.route_id}",
+            periodStart=row.period_start,
+            arrivals=row.arrivals,
+            onTime=row.on_time,
+            onTimeRate=round(100.0 * row.on_time / row.arrivals, 1) if row.arrivals else 0.0,
+        )
+        for row in query.order_by(OnTimeRollup.period_start, OnTimeRollup.route_id).all()
+    ]
 
 @router.get("/trips", response_model=List[TripHistoryResponse])
 def get_trip_history(
     driverId: Optional[int] = None,
+    routeId: Optional[int] = None,
+    dateFrom: Optional[datetime] = Query(None, description="Trips started at or after this time"),
+    dateTo: Optional[datetime] = Query(None, description="Trips started before this time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    rep: Representation = Depends(get_representation),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -342,36 +637,51 @@ def get_trip_history(
             detail="Access denied. Authority role required."
         )
     
-    # Build query
-    query = db.query(Trip)
-    if driverId:
-        query = query.filter(Trip.driver_id == driverId)
-    
-    trips = query.order_by(Trip.start_time.desc()).limit(50).all()
-    
-    result = []
-    for trip in trips:
-        result.append(TripHistoryResponse(
-            id=trip.id,
-            tripId=trip.trip_id,
-            routeName=f"Route {trip.route_id}",
-            driverName=f"Driver {trip.driver_id}",
-            startTime=trip.start_time.isoformat(),
-            endTime=trip.end_time.isoformat() if trip.end_time else None,
-            status=trip.status.value,
-            distance=trip.distance_traveled
-        ))
+    filters = []
+    if driverId is not None:
+        filters.append(Trip.driver_id == driverId)
+    if routeId is not None:
+        filters.append(Trip.route_id == routeId)
+    if dateFrom is not None:
+        filters.append(Trip.start_time >= dateFrom)
+    if dateTo is not None:
+        filters.append(Trip.start_time < dateTo)
     
-    return result
+    # Newest first, with route and driver names from the same query
+    rows, next_cursor = keyset_page(
+        trip_history_query(db).filter(*filters), (Trip.start_time, Trip.id), cursor, limit, descending=True
+    )
+    
+    response = rep.response([trip_history_item(row) for row in rows])
+    if cursor is None:
+        set_page_headers(response, next_cursor, count_estimate(db, db.query(Trip.id).filter(*filters), "trips", bool(filters)))
+    else:
+        set_page_headers(response, next_cursor)
+    return response
 
 @router.get("/users", response_model=List[UserOut])
 def list_users(
+    response: Response,
+    role: Optional[UserRole] = None,
+    active: Optional[bool] = None,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     if current_user.role.value != "authority":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied. Authority role required.")
-    users = db.query(User).order_by(User.created_at.desc()).all()
+    query = db.query(User)
+    if role is not None:
+        query = query.filter(User.role == role)
+    if active is not None:
+        query = query.filter(User.is_active == active)
+    # Newest first
+    users, next_cursor = keyset_page(query, (User.created_at, User.id), cursor, limit, descending=True)
+    if cursor is None:
+        set_page_headers(response, next_cursor, count_estimate(db, query, "users", role is not None or active is not None))
+    else:
+        set_page_headers(response, next_cursor)
     return [
         UserOut(
             id=u.id,
@@ -467,12 +777,14 @@ def delete_user(
         # 1. Delete driver route assignments
         try:
             db.query(DriverRouteAssignment).filter(DriverRouteAssignment.driver_id == user_id).delete()
+            cache_invalidator.publish(db, "driver_routes", user_id)
         except Exception as assignment_error:
             print(f"Warning: Could not delete driver route assignments: {assignment_error}")
         
         # 2. Delete feedbacks by this user (as commuter)
         try:
-            db.query(Feedback).filter(Feedback.commuter_id == user_id).delete()
+            removed = db.query(Feedback).filter(Feedback.commuter_id == user_id).delete()
+            bump(db, total_feedbacks=-removed)
         except Exception as feedback_error:
             print(f"Warning: Could not delete user feedbacks: {feedback_error}")
         
@@ -481,10 +793,17 @@ def delete_user(
             db.query(Trip).filter(Trip.driver_id == user_id).update({"driver_id": None})
         except Exception as trip_error:
             print(f"Warning: Could not update trips: {trip_error}")
+
+        # 4. Delete the driver's stats row
+        try:
+            db.query(DriverStats).filter(DriverStats.driver_id == user_id).delete()
+        except Exception as stats_error:
+            print(f"Warning: Could not delete driver stats: {stats_error}")
         
         # Finally, delete the user
         db.delete(user)
         db.commit()
+        driver_assignments.invalidate(user_id)
         return {"message": "User deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -512,8 +831,10 @@ def delete_bus(
     
     try:
         # Delete the bus (trips will be handled by CASCADE or kept for historical data)
+        bump(db, total_buses=-1, active_buses=-1 if bus.is_active else 0)
         db.delete(bus)
         db.commit()
+        fleet_state.remove(bus_id)
         return {"message": "Bus deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -522,6 +843,7 @@ def delete_bus(
 @router.delete("/routes/{route_id}")
 def delete_route(
     route_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -550,10 +872,14 @@ def delete_route(
         
         # Delete driver route assignments
         db.query(DriverRouteAssignment).filter(DriverRouteAssignment.route_id == route_id).delete()
+        cache_invalidator.publish(db, "driver_routes")
         
         # Delete the route
         db.delete(route)
+        version = _log_catalog_change(db, "route", route_id, route_id, "delete")
         db.commit()
+        driver_assignments.invalidate()
+        _route_data_changed(background_tasks, version)
         return {"message": "Route and associated stops deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -562,6 +888,7 @@ def delete_route(
 @router.delete("/stops/{stop_id}")
 def delete_stop(
     stop_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -577,7 +904,9 @@ def delete_stop(
     try:
         # Delete the stop
         db.delete(stop)
+        version = _log_catalog_change(db, "stop", stop_id, stop.route_id, "delete")
         db.commit()
+        _route_data_changed(background_tasks, version)
         return {"message": "Stop deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -602,12 +931,15 @@ def delete_trip(
     if trip.status in ["active", "in_progress"]:
         trip.status = "cancelled"
         trip.end_time = datetime.utcnow()
+        bump(db, active_trips=-1)
         db.commit()
         return {"message": "Active trip cancelled successfully"}
     
     try:
         # Delete completed/cancelled trips
+        remove_trip(db, trip)
         db.delete(trip)
+        bump(db, total_trips=-1)
         db.commit()
         return {"message": "Trip deleted successfully"}
     except Exception as e:
@@ -1,15 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
 from app.db.session import get_db
 from app.models.user import User
 from app.models.trip import Bus, Feedback, OccupancyLevel
-from app.api.deps import get_current_active_user
+from app.api.deps import get_current_active_user, get_stream_user
+from app.api.geo import parse_bbox
+from app.core.representation import DEFAULT_REPRESENTATION, Representation, get_representation
+from app.core.http_cache import etag_matches, make_etag, not_modified, set_etag
+from app.services.analytics import bump
+from app.services.arrivals import arrivals_index
+from app.services.eta import EtaEstimate, EtaMatrix, EtaUnavailable, eta_engine
+from app.core.config import settings
+from app.core.serialization import FastJSONResponse, FragmentCache, dumps, json_object
+from app.core.singleflight import SingleFlight
+from app.services.fleet_state import BusPosition, fleet_state
+from app.services.route_stops import RouteStops, route_stops_cache
+from app.services.spatial_index import haversine_m
+from app.services.stop_locator import locate_buses
+from app.services.route_catalog import public_routes_json
+from app.realtime.bus_stream import bus_events
+from app.schemas.auth import UserResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime, timedelta
+import math
+import time
 
 router = APIRouter()
 
+MAX_BATCH_STOPS = 100
+MAX_BATCH_BUSES = 200
+MAX_STREAM_BBOX_DEG = 1.0  # per side, roughly a metro area
+
+# Serialized `BusResponse` objects (without `distance`) keyed by bus id
+bus_fragments = FragmentCache()
+nearby_flight = SingleFlight()
+
 class BusResponse(BaseModel):
     id: int
     routeName: str
@@ -19,6 +46,7 @@ class BusResponse(BaseModel):
     longitude: float
     speed: float
     occupancy: str
+    distance: float = 0.0  # meters from the query point
     lastUpdated: str
     
     class Config:
@@ -26,94 +54,211 @@ class BusResponse(BaseModel):
 
 class ETAResponse(BaseModel):
     eta: str
+    etaSeconds: int
+    earliestSeconds: int
+    latestSeconds: int
+    basis: str  # "learned", "mixed" or "prior" segment times
+    fixAgeSeconds: int
+    lastUpdated: Optional[str]
+
+class ETABatchRequest(BaseModel):
+    stopIds: List[int]
+    busIds: Optional[List[int]] = None  # omitted: all buses still to reach any of the stops
+
+class ETABatchResponse(BaseModel):
+    busIds: List[int]
+    stopIds: List[int]
+    # [bus][stop] matrices, null where the bus will not reach the stop
+    etaSeconds: List[List[Optional[int]]]
+    earliestSeconds: List[List[Optional[int]]]
+    latestSeconds: List[List[Optional[int]]]
+    fixAgeSeconds: List[Optional[int]]  # null for buses that are not active
+    lastUpdated: List[Optional[str]]
+
+class DepartureResponse(BaseModel):
+    busId: int
+    busNumber: str
+    routeId: int
+    routeName: str
+    eta: str
+    etaSeconds: int
+    expectedAt: str
+
+class DeparturesResponse(BaseModel):
+    stopId: int
+    stopName: str
+    departures: List[DepartureResponse]
 
 class FeedbackRequest(BaseModel):
     busId: int
     occupancy: str
     comment: str = ""
 
+class CommuterBootstrapResponse(BaseModel):
+    user: UserResponse
+    routes: List[dict]
+    nearbyBuses: Optional[List[BusResponse]]  # only when lat/lng are given
+    serverTime: str
+
+def _eta_text(seconds: int) -> str:
+    minutes = round(seconds / 60)
+    return "Arriving" if minutes < 1 else f"{minutes} minute{'s' if minutes != 1 else ''}"
+
+def _eta_response(estimate: EtaEstimate) -> ETAResponse:
+    return ETAResponse(
+        eta=_eta_text(estimate.seconds),
+        etaSeconds=estimate.seconds,
+        earliestSeconds=estimate.earliest_seconds,
+        latestSeconds=estimate.latest_seconds,
+        basis=estimate.basis,
+        fixAgeSeconds=estimate.fix_age_seconds,
+        lastUpdated=estimate.last_updated.isoformat() if estimate.last_updated else None
+    )
+
+def _bus_payload(bus: BusPosition, route: RouteStops, labels) -> dict:
+    """`BusResponse` fields except the query-dependent `distance`"""
+    current_stop_name, next_stop_name = labels
+    return {
+        "id": bus.bus_id,
+        "routeName": route.route_name,
+        "currentStop": current_stop_name,
+        "nextStop": next_stop_name,
+        "latitude": bus.latitude,
+        "longitude": bus.longitude,
+        "speed": bus.speed,
+        "occupancy": bus.occupancy,
+        "lastUpdated": bus.last_updated.isoformat() if bus.last_updated else datetime.utcnow().isoformat()
+    }
+
+def _coalescing_window(lat: float, lng: float, radius: float) -> Tuple[float, float, float]:
+    """Center of the query's coalescing cell and a radius around it covering the query circle"""
+    cell = settings.NEARBY_COALESCE_CELL_DEG
+    center_lat = (math.floor(lat / cell) + 0.5) * cell
+    center_lng = (math.floor(lng / cell) + 0.5) * cell
+    slack = haversine_m(center_lat, center_lng, center_lat + cell / 2, center_lng + cell / 2)
+    return center_lat, center_lng, radius + math.ceil(slack)
+
+def _nearby_fragments(lat: float, lng: float, radius: float, version: int, db: Session) -> List[Tuple[BusPosition, bytes]]:
+    """Buses on active routes within radius, each with its serialized `BusResponse` (sans distance)"""
+    # Candidate buses come from the live spatial index, not a fleet-wide scan
+    routes = route_stops_cache.all(db)
+    candidates = [bus for _, bus in fleet_state.nearby(lat, lng, radius) if bus.route_id in routes]
+    
+    # Fragments are reused until the bus moves or the route catalog changes;
+    # only the stale ones go through the stop locator
+    fragments = [bus_fragments.peek(bus.bus_id, (bus.seq, version)) for bus in candidates]
+    stale = [i for i, fragment in enumerate(fragments) if fragment is None]
+    if stale:
+        packed = route_stops_cache.packed(db)
+        located = locate_buses(
+            [candidates[i].latitude for i in stale],
+            [candidates[i].longitude for i in stale],
+            packed.rows(candidates[i].route_id for i in stale),
+            packed,
+        )
+        for j, i in enumerate(stale):
+            bus = candidates[i]
+            fragments[i] = bus_fragments.get(
+                bus.bus_id, (bus.seq, version),
+                lambda: _bus_payload(bus, routes[bus.route_id], located.labels(j, routes[bus.route_id].names))
+            )
+    return list(zip(candidates, fragments))
+
+def _nearby_body(lat: float, lng: float, radius: float, limit: Optional[int], db: Session,
+                 rep: Representation = DEFAULT_REPRESENTATION) -> bytes:
+    """Serialized nearby buses, nearest first"""
+    # Concurrent requests from the same coalescing cell share one candidate
+    # scan; each then applies its own exact distances and limit
+    center_lat, center_lng, reach = _coalescing_window(lat, lng, radius)
+    version = route_stops_cache.version
+    key = (center_lat, center_lng, reach, version, fleet_state.nearby_version(center_lat, center_lng, reach))
+    shared = nearby_flight.do(key, lambda: _nearby_fragments(center_lat, center_lng, reach, version, db))
+
+    hits = []
+    for bus, fragment in shared:
+        distance = haversine_m(lat, lng, bus.latitude, bus.longitude)
+        if distance <= radius:
+            hits.append((distance, bus, fragment))
+    hits.sort(key=lambda hit: hit[0])
+    if limit is not None:
+        hits = hits[:limit]
+
+    return rep.array(
+        rep.with_fields(rep.convert(bus_fragments, bus.bus_id, (bus.seq, version), fragment), distance=round(distance, 1))
+        for distance, bus, fragment in hits
+    )
+
+def _optional_ints(values) -> list:
+    return [None if math.isnan(v) else int(v) for v in values.tolist()]
+
+def _eta_batch_response(matrix: EtaMatrix) -> ETABatchResponse:
+    return ETABatchResponse(
+        busIds=matrix.bus_ids,
+        stopIds=matrix.stop_ids,
+        etaSeconds=[_optional_ints(row) for row in matrix.seconds],
+        earliestSeconds=[_optional_ints(row) for row in matrix.earliest],
+        latestSeconds=[_optional_ints(row) for row in matrix.latest],
+        fixAgeSeconds=_optional_ints(matrix.fix_age),
+        lastUpdated=[value.isoformat() if value else None for value in matrix.last_updated]
+    )
+
 @router.get("/buses/nearby", response_model=List[BusResponse])
 def get_nearby_buses(
+    request: Request,
     lat: float,
     lng: float,
-    radius: int = 5000,
+    radius: int = Query(5000, gt=0, le=100000),
+    limit: Optional[int] = Query(None, gt=0, le=500),
+    rep: Representation = Depends(get_representation),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get nearby active buses"""
+    """Get active buses within `radius` meters, nearest first (optionally only the `limit` nearest)"""
     if current_user.role.value != "commuter":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Commuter role required."
         )
     
-    # Import required models
-    from app.models.trip import Route, Stop, Trip
-    
-    # Get active buses with their routes and current trip information
-    buses = db.query(Bus).join(Route, Bus.route_id == Route.id).filter(
-        Bus.is_active == True,
-        Bus.current_latitude.isnot(None),
-        Bus.current_longitude.isnot(None),
-        Route.is_active == True
-    ).all()
-    
-    # Strict: if none active, return empty list (avoid demo duplicates in production)
-    if not buses:
-        return []
-    
-    result = []
-    for bus in buses:
-        # Get route stops for this bus
-        route_stops = db.query(Stop).filter(
-            Stop.route_id == bus.route_id,
-            Stop.is_active == True
-        ).order_by(Stop.sequence_order).all()
-        
-        current_stop_name = "Route Start"
-        next_stop_name = "Route End"
-        
-        if route_stops:
-            # For now, use a simple logic: assume bus is at the first stop
-            # In a real system, you'd calculate the closest stop based on GPS coordinates
-            current_stop_name = route_stops[0].name
-            if len(route_stops) > 1:
-                next_stop_name = route_stops[1].name
-            
-            # Better logic: find closest stop to bus current location
-            if bus.current_latitude and bus.current_longitude:
-                min_distance = float('inf')
-                closest_stop_index = 0
-                
-                for i, stop in enumerate(route_stops):
-                    # Simple distance calculation (not precise, but works for demo)
-                    distance = ((bus.current_latitude - stop.latitude) ** 2 + 
-                              (bus.current_longitude - stop.longitude) ** 2) ** 0.5
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_stop_index = i
-                
-                current_stop_name = route_stops[closest_stop_index].name
-                if closest_stop_index + 1 < len(route_stops):
-                    next_stop_name = route_stops[closest_stop_index + 1].name
-        
-        # Use real route name or fallback to bus number
-        route_name = bus.route.name if bus.route else f"Bus {bus.bus_number}"
-        
-        result.append(BusResponse(
-            id=bus.id,
-            routeName=route_name,
-            currentStop=current_stop_name,
-            nextStop=next_stop_name,
-            latitude=bus.current_latitude,
-            longitude=bus.current_longitude,
-            speed=bus.speed or 0.0,
-            occupancy=bus.occupancy.value,
-            lastUpdated=bus.last_updated.isoformat() if bus.last_updated else datetime.utcnow().isoformat()
-        ))
+    # Unchanged polls end here: the ETag only moves when a bus in the query window does
+    fleet_state.ensure_loaded(db)
+    etag = make_etag(
+        "nearby", fleet_state.nearby_version(lat, lng, radius), route_stops_cache.version,
+        lat, lng, radius, limit, rep.variant
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
     
+    result = rep.response(_nearby_body(lat, lng, radius, limit, db, rep))
+    set_etag(result, etag)
     return result
 
+@router.get("/buses/stream")
+def stream_buses(
+    request: Request,
+    bbox: str = Query(..., description="minLng,minLat,maxLng,maxLat"),
+    current_user: User = Depends(get_stream_user)
+):
+    """Server-Sent Events stream of live buses inside a bounding box: a snapshot, then coalesced deltas"""
+    if current_user.role.value != "commuter":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Commuter role required."
+        )
+    
+    min_lat, min_lng, max_lat, max_lng = parse_bbox(bbox)
+    if max_lat - min_lat > MAX_STREAM_BBOX_DEG or max_lng - min_lng > MAX_STREAM_BBOX_DEG:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bbox may span at most {MAX_STREAM_BBOX_DEG} degrees per side"
+        )
+    
+    return StreamingResponse(
+        bus_events(request, (min_lat, min_lng, max_lat, max_lng)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/bus/{bus_id}/eta/{stop_id}", response_model=ETAResponse)
 def get_bus_eta(
     bus_id: int,
@@ -128,8 +273,92 @@ def get_bus_eta(
             detail="Access denied. Commuter role required."
         )
     
-    # Mock ETA calculation (in production, use real-time data and algorithms)
-    return ETAResponse(eta="5 minutes")
+    fleet_state.ensure_loaded(db)
+    try:
+        estimate = eta_engine.eta(bus_id, stop_id)
+    except EtaUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=e.reason
+        )
+    
+    return _eta_response(estimate)
+
+@router.get("/stops/{stop_id}/departures", response_model=DeparturesResponse)
+def get_stop_departures(
+    stop_id: int,
+    limit: int = Query(10, gt=0, le=50),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get the next buses expected at a stop, soonest first"""
+    if current_user.role.value != "commuter":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Commuter role required."
+        )
+    
+    routes = route_stops_cache.all(db)
+    location = route_stops_cache.stops(db).get(stop_id)
+    if location is None or location[0] not in routes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stop not found"
+        )
+    route_id, position = location
+    
+    fleet_state.ensure_loaded(db)
+    now = time.time()
+    departures = []
+    for expected, bus_id, bus_route_id in arrivals_index.departures(stop_id, limit=limit, now=now):
+        bus = fleet_state.get(bus_id)
+        route = routes.get(bus_route_id)
+        if bus is None or route is None:
+            continue
+        seconds = int(round(max(expected - now, 0.0)))
+        departures.append(DepartureResponse(
+            busId=bus_id,
+            busNumber=bus.bus_number,
+            routeId=bus_route_id,
+            routeName=route.route_name,
+            eta=_eta_text(seconds),
+            etaSeconds=seconds,
+            expectedAt=datetime.utcfromtimestamp(expected).isoformat()
+        ))
+    
+    return DeparturesResponse(
+        stopId=stop_id,
+        stopName=routes[route_id].names[position],
+        departures=departures
+    )
+
+@router.post("/eta/batch", response_model=ETABatchResponse)
+def get_eta_batch(
+    batch: ETABatchRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get an ETA matrix for several buses at several stops in one request"""
+    if current_user.role.value != "commuter":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Commuter role required."
+        )
+    
+    if not batch.stopIds or len(batch.stopIds) > MAX_BATCH_STOPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"stopIds must contain between 1 and {MAX_BATCH_STOPS} stops"
+        )
+    if batch.busIds is not None and len(batch.busIds) > MAX_BATCH_BUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"busIds must contain at most {MAX_BATCH_BUSES} buses"
+        )
+    
+    fleet_state.ensure_loaded(db)
+    matrix = eta_engine.eta_matrix(batch.stopIds, bus_ids=batch.busIds)
+    return _eta_batch_response(matrix)
 
 @router.post("/feedback")
 def submit_feedback(
@@ -170,6 +399,42 @@ def submit_feedback(
     )
     
     db.add(feedback)
+    bump(db, total_feedbacks=1)
     db.commit()
     
     return {"message": "Feedback submitted successfully"}
+
+@router.get("/bootstrap", response_model=CommuterBootstrapResponse)
+def get_commuter_bootstrap(
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius: int = Query(5000, gt=0, le=100000),
+    limit: Optional[int] = Query(None, gt=0, le=500),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Everything the commuter app loads on launch (profile, route catalog, nearby buses) in one request"""
+    if current_user.role.value != "commuter":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Commuter role required."
+        )
+    if (lat is None) != (lng is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="lat and lng must be given together"
+        )
+    
+    # The routes and nearby sections are the same cached bytes `/api/routes`
+    # and `/buses/nearby` serve, spliced in without re-serializing
+    nearby = b"null"
+    if lat is not None:
+        fleet_state.ensure_loaded(db)
+        nearby = _nearby_body(lat, lng, radius, limit, db)
+    
+    return FastJSONResponse(json_object(
+        user=dumps(UserResponse.model_validate(current_user).model_dump(mode="json")),
+        routes=public_routes_json(db),
+        nearbyBuses=nearby,
+        serverTime=dumps(datetime.utcnow().isoformat())
+    ))
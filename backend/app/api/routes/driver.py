@@ -1,18 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 from app.db.session import get_db
 from app.models.user import User
-from app.models.trip import Route, Trip, Bus, Stop, DriverRouteAssignment, OccupancyLevel
+from app.models.trip import Route, Trip, Bus, Stop, OccupancyLevel
 from app.api.deps import get_current_active_user
+from app.core.representation import DEFAULT_REPRESENTATION, Representation, get_representation
+from app.core.serialization import FastJSONResponse, FragmentCache, dumps, json_object
+from app.schemas.auth import UserResponse
 from app.schemas.common import LocationData
+from app.services.analytics import bump
+from app.services.driver_routes import driver_assignments
+from app.services.driver_stats import read_driver_stats, record_trip
+from app.services.fleet_state import fleet_state
+from app.services.route_catalog import CatalogSnapshot, route_catalog
+from app.services.trip_history import trip_history_item, trip_history_query
 from pydantic import BaseModel
 from datetime import datetime
 import uuid
-from sqlalchemy import func
 
 router = APIRouter()
 
+# Serialized `RouteResponse` objects keyed by route id
+route_fragments = FragmentCache()
+# Serialized assigned-route lists keyed by (driver id, representation)
+assigned_route_bodies = FragmentCache()
+
 class RouteResponse(BaseModel):
     id: int
     name: str
@@ -39,6 +52,9 @@ class DriverStatsResponse(BaseModel):
     totalTrips: int
     kmDriven: float
     passengers: int
+    drivingHours: float
+    onTimeRate: Optional[float]  # percent of scored stop arrivals; None before any were scored
+    averageLoad: Optional[float]  # mean reported occupancy, 0 (low) to 1 (high); None without reports
 
 class DriverTripHistoryItem(BaseModel):
     id: int
@@ -46,36 +62,33 @@ class DriverTripHistoryItem(BaseModel):
     routeName: str
     startTime: str
     endTime: Optional[str]
+    durationSeconds: Optional[float]
     status: str
     distance: float
 
-@router.get("/routes", response_model=List[RouteResponse])
-def get_assigned_routes(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Get routes assigned to the driver. If none explicitly assigned, return active routes as fallback."""
-    if current_user.role.value != "driver":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access denied. Driver role required."
-        )
-    
-    # Assigned route IDs
-    assigned_ids = [r.route_id for r in db.query(DriverRouteAssignment).filter(DriverRouteAssignment.driver_id == current_user.id).all()]
-    if assigned_ids:
-        routes = db.query(Route).filter(Route.id.in_(assigned_ids), Route.is_active == True).all()
-    else:
-        routes = db.query(Route).filter(Route.is_active == True).all()
-    
-    result = []
-    for route in routes:
-        stops = db.query(Stop).filter(
-            Stop.route_id == route.id,
-            Stop.is_active == True
-        ).order_by(Stop.sequence_order).all()
-        
-        route_data = {
+class DriverBootstrapResponse(BaseModel):
+    user: UserResponse
+    routes: List[RouteResponse]
+    activeTrip: ActiveTripResponse
+    stats: DriverStatsResponse
+    serverTime: str
+
+def _assigned_routes(db: Session, driver_id: int, rep: Representation = DEFAULT_REPRESENTATION) -> bytes:
+    """
+    Serialized routes assigned to a driver, or every active route when none
+    are; kept per driver until their assignments or the catalog change
+    """
+    assigned_ids = driver_assignments.route_ids(db, driver_id)
+    snapshot = route_catalog.snapshot(db)
+    return assigned_route_bodies.get(
+        (driver_id, rep.variant), (snapshot.version, assigned_ids),
+        lambda: _routes_body(snapshot, assigned_ids, rep), encode=lambda body: body
+    )
+
+def _routes_body(snapshot: CatalogSnapshot, assigned_ids: FrozenSet[int], rep: Representation) -> bytes:
+    routes = [route for route in snapshot.active_routes if not assigned_ids or route.id in assigned_ids]
+    return rep.array(
+        rep.convert(route_fragments, route.id, snapshot.version, route_fragments.get(route.id, snapshot.version, lambda: {
             "id": route.id,
             "name": route.name,
             "description": route.description or "",
@@ -86,12 +99,57 @@ def get_assigned_routes(
                     "latitude": stop.latitude,
                     "longitude": stop.longitude
                 }
-                for stop in stops
+                for stop in route.active_stops
             ]
-        }
-        result.append(route_data)
+        }))
+        for route in routes
+    )
+
+def _active_trip(db: Session, driver_id: int) -> ActiveTripResponse:
+    trip = db.query(Trip.trip_id, Trip.route_id).filter(
+        Trip.driver_id == driver_id,
+        Trip.status == "active"
+    ).first()
+
+    if not trip:
+        return ActiveTripResponse(tripId=None, routeId=None, status="inactive")
+
+    return ActiveTripResponse(
+        tripId=trip.trip_id,
+        routeId=trip.route_id,
+        status="active"
+    )
+
+def _driver_stats(db: Session, driver_id: int) -> DriverStatsResponse:
+    # One primary-key read of the counters `stop_trip` maintains
+    stats = read_driver_stats(db, driver_id)
+    if stats is None:
+        return DriverStatsResponse(totalTrips=0, kmDriven=0.0, passengers=0, drivingHours=0.0,
+                                   onTimeRate=None, averageLoad=None)
+
+    return DriverStatsResponse(
+        totalTrips=stats.trips,
+        kmDriven=round(stats.km_driven, 1),
+        passengers=stats.passengers,
+        drivingHours=round(stats.driving_seconds / 3600.0, 1),
+        onTimeRate=round(100.0 * stats.on_time_arrivals / stats.arrivals, 1) if stats.arrivals else None,
+        averageLoad=round(stats.load_score / stats.load_reports, 2) if stats.load_reports else None,
+    )
+
+@router.get("/routes", response_model=List[RouteResponse])
+def get_assigned_routes(
+    rep: Representation = Depends(get_representation),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get routes assigned to the driver. If none explicitly assigned, return active routes as fallback."""
+    if current_user.role.value != "driver":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Driver role required."
+        )
     
-    return result
+    return rep.response(_assigned_routes(db, current_user.id, rep))
 
 @router.post("/trip/start", response_model=TripStartResponse)
 def start_trip(
@@ -132,6 +190,7 @@ def start_trip(
         Bus.is_active == False
     ).first()
     
+    created_bus = bus is None
     if not bus:
         # Auto-create a virtual bus for this route
         from datetime import datetime
@@ -164,8 +223,10 @@ def start_trip(
     bus.is_active = True
     
     db.add(trip)
+    bump(db, total_trips=1, active_trips=1, active_buses=1, total_buses=1 if created_bus else 0)
     db.commit()
     db.refresh(trip)
+    fleet_state.update_from_bus(bus)
     
     return TripStartResponse(
         tripId=trip_id,
@@ -199,15 +260,19 @@ def stop_trip(
         )
     
     # Update trip status
+    end_time = datetime.utcnow()
+    record_trip(db, trip, end_time)
     trip.status = "completed"
-    trip.end_time = datetime.utcnow()
+    trip.end_time = end_time
     
     # Mark bus as inactive
     bus = db.query(Bus).filter(Bus.id == trip.bus_id).first()
+    bump(db, active_trips=-1, active_buses=-1 if bus and bus.is_active else 0)
     if bus:
         bus.is_active = False
     
     db.commit()
+    fleet_state.remove(trip.bus_id)
     
     return TripStopResponse(
         success=True,
@@ -249,6 +314,7 @@ def update_location(
         bus.last_updated = datetime.utcnow()
         
         db.commit()
+        fleet_state.update_from_bus(bus)
     
     return {"message": "Location updated successfully"}
 
@@ -264,38 +330,21 @@ def get_active_trip(
             detail="Access denied. Driver role required."
         )
 
-    trip = db.query(Trip).filter(
-        Trip.driver_id == current_user.id,
-        Trip.status == "active"
-    ).first()
-
-    if not trip:
-        return ActiveTripResponse(tripId=None, routeId=None, status="inactive")
-
-    return ActiveTripResponse(
-        tripId=trip.trip_id,
-        routeId=trip.route_id,
-        status="active"
-    )
+    return _active_trip(db, current_user.id)
 
 @router.get("/stats", response_model=DriverStatsResponse)
 def get_driver_stats(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Aggregated stats for driver profile: total trips, km driven, passengers."""
+    """Aggregated stats for driver profile: total trips, km driven, driving hours, on-time rate, load, passengers."""
     if current_user.role.value != "driver":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Driver role required."
         )
 
-    total_trips = db.query(func.count()).select_from(Trip).filter(Trip.driver_id == current_user.id).scalar() or 0
-    km_driven = db.query(func.coalesce(func.sum(Trip.distance_traveled), 0.0)).filter(Trip.driver_id == current_user.id).scalar() or 0.0
-    # Passengers not tracked explicitly; return 0 for now or derive from future ticketing
-    passengers = 0
-
-    return DriverStatsResponse(totalTrips=int(total_trips), kmDriven=float(km_driven), passengers=passengers)
+    return _driver_stats(db, current_user.id)
 
 @router.get("/trips", response_model=List[DriverTripHistoryItem])
 def get_driver_trip_history(
@@ -310,24 +359,33 @@ def get_driver_trip_history(
             detail="Access denied. Driver role required."
         )
 
-    trips = (
-        db.query(Trip)
+    # Route names come from the same query (driver_id, start_time index)
+    rows = (
+        trip_history_query(db)
         .filter(Trip.driver_id == current_user.id)
-        .order_by(Trip.start_time.desc())
+        .order_by(Trip.start_time.desc(), Trip.id.desc())
         .limit(min(max(limit, 1), 100))
         .all()
     )
 
-    items: List[DriverTripHistoryItem] = []
-    for t in trips:
-        items.append(DriverTripHistoryItem(
-            id=t.id,
-            tripId=t.trip_id,
-            routeName=f"Route {t.route_id}",
-            startTime=t.start_time.isoformat() if t.start_time else None,
-            endTime=t.end_time.isoformat() if t.end_time else None,
-            status=t.status.value if hasattr(t.status, 'value') else str(t.status),
-            distance=t.distance_traveled or 0.0,
-        ))
+    return [DriverTripHistoryItem(**trip_history_item(row)) for row in rows]
+
+@router.get("/bootstrap", response_model=DriverBootstrapResponse)
+def get_driver_bootstrap(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Everything the driver app loads on launch (profile, routes, active trip, stats) in one request"""
+    if current_user.role.value != "driver":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Driver role required."
+        )
 
-    return items
+    return FastJSONResponse(json_object(
+        user=dumps(UserResponse.model_validate(current_user).model_dump(mode="json")),
+        routes=_assigned_routes(db, current_user.id),
+        activeTrip=dumps(_active_trip(db, current_user.id).model_dump()),
+        stats=dumps(_driver_stats(db, current_user.id).model_dump()),
+        serverTime=dumps(datetime.utcnow().isoformat())
+    ))
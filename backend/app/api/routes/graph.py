@@ -8,6 +8,7 @@ from app.api.deps import get_db, get_current_user
 from app.models.user import User, UserRole
 from app.db.neo4j import get_neo4j_session
 from app.models.graph import GraphService, Stop, Route, Connection
+from app.services.graph_stops import graph_stops
 from neo4j import Session as Neo4jSession
 from typing import List, Dict, Any
 from pydantic import BaseModel
@@ -74,6 +75,7 @@ def create_stop(
     
     success = graph_service.create_stop(stop)
     if success:
+        graph_stops.invalidate()
         return {"message": "Stop created successfully", "stop_id": stop.id}
     else:
         raise HTTPException(status_code=500, detail="Failed to create stop")
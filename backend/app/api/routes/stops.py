@@ -0,0 +1,54 @@
+"""
+Stop search across route stops and the transit graph
+"""
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.db.session import get_db
+from app.models.user import User
+from app.api.deps import get_current_active_user
+from app.core.serialization import FastJSONResponse, dumps
+from app.services.stop_search import StopEntry, stop_search
+from pydantic import BaseModel
+
+router = APIRouter()
+
+class StopSearchResult(BaseModel):
+    id: str
+    source: str  # "route" or "graph"
+    name: str
+    latitude: float
+    longitude: float
+    routeId: Optional[int]
+    routeName: Optional[str]
+    stopType: Optional[str]
+    facilities: List[str]
+
+def _result(stop: StopEntry) -> dict:
+    return {
+        "id": stop.stop_id,
+        "source": stop.source,
+        "name": stop.name,
+        "latitude": stop.latitude,
+        "longitude": stop.longitude,
+        "routeId": stop.route_id,
+        "routeName": stop.route_name,
+        "stopType": stop.stop_type,
+        "facilities": list(stop.facilities)
+    }
+
+@router.get("/search", response_model=List[StopSearchResult])
+def search_stops(
+    q: str = Query("", max_length=100, description="Name, or the start of any word of it"),
+    facilities: Optional[str] = Query(None, description="Comma-separated facilities every result must have, e.g. shelter,wifi"),
+    limit: int = Query(10, gt=0, le=50),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Autocomplete stops by name, optionally only those with all the given facilities"""
+    required = [facility.strip() for facility in (facilities or "").split(",") if facility.strip()]
+    if not q.strip() and not required:
+        return FastJSONResponse(b"[]")
+
+    return FastJSONResponse(dumps([_result(stop) for stop in stop_search.search(db, q, required, limit)]))
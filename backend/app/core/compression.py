@@ -0,0 +1,183 @@
+"""
+Response compression: gzip / brotli negotiation, an ASGI middleware and precompressed versioned bodies
+"""
+
+import gzip
+import zlib
+from typing import Callable, Hashable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.representation import Representation
+from app.core.serialization import FragmentCache
+from app.core.singleflight import SingleFlight
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies are sent as they are
+
+# Per-response compression favours speed; precompressed bodies are
+# compressed once per version, so they get the slowest, smallest setting
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+PRECOMPRESSED_GZIP_LEVEL = 9
+PRECOMPRESSED_BROTLI_QUALITY = 11
+
+# Streams must reach the client as they are written; media is already compressed
+UNCOMPRESSED_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/gzip", "application/zip")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """`br` or `gzip`, whichever available one the client ranks highest (br on ties); None for identity"""
+    ranks = {}
+    for coding in accept_encoding.split(","):
+        name, *params = (part.strip() for part in coding.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            ranks[name.lower()] = q
+    wildcard = ranks.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        q = ranks.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, precompressed: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=PRECOMPRESSED_BROTLI_QUALITY if precompressed else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=PRECOMPRESSED_GZIP_LEVEL if precompressed else GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor for bodies sent in several chunks; each chunk is flushed so it can be decoded on arrival"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.chunk = lambda data: self.compressor.process(data) + self.compressor.flush()
+            self.finish = self.compressor.finish
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+            self.chunk = lambda data: self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self.compressor.flush
+
+
+class CompressionMiddleware:
+    """
+    Compresses HTTP responses of at least `minimum_size` bytes with the
+    client's preferred encoding. Responses that already carry a
+    Content-Encoding (precompressed bodies) and event streams pass through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        stream: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is not None:
+                chunk = stream.chunk(body) if body else b""
+                if not more_body:
+                    chunk += stream.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+
+            # First body message: decide for the whole response
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or content_type.startswith(UNCOMPRESSED_TYPES)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                stream = _StreamCompressor(encoding)
+                body = stream.chunk(body)
+            else:
+                body = compress(body, encoding)
+                headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# Identity and compressed bodies of versioned payloads, keyed by (key, variant, encoding)
+compressed_bodies = FragmentCache(max_entries=1024)
+# Concurrent misses for one body and version share a single build or compression
+compression_flight = SingleFlight()
+
+
+def _cached_body(key: Hashable, version: Hashable, build: Callable[[], bytes],
+                 encode: Callable[[bytes], bytes]) -> bytes:
+    body = compressed_bodies.peek(key, version)
+    if body is not None:
+        return body
+    return compression_flight.do(
+        (key, version), lambda: compressed_bodies.get(key, version, build, encode=encode)
+    )
+
+
+def precompressed_response(request: Request, rep: Representation, key: Hashable, version: Hashable,
+                           build: Callable[[], bytes]) -> Response:
+    """
+    `rep.response(build())` for a body that only changes with `version`:
+    the body is built once per version and compressed once per version
+    and encoding, even when many requests miss at once, so repeat requests
+    only pick bytes out of memory
+    """
+    body = _cached_body((key, rep.variant, None), version, build, encode=lambda content: content)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is not None and len(body) >= COMPRESSION_MIN_SIZE:
+        body = _cached_body(
+            (key, rep.variant, encoding), version, lambda: body,
+            encode=lambda content: compress(content, encoding, precompressed=True)
+        )
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=rep.media_type, headers=headers)
@@ -28,6 +28,17 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Saarthi Bus Tracker API"
     DEBUG: bool = True
+    FLEET_GRID_CELL_DEG: float = 0.01  # ~1.1 km grid cells for the live bus index
+    FLEET_RESYNC_SECONDS: int = 30
+    NEARBY_COALESCE_CELL_DEG: float = 0.002  # nearby-bus queries in one ~220 m cell share a scan
+    ETA_DEFAULT_SPEED_KMH: float = 18.0  # prior speed when no graph travel time is known
+    ETA_DWELL_SECONDS: int = 20  # prior dwell time added per stop
+    STREAM_TICK_SECONDS: float = 1.0  # SSE deltas are coalesced over this interval
+    STREAM_HEARTBEAT_SECONDS: int = 15
+    INVALIDATION_POLL_SECONDS: float = 1.0  # how soon other workers' cache invalidations apply here
+    ONTIME_DEFAULT_FREQUENCY_MINUTES: int = 15  # scheduled headway of routes without a graph frequency
+    ONTIME_TOLERANCE_MINUTES: int = 5  # a stop arrival is on time within this much of the scheduled headway
+    ONTIME_FLUSH_SECONDS: float = 10.0  # recorded stop arrivals reach the rollups within this interval
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,45 @@
+"""
+Conditional GET helpers: version-derived ETags and 304 responses
+"""
+
+import hashlib
+import secrets
+from typing import Any
+
+from fastapi import Request, Response, status
+
+# Clients may keep responses but must revalidate them on every poll
+CACHE_CONTROL = "private, no-cache"
+
+# Versions come from per-process counters that two workers can reach while
+# holding different state; the nonce keeps their ETags from colliding
+PROCESS_NONCE = secrets.token_hex(8)
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from this process and the versions and parameters a response is derived from"""
+    digest = hashlib.blake2b("|".join(str(part) for part in (PROCESS_NONCE, *parts)).encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
@@ -0,0 +1,177 @@
+"""
+Sparse fieldsets (`fields=`) and JSON / MessagePack content negotiation
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+import msgpack
+import orjson
+from fastapi import HTTPException, Query, Request, Response, status
+
+from app.core.serialization import FragmentCache, dumps, json_array, json_object, with_fields
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+MAX_FIELD_PATHS = 64
+
+# Selected keys of an object; None selects the whole value under a key
+FieldTree = Dict[str, Optional["FieldTree"]]
+
+
+def parse_fields(fields: str) -> FieldTree:
+    """Parse `id,name,stops.id,stops.latitude` into a tree of selected keys"""
+    paths = [path.strip() for path in fields.split(",") if path.strip()]
+    if not paths or len(paths) > MAX_FIELD_PATHS or any("" in path.split(".") for path in paths):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fields must be 1-{MAX_FIELD_PATHS} comma-separated names, with dots for nested fields"
+        )
+    tree: FieldTree = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for part in parents:
+            if part in node and node[part] is None:
+                break  # the whole parent is already selected
+            node = node.setdefault(part, {})
+        else:
+            node[leaf] = None
+    return tree
+
+
+def project(value: Any, tree: Optional[FieldTree]) -> Any:
+    """Keep only the selected keys of an object, or of every object in a list"""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: project(item, tree[key]) for key, item in value.items() if key in tree}
+    return value
+
+
+def _accepts_msgpack(accept: str) -> bool:
+    """True when the Accept header ranks MessagePack above (or level with a wildcard for) JSON"""
+    msgpack_q = json_q = 0.0
+    json_explicit = False
+    for media_range in accept.split(","):
+        media, *params = (part.strip() for part in media_range.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media = media.lower()
+        if media in MSGPACK_ALIASES:
+            msgpack_q = max(msgpack_q, q)
+        elif media in (JSON, "application/*", "*/*"):
+            if media == JSON and q >= json_q:
+                json_explicit = True
+            json_q = max(json_q, q)
+    return msgpack_q > 0 and (msgpack_q > json_q or (msgpack_q == json_q and not json_explicit))
+
+
+def _msgpack_header(count: int, fix: int, short: int) -> bytes:
+    if count < 16:
+        return bytes([fix | count])
+    if count < 0x10000:
+        return bytes([short]) + count.to_bytes(2, "big")
+    return bytes([short + 1]) + count.to_bytes(4, "big")
+
+
+def _msgpack_map_with_fields(fragment: bytes, fields: Dict[str, Any]) -> bytes:
+    """Append entries to a packed map by rewriting its length header"""
+    head = fragment[0]
+    if 0x80 <= head <= 0x8f:
+        count, offset = head & 0x0f, 1
+    elif head == 0xde:
+        count, offset = int.from_bytes(fragment[1:3], "big"), 3
+    elif head == 0xdf:
+        count, offset = int.from_bytes(fragment[1:5], "big"), 5
+    else:
+        raise ValueError("fragment is not a MessagePack map")
+    extra = msgpack.packb(fields)[len(_msgpack_header(len(fields), 0x80, 0xde)):]
+    return _msgpack_header(count + len(fields), 0x80, 0xde) + fragment[offset:] + extra
+
+
+class Representation:
+    """
+    How a response is returned: which fields, in which format.
+
+    Endpoints that serve cached JSON fragments keep doing so for the
+    default representation; other representations are derived from those
+    fragments once and cached beside them under `variant`, so a projected
+    or MessagePack listing costs the same as a full JSON one when warm.
+    """
+
+    def __init__(self, fields: Optional[str] = None, media_type: str = JSON):
+        self.fields = parse_fields(fields) if fields is not None else None
+        self.media_type = media_type
+        canonical = ",".join(sorted(path.strip() for path in fields.split(",") if path.strip())) if fields is not None else None
+        self.variant: Hashable = None if canonical is None and media_type == JSON else (media_type, canonical)
+
+    @property
+    def is_default(self) -> bool:
+        return self.variant is None
+
+    def encode(self, content: Any) -> bytes:
+        content = project(content, self.fields)
+        if self.media_type == MSGPACK:
+            return msgpack.packb(content)
+        return dumps(content)
+
+    def convert(self, cache: FragmentCache, key: Hashable, version: Hashable, fragment: bytes) -> bytes:
+        """This representation of a cached full JSON fragment"""
+        if self.is_default:
+            return fragment
+        return cache.get((key, self.variant), version, lambda: orjson.loads(fragment), encode=self.encode)
+
+    def array(self, fragments: Iterable[bytes]) -> bytes:
+        if self.media_type == MSGPACK:
+            fragments = list(fragments)
+            return _msgpack_header(len(fragments), 0x90, 0xdc) + b"".join(fragments)
+        return json_array(fragments)
+
+    def object(self, **members: Any) -> bytes:
+        """An envelope object; `bytes` members are already in this representation, others are encoded unprojected"""
+        if self.media_type == MSGPACK:
+            return _msgpack_header(len(members), 0x80, 0xde) + b"".join(
+                msgpack.packb(key) + (value if isinstance(value, bytes) else msgpack.packb(value))
+                for key, value in members.items()
+            )
+        return json_object(**{key: value if isinstance(value, bytes) else dumps(value) for key, value in members.items()})
+
+    def with_fields(self, fragment: bytes, **fields: Any) -> bytes:
+        """Append request-specific fields to an object fragment, unless projected away"""
+        if self.fields is not None:
+            fields = {key: value for key, value in fields.items() if key in self.fields}
+            if not fields:
+                return fragment
+        if self.media_type == MSGPACK:
+            return _msgpack_map_with_fields(fragment, fields)
+        return with_fields(fragment, **fields)
+
+    def response(self, content: Any) -> Response:
+        """`content` is bytes already in this representation, or a value to project and encode"""
+        body = content if isinstance(content, bytes) else self.encode(content)
+        return Response(content=body, media_type=self.media_type, headers={"Vary": "Accept"})
+
+
+DEFAULT_REPRESENTATION = Representation()
+
+
+def get_representation(
+    request: Request,
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return; dots select nested fields, e.g. id,stops.id"
+    )
+) -> Representation:
+    """Dependency: `fields=` projection plus `Accept: application/msgpack` negotiation"""
+    media_type = MSGPACK if _accepts_msgpack(request.headers.get("accept", "")) else JSON
+    if fields is None and media_type == JSON:
+        return DEFAULT_REPRESENTATION
+    return Representation(fields, media_type)
@@ -0,0 +1,96 @@
+"""
+orjson response path and versioned caches of serialized JSON fragments
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+
+import orjson
+from fastapi import Response
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered with orjson. Pre-serialized `bytes` are sent as is,
+    so endpoints returning it bypass `response_model` validation entirely;
+    the model then only documents the schema.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    """Join serialized JSON values into one array"""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def json_object(**members: bytes) -> bytes:
+    """Join serialized JSON values into one object under the given keys"""
+    return b"{" + b",".join(dumps(key) + b":" + value for key, value in members.items()) + b"}"
+
+
+def with_fields(fragment: bytes, **fields: Any) -> bytes:
+    """Append request-specific fields to a serialized JSON object"""
+    extra = orjson.dumps(fields)
+    if fragment == b"{}":
+        return extra
+    return fragment[:-1] + b"," + extra[1:]
+
+
+class FragmentCache:
+    """
+    Serialized JSON per entity, reused while the entity's version is unchanged.
+
+    Versions are any comparable value that changes whenever the fragment
+    would (e.g. a fleet `seq` paired with the route catalog version). Entries
+    for deleted entities are only reclaimed by `clear()` or once `max_entries`
+    is reached, which is fine for fleets and route catalogs.
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.entries: Dict[Hashable, Tuple[Hashable, bytes]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], Any],
+            encode: Callable[[Any], bytes] = dumps) -> bytes:
+        """Cached fragment for `key` at `version`, serializing `build()` on a miss"""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        fragment = encode(build())
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries[key] = (version, fragment)
+        return fragment
+
+    def put_many(self, entries: Iterable[Tuple[Hashable, Hashable, bytes]]) -> None:
+        """Store (key, version, fragment) entries built by the caller in bulk"""
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+            self.entries.update((key, (version, fragment)) for key, version, fragment in entries)
+
+    def peek(self, key: Hashable, version: Hashable):
+        """Cached fragment if present at this version, else None"""
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def discard(self, key: Hashable) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
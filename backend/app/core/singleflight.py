@@ -0,0 +1,78 @@
+"""
+Request coalescing: concurrent callers with the same key share one computation
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    For sync endpoints (run in the threadpool): while a computation for a key
+    is in flight, other threads asking for the same key block until it
+    finishes and receive its result or exception. Nothing is cached once
+    the call completes.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, _Call] = {}
+        self.lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """The same for async endpoints; callers await the leader's future"""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.calls.get(key)
+        if future is not None:
+            # Shielded so that a cancelled follower does not cancel the leader
+            return await asyncio.shield(future)
+        future = self.calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await fn()
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self.calls[key]
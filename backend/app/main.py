@@ -2,6 +2,7 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import socketio
 import uvicorn
 import time
@@ -11,17 +12,28 @@ from app.core.config import settings
 from app.core.logging import logger
 from app.core.rate_limiting import rate_limit_middleware
 from app.core.security import SecurityHeaders
-from app.api.routes import auth, driver, commuter, authority, graph
+from app.api.routes import auth, driver, commuter, authority, graph, stops
 from app.realtime.socket import sio_app
 from app.db.session import get_db, SessionLocal
 from app.models.trip import Route, Stop
 from app.models.user import User, UserRole
 from app.core.security import get_password_hash
+from app.core.compression import CompressionMiddleware, precompressed_response
+from app.core.representation import Representation, get_representation
+from app.core.singleflight import AsyncSingleFlight
+from app.services.analytics import seed_counters
+from app.services.eta import eta_engine
+from app.services.fleet_state import fleet_state
+from app.services.graph_stops import graph_stops
+from app.services.invalidation import cache_invalidator
+from app.services.ontime import on_time_recorder
+from app.services.route_catalog import build_public_routes, build_public_routes_delta, route_catalog
+from app.services.stop_search import stop_search
 from sqlalchemy.exc import SQLAlchemyError
 import os
 from sqlalchemy.orm import Session
-from typing import List
-from fastapi import Depends
+from typing import List, Optional
+from fastapi import Depends, Query
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -43,8 +55,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Catalog-Version", "X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimated"],
 )
 
+app.add_middleware(CompressionMiddleware)
+
 app.middleware("http")(rate_limit_middleware("api"))
 
 @app.middleware("http")
@@ -67,41 +82,37 @@ app.include_router(driver.router, prefix=f"{settings.API_V1_STR}/driver", tags=[
 app.include_router(commuter.router, prefix=f"{settings.API_V1_STR}/commuter", tags=["Commuter"])
 app.include_router(authority.router, prefix=f"{settings.API_V1_STR}/authority", tags=["Authority"])
 app.include_router(graph.router, prefix=f"{settings.API_V1_STR}/graph", tags=["Graph"])
+app.include_router(stops.router, prefix=f"{settings.API_V1_STR}/stops", tags=["Stops"])
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "message": "Saarthi API is running"}
 
+public_routes_flight = AsyncSingleFlight()
+
 @app.get("/api/routes")
-async def get_routes(db: Session = Depends(get_db)):
-    """Get all active routes (public endpoint)"""
-    routes = db.query(Route).filter(Route.is_active == True).all()
-    
-    result = []
-    for route in routes:
-        stops = db.query(Stop).filter(
-            Stop.route_id == route.id,
-            Stop.is_active == True
-        ).order_by(Stop.sequence_order).all()
-        
-        stops_data = [
-            {
-                "id": stop.id,
-                "name": stop.name,
-                "latitude": stop.latitude,
-                "longitude": stop.longitude,
-                "sequence_order": stop.sequence_order
-            }
-            for stop in stops
-        ]
-        
-        result.append({
-            "id": route.id,
-            "name": route.name,
-            "description": route.description,
-            "stops": stops_data
-        })
-    
+async def get_routes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Catalog version the client holds (X-Catalog-Version)"),
+    rep: Representation = Depends(get_representation),
+    db: Session = Depends(get_db)
+):
+    """Get all active routes (public endpoint), or with `since` only what changed after that catalog version"""
+    # Served from the catalog snapshot; only after a route/stop change is it
+    # reloaded, once for all concurrent requests and off the event loop
+    snapshot = route_catalog.current
+    if snapshot is None:
+        snapshot = await public_routes_flight.do(
+            route_catalog.version, lambda: run_in_threadpool(route_catalog.snapshot, db)
+        )
+    if since is None:
+        # Compressed once per catalog version, off the event loop
+        result = await run_in_threadpool(
+            precompressed_response, request, rep, "routes", snapshot.version, lambda: build_public_routes(snapshot, rep)
+        )
+    else:
+        result = rep.response(build_public_routes_delta(snapshot, since, rep))
+    result.headers["X-Catalog-Version"] = str(snapshot.change_version)
     return result
 
 asgi = socketio.ASGIApp(sio_app, other_asgi_app=app)
@@ -130,5 +141,74 @@ def ensure_default_authority():
     finally:
         db.close()
 
+@app.on_event("startup")
+def ensure_analytics_counters():
+    """Seed analytics counters missing from databases built without migrations."""
+    db = SessionLocal()
+    try:
+        seed_counters(db)
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to seed analytics counters: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_cache_invalidator():
+    """Apply cache invalidations committed by other workers; started before any cache is filled."""
+    cache_invalidator.start()
+
+@app.on_event("shutdown")
+def stop_cache_invalidator():
+    cache_invalidator.stop()
+
+@app.on_event("startup")
+def start_on_time_recorder():
+    """Store detected stop arrivals and roll up their on-time scores in the background."""
+    on_time_recorder.start()
+
+@app.on_event("shutdown")
+def stop_on_time_recorder():
+    on_time_recorder.stop()
+
+@app.on_event("startup")
+def load_fleet_state():
+    """Hydrate the live fleet state so the first nearby-bus queries hit memory."""
+    db = SessionLocal()
+    try:
+        fleet_state.load(db)
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to load fleet state: {e}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def warm_eta_engine():
+    """Load graph travel-time priors and route stops before live fixes arrive."""
+    try:
+        eta_engine.warm()
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to warm the ETA engine: {e}")
+
+@app.on_event("startup")
+def start_graph_stops_refresher():
+    """Load graph stops in the background; readers never wait on Neo4j."""
+    graph_stops.start()
+
+@app.on_event("shutdown")
+def stop_graph_stops_refresher():
+    graph_stops.stop()
+
+@app.on_event("startup")
+def build_stop_search():
+    """Build the stop search index so the first autocomplete keystroke hits memory."""
+    db = SessionLocal()
+    try:
+        stop_search.current(db)
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to build stop search index: {e}")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:asgi", host="0.0.0.0", port=8000, reload=True)
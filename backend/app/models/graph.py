@@ -206,6 +206,49 @@ class GraphService:
             print(f"Error getting routes through stop: {e}")
             return []
 
+    def get_all_stops(self) -> List[Dict]:
+        """Every stop node with its coordinates, type and facilities"""
+        try:
+            query = """
+            MATCH (s:Stop)
+            WHERE s.latitude IS NOT NULL AND s.longitude IS NOT NULL
+            RETURN s.id as stop_id, s.name as stop_name, s.latitude as latitude,
+                   s.longitude as longitude, s.stop_type as stop_type,
+                   s.facilities as facilities
+            """
+            result = self.session.run(query)
+            return [record.data() for record in result]
+        except Exception as e:
+            print(f"Error getting all stops: {e}")
+            return []
+
+    def get_connection_times(self) -> List[Dict]:
+        """Travel time and distance of every CONNECTS edge, keyed by stop names"""
+        try:
+            query = """
+            MATCH (a:Stop)-[c:CONNECTS]->(b:Stop)
+            RETURN a.name as from_name, b.name as to_name,
+                   c.travel_time as travel_time, c.distance as distance
+            """
+            result = self.session.run(query)
+            return [record.data() for record in result]
+        except Exception as e:
+            print(f"Error getting connection times: {e}")
+            return []
+
+    def get_route_frequencies(self) -> List[Dict]:
+        """Scheduled frequency (minutes between buses) of every route node"""
+        try:
+            query = """
+            MATCH (r:Route)
+            RETURN r.id as route_id, r.name as name, r.number as number, r.frequency as frequency
+            """
+            result = self.session.run(query)
+            return [record.data() for record in result]
+        except Exception as e:
+            print(f"Error getting route frequencies: {e}")
+            return []
+
     def calculate_eta(self, bus_location: Dict, target_stop: str, route_id: str) -> int:
         """Calculate estimated time of arrival in minutes"""
         try:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Enum, Boolean, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text, Enum, Boolean, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -32,6 +32,12 @@ class Bus(Base):
     route = relationship("Route", back_populates="buses")
     trips = relationship("Trip", back_populates="bus")
 
+    __table_args__ = (
+        # Keyset pagination of the authority bus list by id
+        Index('ix_buses_route_id_id', 'route_id', 'id'),
+        Index('ix_buses_is_active_id', 'is_active', 'id'),
+    )
+
 class Route(Base):
     __tablename__ = "routes"
     
@@ -78,6 +84,15 @@ class Trip(Base):
     bus = relationship("Bus", back_populates="trips")
     route = relationship("Route", back_populates="trips")
 
+    __table_args__ = (
+        # Keyset pagination of trip history, newest first
+        Index('ix_trips_start_time_id', 'start_time', 'id'),
+        Index('ix_trips_driver_id_start_time_id', 'driver_id', 'start_time', 'id'),
+        Index('ix_trips_route_id_start_time_id', 'route_id', 'start_time', 'id'),
+        # Active trip per bus for the live fleet listing
+        Index('ix_trips_status_bus_id', 'status', 'bus_id'),
+    )
+
 class Feedback(Base):
     __tablename__ = "feedbacks"
     
@@ -92,6 +107,11 @@ class Feedback(Base):
     commuter = relationship("User")
     bus = relationship("Bus")
 
+    __table_args__ = (
+        # Occupancy reports on a bus during one of its trips (driver load stats)
+        Index('ix_feedbacks_bus_id_created_at', 'bus_id', 'created_at'),
+    )
+
 class DriverRouteAssignment(Base):
     __tablename__ = "driver_route_assignments"
 
@@ -103,3 +123,75 @@ class DriverRouteAssignment(Base):
     __table_args__ = (
         UniqueConstraint('driver_id', 'route_id', name='uq_driver_route'),
     )
+
+class CatalogChange(Base):
+    """One row per route/stop mutation; the latest id is the catalog version clients sync against"""
+    __tablename__ = "catalog_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String(10), nullable=False)  # "route" or "stop"
+    entity_id = Column(Integer, nullable=False)
+    route_id = Column(Integer, index=True, nullable=True)  # no foreign key: deletions are logged too
+    action = Column(String(10), nullable=False)  # "create", "update" or "delete"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class CacheInvalidation(Base):
+    """Cache invalidations committed by one worker, applied by every other worker's poller"""
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(30), nullable=False)  # e.g. "route_catalog", "driver_routes"
+    key = Column(Integer, nullable=True)  # e.g. a driver id; None invalidates the whole scope
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class AnalyticsCounter(Base):
+    """Dashboard totals, kept current by the writes that change them (see app.services.analytics)"""
+    __tablename__ = "analytics_counters"
+
+    name = Column(String(30), primary_key=True)  # e.g. "total_trips", "active_buses"
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class StopArrival(Base):
+    """A bus passing a stop of its route, as detected from its live fixes"""
+    __tablename__ = "stop_arrivals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    route_id = Column(Integer, nullable=False)  # no foreign keys: history outlives routes, stops and buses
+    stop_id = Column(Integer, nullable=False)
+    bus_id = Column(Integer, nullable=False)
+    arrived_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    __table_args__ = (
+        # Previous arrival at the same stop of the same route (headways)
+        Index('ix_stop_arrivals_route_id_stop_id_arrived_at', 'route_id', 'stop_id', 'arrived_at'),
+    )
+
+class OnTimeRollup(Base):
+    """Scored and on-time stop arrivals of one route in one UTC hour or day"""
+    __tablename__ = "ontime_rollups"
+
+    route_id = Column(Integer, primary_key=True)
+    granularity = Column(String(4), primary_key=True)  # "hour" or "day"
+    period_start = Column(DateTime(timezone=True), primary_key=True)
+    arrivals = Column(Integer, nullable=False, default=0)
+    on_time = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_ontime_rollups_granularity_period_start', 'granularity', 'period_start'),
+    )
+
+class DriverStats(Base):
+    """Per-driver totals, added to whenever the driver stops a trip (see app.services.driver_stats)"""
+    __tablename__ = "driver_stats"
+
+    driver_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    trips = Column(Integer, nullable=False, default=0)  # completed trips
+    km_driven = Column(Float, nullable=False, default=0.0)
+    driving_seconds = Column(Float, nullable=False, default=0.0)
+    arrivals = Column(Integer, nullable=False, default=0)  # scored stop arrivals
+    on_time_arrivals = Column(Integer, nullable=False, default=0)
+    load_reports = Column(Integer, nullable=False, default=0)  # commuter occupancy reports during trips
+    load_score = Column(Float, nullable=False, default=0.0)  # their sum: low 0, medium 0.5, high 1
+    passengers = Column(Integer, nullable=False, default=0)  # not tracked yet; ticketing can add to it
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
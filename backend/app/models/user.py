@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 import enum
@@ -20,3 +20,9 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # Keyset pagination of the authority user list, newest first
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+        Index('ix_users_role_created_at_id', 'role', 'created_at', 'id'),
+    )
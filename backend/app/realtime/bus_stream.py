@@ -0,0 +1,86 @@
+"""
+Server-Sent Events feed of live buses inside a viewport
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.fleet_state import BusPosition, fleet_state
+
+logger = logging.getLogger(__name__)
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lng, max_lat, max_lng)
+
+
+def _bus_payload(position: BusPosition) -> dict:
+    return {
+        "id": position.bus_id,
+        "busNumber": position.bus_number,
+        "routeId": position.route_id,
+        "latitude": position.latitude,
+        "longitude": position.longitude,
+        "speed": position.speed,
+        "heading": position.heading,
+        "occupancy": position.occupancy,
+        "lastUpdated": position.last_updated.isoformat() if position.last_updated else None,
+    }
+
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _resync_fleet() -> None:
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        fleet_state.ensure_loaded(db)
+    finally:
+        db.close()
+
+
+async def bus_events(request: Request, bbox: BBox) -> AsyncIterator[str]:
+    """
+    `snapshot` with every bus in the box, then at most one `delta` per tick
+    with buses that changed or entered (`updated`) and ones that left or went
+    inactive (`removed`). Ticks where nothing in the box changed cost one
+    window-version lookup; idle streams get a comment line as heartbeat.
+    """
+    sent: Dict[int, int] = {}  # bus_id -> seq last sent
+    version: Optional[int] = None
+    last_write = time.monotonic()
+    yield f"retry: {int(settings.STREAM_TICK_SECONDS * 3000)}\n\n"
+    while not await request.is_disconnected():
+        if time.monotonic() - fleet_state.loaded_at >= fleet_state.resync_seconds:
+            try:
+                await run_in_threadpool(_resync_fleet)
+            except Exception as e:
+                logger.error(f"Fleet resync for bus stream failed: {e}")
+
+        current = fleet_state.bbox_version(*bbox)
+        if current != version:
+            positions = fleet_state.within_bbox(*bbox)
+            if version is None:
+                message = _event("snapshot", {"buses": [_bus_payload(p) for p in positions]})
+            else:
+                updated = [_bus_payload(p) for p in positions if sent.get(p.bus_id) != p.seq]
+                removed = sorted(set(sent) - {p.bus_id for p in positions})
+                message = _event("delta", {"updated": updated, "removed": removed}) if updated or removed else None
+            version = current
+            sent = {p.bus_id: p.seq for p in positions}
+            if message is not None:
+                last_write = time.monotonic()
+                yield message
+
+        if time.monotonic() - last_write >= settings.STREAM_HEARTBEAT_SECONDS:
+            last_write = time.monotonic()
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(settings.STREAM_TICK_SECONDS)
@@ -1,7 +1,18 @@
+import asyncio
 import socketio
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
+from urllib.parse import parse_qs
 import json
 from datetime import datetime
+from app.core.security import verify_token
+from app.db.session import SessionLocal
+from app.models.trip import Trip, TripStatus
+from app.models.user import User, UserRole
+from app.services.fleet_state import fleet_state
+
+# How long a driver connection's active-trip bus is trusted before it is looked up again
+TRIP_RECHECK_SECONDS = 30
 
 # Create Socket.IO server
 sio_app = socketio.AsyncServer(
@@ -25,6 +36,8 @@ async def connect(sid, environ, auth):
     print(f"Client {sid} connected")
     print(f"Auth data: {auth}")
     print(f"Environment: {environ.get('HTTP_ORIGIN', 'No origin')}")
+    driver_id = await asyncio.to_thread(_driver_from_token, _connect_token(environ, auth))
+    await sio_app.save_session(sid, {"driver_id": driver_id, "bus_id": None, "checked_at": 0.0})
     await sio_app.emit("server:connected", {"message": "Connected to Saarthi API", "sid": sid}, to=sid)
 
 @sio_app.event
@@ -51,7 +64,8 @@ async def join_room(sid, data):
                 "connected_at": data.get("timestamp")
             }
             
-            # Join specific room
+            # Join the role-wide broadcast room and the user-specific room
+            await sio_app.enter_room(sid, user_type)
             room_name = f"{user_type}_{user_id}"
             await sio_app.enter_room(sid, room_name)
             await sio_app.emit("room_joined", {"room": room_name}, to=sid)
@@ -61,10 +75,85 @@ async def join_room(sid, data):
         print(f"Error joining room: {e}")
         await sio_app.emit("error", {"message": "Failed to join room"}, to=sid)
 
+def _connect_token(environ: Dict[str, Any], auth: Any) -> Optional[str]:
+    """Access token from the Socket.IO auth payload, an Authorization header or an `access_token` query parameter"""
+    if isinstance(auth, dict) and auth.get("token"):
+        return str(auth["token"])
+    header = environ.get("HTTP_AUTHORIZATION", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    tokens = parse_qs(environ.get("QUERY_STRING", "")).get("access_token")
+    return tokens[0] if tokens else None
+
+def _driver_from_token(token: Optional[str]) -> Optional[int]:
+    """Id of the active driver the token belongs to, None for anyone else"""
+    payload = verify_token(token) if token else None
+    if not payload or payload.get("sub") is None:
+        return None
+    db = SessionLocal()
+    try:
+        user = db.query(User.id, User.role, User.is_active).filter(User.id == int(payload["sub"])).first()
+        if user is None or not user.is_active or user.role != UserRole.DRIVER:
+            return None
+        return user.id
+    finally:
+        db.close()
+
+def _active_trip_bus(driver_id: int) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        trip = db.query(Trip.bus_id).filter(
+            Trip.driver_id == driver_id,
+            Trip.status == TripStatus.ACTIVE
+        ).first()
+        return trip.bus_id if trip else None
+    finally:
+        db.close()
+
+async def _driver_bus(sid) -> Optional[int]:
+    """Bus of the active trip of the driver this connection authenticated as, rechecked every TRIP_RECHECK_SECONDS"""
+    session = await sio_app.get_session(sid)
+    driver_id = session.get("driver_id")
+    if driver_id is None:
+        return None
+    now = time.monotonic()
+    if now - session["checked_at"] >= TRIP_RECHECK_SECONDS:
+        session["bus_id"] = await asyncio.to_thread(_active_trip_bus, driver_id)
+        session["checked_at"] = now
+        await sio_app.save_session(sid, session)
+    return session["bus_id"]
+
+def _apply_location_fix(bus_id: int, data: Dict[str, Any]) -> None:
+    """Feed a socket location payload for `bus_id` into the live fleet state"""
+    latitude = data.get("latitude", data.get("lat"))
+    longitude = data.get("longitude", data.get("lng"))
+    if latitude is None or longitude is None:
+        return
+    fleet_state.apply_fix(
+        bus_id,
+        float(latitude),
+        float(longitude),
+        speed=data.get("speed"),
+        heading=data.get("heading"),
+    )
+
 @sio_app.event
 async def driver_location_update(sid, data):
-    """Handle driver location updates"""
+    """Handle driver location updates from a driver connection, for the bus of their active trip"""
     try:
+        bus_id = await _driver_bus(sid)
+        if bus_id is None:
+            await sio_app.emit("error", {"message": "Location updates require a driver with an active trip"}, to=sid)
+            return
+        claimed = data.get("bus_id", data.get("busId"))
+        if claimed is not None and str(claimed) != str(bus_id):
+            await sio_app.emit("error", {"message": "Location update is not for your active trip's bus"}, to=sid)
+            return
+        data = {**data, "bus_id": bus_id}
+        # Fleet listeners (ETA projection, clustering, stats) may load the
+        # catalog or graph priors; keep that off the event loop
+        await asyncio.to_thread(_apply_location_fix, bus_id, data)
+        
         # Broadcast to commuters and authority
         await sio_app.emit("bus:location", data, room="commuters")
         await sio_app.emit("bus:location", data, room="authority")
@@ -162,3 +251,10 @@ async def broadcast_feedback(bus_id: str, feedback_data: Dict[str, Any]):
         "feedback": feedback_data,
         "timestamp": str(datetime.utcnow())
     }, room="authority")
+
+async def broadcast_catalog_version(version: int):
+    """Announce a new route/stop catalog version so every client fetches `/api/routes?since=`"""
+    await sio_app.emit("catalog:version", {
+        "version": version,
+        "timestamp": str(datetime.utcnow())
+    })
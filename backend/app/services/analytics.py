@@ -0,0 +1,112 @@
+"""
+Analytics rollups: dashboard counters kept current by the writes that change
+them, and the fleet's average speed maintained from live position changes
+"""
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.trip import AnalyticsCounter, Bus, Feedback, Trip, TripStatus
+from app.services.fleet_state import BusPosition, fleet_state
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("total_trips", "active_trips", "total_buses", "active_buses", "total_feedbacks")
+
+
+def bump(db: Session, **deltas: int) -> None:
+    """
+    Add `deltas` to their counters in the caller's transaction, so a counter
+    changes exactly when the rows it counts do. The increment happens in the
+    database, so concurrent writers never lose each other's updates.
+    """
+    for name, delta in deltas.items():
+        if delta:
+            db.execute(
+                update(AnalyticsCounter)
+                .where(AnalyticsCounter.name == name)
+                .values(value=AnalyticsCounter.value + delta)
+            )
+
+
+def recompute_counters(db: Session) -> Dict[str, int]:
+    """
+    Recount every counter from its source table (full scans) and commit.
+    For backfills and for repairing drift after writes that bypass the API,
+    such as seed scripts; run it while those tables are quiet, since a write
+    committed during the recount can be counted twice or not at all.
+    """
+    counts = {
+        "total_trips": db.query(Trip).count(),
+        "active_trips": db.query(Trip).filter(Trip.status == TripStatus.ACTIVE).count(),
+        "total_buses": db.query(Bus).count(),
+        "active_buses": db.query(Bus).filter(Bus.is_active == True).count(),
+        "total_feedbacks": db.query(Feedback).count(),
+    }
+    for name, value in counts.items():
+        db.merge(AnalyticsCounter(name=name, value=value))
+    db.commit()
+    logger.info(f"Analytics counters recomputed: {counts}")
+    return counts
+
+
+def seed_counters(db: Session) -> None:
+    """
+    Create missing counters by recounting, for databases built without the
+    migration's backfill (e.g. `create_all` in development). Run at startup,
+    never on the request path; when several workers race, one seeds.
+    """
+    present = {name for (name,) in db.query(AnalyticsCounter.name).all()}
+    if all(name in present for name in COUNTERS):
+        return
+    try:
+        recompute_counters(db)
+    except IntegrityError:
+        db.rollback()  # another worker seeded them first
+
+
+def read_counters(db: Session) -> Dict[str, int]:
+    """Current counter values: one primary-key read of five rows; a missing counter reads 0"""
+    counts = dict(db.query(AnalyticsCounter.name, AnalyticsCounter.value).all())
+    missing = [name for name in COUNTERS if name not in counts]
+    if missing:
+        logger.warning(f"Analytics counters missing, reported as 0: {missing}; run recompute_analytics.py")
+    return {name: counts.get(name, 0) for name in COUNTERS}
+
+
+class LiveSpeed:
+    """
+    Mean speed of the buses in the fleet state, kept as a running sum that
+    every position change adjusts, so reading it is O(1)
+    """
+
+    def __init__(self):
+        self.speeds: Dict[int, float] = {}
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def on_change(self, bus_id: int, position: Optional[BusPosition]) -> None:
+        with self.lock:
+            self.total -= self.speeds.pop(bus_id, 0.0)
+            if position is not None:
+                speed = position.speed or 0.0
+                self.speeds[bus_id] = speed
+                self.total += speed
+            if not self.speeds:
+                self.total = 0.0  # drop accumulated float error whenever the fleet empties
+
+    def average(self) -> float:
+        with self.lock:
+            return self.total / len(self.speeds) if self.speeds else 0.0
+
+
+# Global live speed aggregate, fed by every fleet state change
+live_speed = LiveSpeed()
+fleet_state.subscribe(live_speed.on_change)
+for _position in fleet_state.all():
+    live_speed.on_change(_position.bus_id, _position)
@@ -0,0 +1,96 @@
+"""
+Per-stop arrivals index backing departure boards
+"""
+
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.services.eta import EtaEngine, eta_engine
+from app.services.fleet_state import BusPosition, fleet_state
+from app.services.route_stops import route_stops_cache
+
+logger = logging.getLogger(__name__)
+
+OVERDUE_GRACE_SECONDS = 120  # buses past their expected arrival stay on the board this long
+
+# (expected arrival epoch, bus_id, route_id), kept sorted per stop
+Arrival = Tuple[float, int, int]
+
+
+class ArrivalsIndex:
+    """
+    Sorted expected arrivals per stop, maintained incrementally.
+
+    Each fleet position change replaces the bus's entries on the boards of
+    the stops it has yet to reach, so a departure board read is a bisect
+    plus a slice regardless of fleet size. Arrivals are stored as absolute
+    times, so boards count down between fixes without being touched.
+    """
+
+    def __init__(self, engine: EtaEngine):
+        self.engine = engine
+        self.boards: Dict[int, List[Arrival]] = {}
+        self.entries: Dict[int, List[Tuple[int, Arrival]]] = {}  # bus_id -> [(stop_id, arrival)]
+        self.version = -1
+        self.lock = threading.Lock()
+
+    def _remove_bus(self, bus_id: int) -> None:
+        for stop_id, arrival in self.entries.pop(bus_id, ()):
+            board = self.boards.get(stop_id)
+            if not board:
+                continue
+            i = bisect.bisect_left(board, arrival)
+            if i < len(board) and board[i] == arrival:
+                del board[i]
+            if not board:
+                del self.boards[stop_id]
+
+    def _insert_bus(self, bus_id: int, upcoming: Optional[tuple]) -> None:
+        if upcoming is None:
+            return
+        route_id, stop_ids, epochs = upcoming
+        entries = []
+        for stop_id, epoch in zip(stop_ids.tolist(), epochs.tolist()):
+            arrival = (epoch, bus_id, route_id)
+            bisect.insort(self.boards.setdefault(stop_id, []), arrival)
+            entries.append((stop_id, arrival))
+        self.entries[bus_id] = entries
+
+    def _sync_version(self) -> None:
+        """Rebuild every board after stops changed; entries may refer to moved stops"""
+        version = route_stops_cache.version
+        if version == self.version:
+            return
+        self.boards = {}
+        bus_ids = list(self.entries) if self.version >= 0 else list(self.engine.progress)
+        self.entries = {}
+        for bus_id in bus_ids:
+            self._insert_bus(bus_id, self.engine.upcoming(bus_id))
+        self.version = version
+
+    def on_position(self, bus_id: int, position: Optional[BusPosition]) -> None:
+        """Fleet listener; runs after the ETA engine has projected the fix"""
+        upcoming = self.engine.upcoming(bus_id) if position is not None else None
+        with self.lock:
+            self._sync_version()
+            self._remove_bus(bus_id)
+            self._insert_bus(bus_id, upcoming)
+
+    def departures(self, stop_id: int, limit: int = 10, now: Optional[float] = None) -> List[Arrival]:
+        """Next `limit` expected arrivals at a stop, soonest first"""
+        now = now or time.time()
+        with self.lock:
+            self._sync_version()
+            board = self.boards.get(stop_id)
+            if not board:
+                return []
+            start = bisect.bisect_left(board, (now - OVERDUE_GRACE_SECONDS,))
+            return board[start:start + limit]
+
+
+# Global arrivals index, fed after the ETA engine on every fleet position change
+arrivals_index = ArrivalsIndex(eta_engine)
+fleet_state.subscribe(arrivals_index.on_position)
@@ -0,0 +1,206 @@
+"""
+Hierarchical grid aggregates for zoom-aware map clustering
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.services.fleet_state import BusPosition, fleet_state
+from app.services.graph_stops import graph_stops
+from app.services.route_stops import route_stops_cache
+
+MAX_LEVEL = 18                    # finest level: ~34 m cells
+MAX_CELLS_PER_QUERY = 1024        # coarser levels are used until a viewport fits
+
+Cell = Tuple[int, int]
+
+
+def level_cell_deg(level: int) -> float:
+    """Cell size of a level: four cells per side of a web map tile at that zoom"""
+    return 360.0 / (1 << (level + 2))
+
+
+@dataclass(frozen=True)
+class Cluster:
+    latitude: float   # centroid
+    longitude: float
+    count: int
+    key: Optional[Hashable] = None  # the point itself when count == 1
+
+
+class ClusterGrid:
+    """
+    Point counts and coordinate sums on nested power-of-two grids, one per
+    zoom level. Each level's cells split exactly into four at the next, and
+    every insert, move or removal updates one cell per level, so a viewport
+    query only reads the aggregates of the cells it covers.
+
+    Points are also given integer handles whose per-cell sum identifies the
+    remaining point of a single-point cell without storing cell members.
+    """
+
+    def __init__(self, max_level: int = MAX_LEVEL):
+        self.max_level = max_level
+        self.cell_degs = [level_cell_deg(level) for level in range(max_level + 1)]
+        # [count, sum of latitudes, sum of longitudes, sum of handles] per cell
+        self.levels: List[Dict[Cell, list]] = [{} for _ in range(max_level + 1)]
+        self.points: Dict[Hashable, Tuple[float, float, int]] = {}
+        self.keys: Dict[int, Hashable] = {}
+        self.next_handle = 1
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _apply(self, lat: float, lng: float, handle: int, sign: int) -> None:
+        self._apply_from(lat, lng, handle, sign, self.cell_degs[0])
+
+    def _move(self, old_lat: float, old_lng: float, lat: float, lng: float, handle: int) -> None:
+        for cells, deg in zip(self.levels, self.cell_degs):
+            old_cell = (math.floor(old_lat / deg), math.floor(old_lng / deg))
+            cell = (math.floor(lat / deg), math.floor(lng / deg))
+            if old_cell != cell:
+                # Cells only get finer with level, so every remaining level moves too
+                self._apply_from(old_lat, old_lng, handle, -1, deg)
+                self._apply_from(lat, lng, handle, 1, deg)
+                return
+            agg = cells[cell]
+            agg[1] += lat - old_lat
+            agg[2] += lng - old_lng
+
+    def _apply_from(self, lat: float, lng: float, handle: int, sign: int, from_deg: float) -> None:
+        for cells, deg in zip(self.levels, self.cell_degs):
+            if deg > from_deg:
+                continue
+            cell = (math.floor(lat / deg), math.floor(lng / deg))
+            agg = cells.get(cell)
+            if agg is None:
+                agg = cells[cell] = [0, 0.0, 0.0, 0]
+            agg[0] += sign
+            if agg[0] == 0:
+                del cells[cell]
+                continue
+            agg[1] += sign * lat
+            agg[2] += sign * lng
+            agg[3] += sign * handle
+
+    def upsert(self, key: Hashable, lat: float, lng: float) -> None:
+        with self.lock:
+            previous = self.points.get(key)
+            if previous is None:
+                handle = self.next_handle
+                self.next_handle += 1
+                self.keys[handle] = key
+                self._apply(lat, lng, handle, 1)
+            elif previous[0] != lat or previous[1] != lng:
+                handle = previous[2]
+                self._move(previous[0], previous[1], lat, lng, handle)
+            else:
+                return
+            self.points[key] = (lat, lng, handle)
+
+    def remove(self, key: Hashable) -> bool:
+        with self.lock:
+            previous = self.points.pop(key, None)
+            if previous is None:
+                return False
+            self._apply(previous[0], previous[1], previous[2], -1)
+            del self.keys[previous[2]]
+            return True
+
+    def level_for(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                  zoom: int, max_cells: int = MAX_CELLS_PER_QUERY) -> int:
+        """The zoom's level, coarsened until the viewport covers at most `max_cells` cells"""
+        level = min(max(zoom, 0), self.max_level)
+        while level > 0:
+            deg = self.cell_degs[level]
+            span = (math.floor(max_lat / deg) - math.floor(min_lat / deg) + 1) * \
+                   (math.floor(max_lng / deg) - math.floor(min_lng / deg) + 1)
+            if span <= max_cells:
+                break
+            level -= 1
+        return level
+
+    def clusters(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float, level: int) -> List[Cluster]:
+        """Aggregates of the occupied cells of `level` overlapping a bounding box"""
+        deg = self.cell_degs[level]
+        lo_y, lo_x = math.floor(min_lat / deg), math.floor(min_lng / deg)
+        hi_y, hi_x = math.floor(max_lat / deg), math.floor(max_lng / deg)
+        with self.lock:
+            cells = self.levels[level]
+            if (hi_y - lo_y + 1) * (hi_x - lo_x + 1) > len(cells):
+                found = [agg for (y, x), agg in cells.items() if lo_y <= y <= hi_y and lo_x <= x <= hi_x]
+            else:
+                found = [
+                    cells[(y, x)]
+                    for y in range(lo_y, hi_y + 1)
+                    for x in range(lo_x, hi_x + 1)
+                    if (y, x) in cells
+                ]
+            return [
+                Cluster(
+                    latitude=agg[1] / agg[0],
+                    longitude=agg[2] / agg[0],
+                    count=agg[0],
+                    key=self.keys.get(agg[3]) if agg[0] == 1 else None,
+                )
+                for agg in found
+            ]
+
+
+class MapClusters:
+    """
+    Cluster grids for the authority map: live buses, kept current by fleet
+    updates, and stops from the route catalog plus the graph network,
+    rebuilt when either changes. Graph stop changes are rebuilt on the
+    graph refresher thread; a rebuild happens beside the grid in use, so
+    requests arriving meanwhile get the previous grid.
+    """
+
+    def __init__(self):
+        self.buses = ClusterGrid()
+        # (source versions, stop grid), replaced as one
+        self.stops_built: Tuple[Optional[Tuple[int, int]], ClusterGrid] = (None, ClusterGrid())
+        self.build_lock = threading.Lock()
+
+    def on_position(self, bus_id: int, position: Optional[BusPosition]) -> None:
+        """Fleet listener"""
+        if position is None:
+            self.buses.remove(bus_id)
+        else:
+            self.buses.upsert(bus_id, position.latitude, position.longitude)
+
+    def stop_grid(self, db: Optional[Session] = None) -> ClusterGrid:
+        """Stop clusters for the current route catalog and graph stops; never waits on the graph"""
+        routes = route_stops_cache.all(db)
+        graph_version, stops = graph_stops.current
+        version = (route_stops_cache.version, graph_version)
+        built_version, grid = self.stops_built
+        if version == built_version:
+            return grid
+        # Only the first build makes requests wait; later ones serve the previous grid
+        if not self.build_lock.acquire(blocking=built_version is None):
+            return grid
+        try:
+            built_version, grid = self.stops_built
+            if version != built_version:
+                grid = ClusterGrid()
+                for route in routes.values():
+                    for stop_id, lat, lng in zip(route.stop_ids.tolist(), route.latitudes.tolist(), route.longitudes.tolist()):
+                        grid.upsert(str(stop_id), lat, lng)
+                for stop in stops:
+                    grid.upsert(f"graph:{stop.stop_id}", stop.latitude, stop.longitude)
+                self.stops_built = (version, grid)
+            return grid
+        finally:
+            self.build_lock.release()
+
+
+# Global map clusters instance, fed by every fleet position change
+map_clusters = MapClusters()
+fleet_state.subscribe(map_clusters.on_position)
+graph_stops.subscribe(map_clusters.stop_grid)
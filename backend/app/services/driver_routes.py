@@ -0,0 +1,53 @@
+"""
+Route assignments per driver, cached until they change
+"""
+
+import threading
+from typing import Dict, FrozenSet, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.trip import DriverRouteAssignment
+from app.services.invalidation import cache_invalidator
+
+
+class DriverAssignments:
+    """
+    Route ids assigned to each driver, read once and kept until
+    `invalidate(driver_id)` (an assignment change) or `invalidate()` (e.g.
+    a route deletion that removed assignments of any driver). Other workers
+    apply the same invalidation through the cache invalidator.
+    """
+
+    def __init__(self):
+        self.assigned: Dict[int, FrozenSet[int]] = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def invalidate(self, driver_id: Optional[int] = None) -> None:
+        with self.lock:
+            self.generation += 1
+            if driver_id is None:
+                self.assigned.clear()
+            else:
+                self.assigned.pop(driver_id, None)
+
+    def route_ids(self, db: Session, driver_id: int) -> FrozenSet[int]:
+        assigned = self.assigned.get(driver_id)
+        if assigned is not None:
+            return assigned
+        generation = self.generation
+        assigned = frozenset(
+            route_id for (route_id,) in
+            db.query(DriverRouteAssignment.route_id).filter(DriverRouteAssignment.driver_id == driver_id).all()
+        )
+        with self.lock:
+            # Only keep it if no invalidation raced the read
+            if self.generation == generation:
+                self.assigned[driver_id] = assigned
+        return assigned
+
+
+# Global driver assignments cache
+driver_assignments = DriverAssignments()
+cache_invalidator.register("driver_routes", driver_assignments.invalidate)
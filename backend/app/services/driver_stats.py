@@ -0,0 +1,147 @@
+"""
+Driver statistics: one row per driver, added to when the driver stops a
+trip, so a profile load is a primary-key read
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.trip import DriverStats, Feedback, OccupancyLevel, Trip, TripStatus
+from app.services.eta import eta_engine
+from app.services.fleet_state import to_epoch
+from app.services.ontime import bus_arrivals, on_time_recorder
+
+logger = logging.getLogger(__name__)
+
+LOAD_SCORES = {OccupancyLevel.LOW: 0.0, OccupancyLevel.MEDIUM: 0.5, OccupancyLevel.HIGH: 1.0}
+
+
+def add_driver_stats(db: Session, driver_id: int, **deltas: float) -> None:
+    """
+    Add `deltas` (column name -> amount) to a driver's row in the caller's
+    transaction, creating the row if needed. The addition happens in the
+    database, so concurrent writers never lose each other's updates; a new
+    statistic is a `DriverStats` column plus a delta here.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(DriverStats).values(driver_id=driver_id, **deltas)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["driver_id"],
+            set_={
+                **{name: getattr(DriverStats, name) + getattr(statement.excluded, name) for name in deltas},
+                "updated_at": func.now(),
+            },
+        ))
+        return
+    current = db.get(DriverStats, driver_id)
+    if current is None:
+        db.add(DriverStats(driver_id=driver_id, **deltas))
+    else:
+        for name, delta in deltas.items():
+            setattr(current, name, getattr(current, name) + delta)
+
+
+def _trip_distance_km(route_id: int, stop_ids: np.ndarray) -> float:
+    """Along-route distance between the stops a bus passed, in passage order; going backwards adds nothing"""
+    offsets = eta_engine.stop_offsets(route_id, stop_ids)
+    offsets = offsets[~np.isnan(offsets)]
+    if len(offsets) < 2:
+        return 0.0
+    return float(np.clip(np.diff(offsets), 0.0, None).sum()) / 1000.0
+
+
+def _trip_measures(db: Session, trip: Trip, start: float, end: float, end_time: datetime) -> Dict[str, float]:
+    """Distance, scored and on-time arrivals, and load reports of a trip ending at `end_time`"""
+    measures: Dict[str, float] = {}
+    if trip.route_id is not None and trip.bus_id is not None:
+        stop_ids, _, scored, on_time = bus_arrivals(
+            db, trip.route_id, trip.bus_id, start, end, on_time_recorder.pending_arrivals(trip.bus_id)
+        )
+        measures.update(
+            km_driven=_trip_distance_km(trip.route_id, stop_ids),
+            arrivals=int(scored.sum()),
+            on_time_arrivals=int(on_time.sum()),
+        )
+    if trip.bus_id is not None:
+        reports = db.query(Feedback.occupancy, func.count(Feedback.id)).filter(
+            Feedback.bus_id == trip.bus_id,
+            Feedback.created_at >= trip.start_time,
+            Feedback.created_at <= end_time,
+        ).group_by(Feedback.occupancy).all()
+        measures.update(
+            load_reports=sum(count for _, count in reports),
+            load_score=sum(LOAD_SCORES.get(occupancy, 0.0) * count for occupancy, count in reports),
+        )
+    return measures
+
+
+def _measure_trip(db: Session, trip: Trip, start: float, end: float, end_time: datetime) -> Dict[str, float]:
+    """`_trip_measures`, or none when they fail"""
+    try:
+        # A savepoint, so a failed query does not abort the caller's transaction
+        with db.begin_nested():
+            return _trip_measures(db, trip, start, end, end_time)
+    except Exception as e:
+        logger.error(f"Trip {trip.trip_id} stats measures failed, counting the trip without them: {e}")
+        return {}
+
+
+def record_trip(db: Session, trip: Trip, end_time: datetime) -> None:
+    """
+    Add a trip ending at `end_time` to its driver's stats and set its
+    distance, in the caller's transaction: driving time, distance and
+    on-time arrivals from the stop arrivals its bus made meanwhile (stored,
+    or still buffered by this worker), and load from the occupancy reports
+    on its bus meanwhile. Arrivals still buffered by other workers, at most
+    ONTIME_FLUSH_SECONDS of them, do not count.
+
+    Never raises for the measures: when they fail, the trip is still
+    counted with its driving time, so stopping a trip cannot fail on stats.
+    """
+    start = to_epoch(trip.start_time)
+    end = to_epoch(end_time)
+    measures = _measure_trip(db, trip, start, end, end_time)
+
+    trip.distance_traveled = measures.get("km_driven", 0.0)
+    if trip.driver_id is None:
+        return
+    add_driver_stats(db, trip.driver_id, trips=1, driving_seconds=max(end - start, 0.0), **measures)
+
+
+def remove_trip(db: Session, trip: Trip) -> None:
+    """
+    Take a completed trip that is being deleted back out of its driver's
+    stats, in the caller's transaction: its stored distance and driving
+    time, and its arrivals and load measured again from what is stored.
+    Other trips are not counted, so they have nothing to take out.
+    """
+    if trip.status != TripStatus.COMPLETED or trip.driver_id is None or trip.end_time is None:
+        return
+    if db.get(DriverStats, trip.driver_id) is None:
+        return
+    start = to_epoch(trip.start_time)
+    end = to_epoch(trip.end_time)
+    measures = _measure_trip(db, trip, start, end, trip.end_time)
+    measures["km_driven"] = trip.distance_traveled or 0.0
+    add_driver_stats(
+        db, trip.driver_id, trips=-1, driving_seconds=-max(end - start, 0.0),
+        **{name: -value for name, value in measures.items()}
+    )
+
+
+def read_driver_stats(db: Session, driver_id: int) -> Optional[DriverStats]:
+    """A driver's stats row by primary key; None before their first completed trip"""
+    return db.get(DriverStats, driver_id)
@@ -0,0 +1,461 @@
+"""
+ETA engine: live positions projected onto routes plus learned segment travel times
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.fleet_state import BusPosition, fleet_state, to_epoch
+from app.services.route_stops import RouteStops, route_stops_cache
+from app.services.stop_locator import haversine_m, locate_buses
+
+logger = logging.getLogger(__name__)
+
+PRIOR_CV = 0.35            # coefficient of variation assumed for unlearned segments
+LEARNING_RATE = 0.2        # EWMA weight of a new traversal once warmed up
+MAX_FIX_GAP_SECONDS = 600  # longer gaps between fixes do not produce traversal samples
+MAX_SEGMENT_SPEED_MPS = 120 / 3.6
+Z_90 = 1.645               # two-sided 90% band
+
+# Called with (bus_id, position, [(stop_id, passed_at epoch)]) for the stops a fix shows the bus passed
+PassageListener = Callable[[int, BusPosition, List[Tuple[int, float]]], None]
+
+
+@dataclass
+class RouteTimes:
+    """Per-segment travel time estimates of one route with prefix sums"""
+    route_id: int
+    stop_ids: np.ndarray
+    stop_index: Dict[int, int]
+    cum_m: np.ndarray        # along-route meters at each stop [n]
+    seg_mean: np.ndarray     # seconds per segment [n-1]
+    seg_var: np.ndarray      # variance per segment [n-1]
+    seg_learned: np.ndarray  # 1 where the segment has observed traversals [n-1]
+    cum_time: np.ndarray = None
+    cum_var: np.ndarray = None
+    cum_learned: np.ndarray = None
+
+    def rebuild_prefix(self) -> None:
+        self.cum_time = np.concatenate(([0.0], np.cumsum(self.seg_mean)))
+        self.cum_var = np.concatenate(([0.0], np.cumsum(self.seg_var)))
+        self.cum_learned = np.concatenate(([0], np.cumsum(self.seg_learned)))
+
+    def offset(self, segment: int, fraction: float) -> Tuple[float, float]:
+        """(seconds, variance) from the first stop to a point on a segment"""
+        if len(self.seg_mean) == 0:
+            return 0.0, 0.0
+        segment = min(segment, len(self.seg_mean) - 1)
+        return (
+            self.cum_time[segment] + fraction * self.seg_mean[segment],
+            self.cum_var[segment] + fraction * self.seg_var[segment],
+        )
+
+
+@dataclass(frozen=True)
+class BusProgress:
+    """Where a bus is along its route as of its latest fix"""
+    route_id: int
+    cache_version: int
+    segment: int
+    fraction: float
+    along_m: float
+    next_stop: int           # -1 once the bus is past the last stop
+    fix_epoch: float
+    last_updated: Optional[datetime]
+    anchor_stop: int = -1    # last stop the bus was seen passing
+    anchor_epoch: float = 0.0
+
+
+@dataclass(frozen=True)
+class EtaEstimate:
+    seconds: int
+    earliest_seconds: int
+    latest_seconds: int
+    fix_age_seconds: int
+    last_updated: Optional[datetime]
+    basis: str               # "learned", "mixed" or "prior"
+
+
+@dataclass(frozen=True)
+class EtaMatrix:
+    """ETAs of many buses at many stops; NaN where a bus will not reach a stop"""
+    bus_ids: List[int]
+    stop_ids: List[int]
+    seconds: np.ndarray       # [buses, stops]
+    earliest: np.ndarray      # [buses, stops]
+    latest: np.ndarray        # [buses, stops]
+    fix_age: np.ndarray       # [buses], NaN for buses that are not active
+    last_updated: List[Optional[datetime]]
+
+
+class EtaUnavailable(Exception):
+    """Raised when no ETA can be given; `reason` is user-facing"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class EtaEngine:
+    """
+    Keeps every active bus projected onto its route and answers ETA lookups
+    in O(1) from per-route prefix sums of segment travel times.
+
+    Segment times are seeded from graph `CONNECTS.travel_time` (matched by
+    stop names) or from stop spacing at a default speed, then refined with an
+    EWMA of observed traversals between consecutive stop passages.
+    """
+
+    def __init__(self):
+        self.routes: Dict[int, RouteTimes] = {}
+        self.routes_version = -1
+        self.progress: Dict[int, BusProgress] = {}
+        self.learned: Dict[Tuple[int, int], Tuple[float, float, int]] = {}
+        self.graph_priors: Optional[Dict[Tuple[str, str], float]] = None
+        self.passage_listeners: List[PassageListener] = []
+        self.lock = threading.RLock()
+
+    def subscribe_passages(self, listener: PassageListener) -> None:
+        """Register a callback run (outside the engine lock) for every detected stop passage"""
+        self.passage_listeners.append(listener)
+
+    def warm(self) -> None:
+        """Load the graph priors and the route stops up front so the first fixes do no I/O"""
+        self._load_graph_priors()
+        route_stops_cache.packed()
+
+    # Priors
+
+    def _load_graph_priors(self) -> Dict[Tuple[str, str], float]:
+        if self.graph_priors is None:
+            priors = {}
+            try:
+                from app.db.neo4j import get_neo4j_session
+                from app.models.graph import GraphService
+
+                session = get_neo4j_session()
+                if session is not None:
+                    with session:
+                        for edge in GraphService(session).get_connection_times():
+                            if edge.get("travel_time"):
+                                key = (str(edge["from_name"]).lower(), str(edge["to_name"]).lower())
+                                priors[key] = float(edge["travel_time"])
+            except Exception as e:
+                logger.warning(f"Graph travel times unavailable, using default speeds: {e}")
+            self.graph_priors = priors
+        return self.graph_priors
+
+    def _build_route(self, route: RouteStops) -> RouteTimes:
+        n = len(route)
+        cum_m = np.zeros(n)
+        if n > 1:
+            cum_m[1:] = np.cumsum(haversine_m(route.latitudes[:-1], route.longitudes[:-1],
+                                              route.latitudes[1:], route.longitudes[1:]))
+        priors = self._load_graph_priors()
+        speed = settings.ETA_DEFAULT_SPEED_KMH / 3.6
+        seg_mean = np.zeros(max(n - 1, 0))
+        seg_var = np.zeros(max(n - 1, 0))
+        seg_learned = np.zeros(max(n - 1, 0), dtype=np.int64)
+        for k in range(n - 1):
+            key = (int(route.stop_ids[k]), int(route.stop_ids[k + 1]))
+            if key in self.learned:
+                seg_mean[k], seg_var[k], _ = self.learned[key]
+                seg_learned[k] = 1
+                continue
+            prior = priors.get((route.names[k].lower(), route.names[k + 1].lower()))
+            if prior is None:
+                prior = (cum_m[k + 1] - cum_m[k]) / speed + settings.ETA_DWELL_SECONDS
+            seg_mean[k] = prior
+            seg_var[k] = (PRIOR_CV * prior) ** 2
+        times = RouteTimes(
+            route_id=route.route_id,
+            stop_ids=route.stop_ids,
+            stop_index={int(stop_id): i for i, stop_id in enumerate(route.stop_ids)},
+            cum_m=cum_m,
+            seg_mean=seg_mean,
+            seg_var=seg_var,
+            seg_learned=seg_learned,
+        )
+        times.rebuild_prefix()
+        return times
+
+    def _route_times(self, route_id: int) -> Optional[RouteTimes]:
+        """Route times for the current route-stops cache contents, rebuilt after catalog changes"""
+        routes = route_stops_cache.all()
+        version = route_stops_cache.version
+        if version != self.routes_version:
+            self.routes = {}
+            self.routes_version = version
+        times = self.routes.get(route_id)
+        if times is None:
+            route = routes.get(route_id)
+            if route is None:
+                return None
+            times = self.routes[route_id] = self._build_route(route)
+        return times
+
+    # Learning
+
+    def _learn(self, times: RouteTimes, from_stop: int, to_stop: int, seconds: float) -> None:
+        """Fold an observed traversal from one stop to a later one into segment estimates"""
+        expected = times.cum_time[to_stop] - times.cum_time[from_stop]
+        distance = times.cum_m[to_stop] - times.cum_m[from_stop]
+        if seconds <= 0 or expected <= 0 or distance / seconds > MAX_SEGMENT_SPEED_MPS:
+            return
+        for k in range(from_stop, to_stop):
+            # Multi-segment gaps are split in proportion to the current estimates
+            observed = seconds * times.seg_mean[k] / expected
+            key = (int(times.stop_ids[k]), int(times.stop_ids[k + 1]))
+            mean, var, samples = self.learned.get(key, (times.seg_mean[k], times.seg_var[k], 0))
+            alpha = max(LEARNING_RATE, 1.0 / (samples + 2))
+            delta = observed - mean
+            mean = mean + alpha * delta
+            var = (1 - alpha) * (var + alpha * delta * delta)
+            self.learned[key] = (mean, var, samples + 1)
+            times.seg_mean[k] = mean
+            times.seg_var[k] = var
+            times.seg_learned[k] = 1
+        times.rebuild_prefix()
+
+    # Position updates
+
+    def observe(self, bus_id: int, position: Optional[BusPosition]) -> List[Tuple[int, float]]:
+        """
+        Project a new fix onto the bus's route. Returns the (stop index, epoch)
+        passages detected since the previous fix; passage listeners get them
+        with stop ids.
+        """
+        with self.lock:
+            passages = self._project(bus_id, position)
+            if not passages or not self.passage_listeners:
+                return passages
+            stop_ids = self.routes[position.route_id].stop_ids
+            passed = [(int(stop_ids[k]), passed_at) for k, passed_at in passages]
+        for listener in self.passage_listeners:
+            try:
+                listener(bus_id, position, passed)
+            except Exception as e:
+                logger.error(f"Passage listener failed for bus {bus_id}: {e}")
+        return passages
+
+    def _project(self, bus_id: int, position: Optional[BusPosition]) -> List[Tuple[int, float]]:
+        with self.lock:
+            if position is None or position.route_id is None:
+                self.progress.pop(bus_id, None)
+                return []
+            times = self._route_times(position.route_id)
+            if times is None:
+                self.progress.pop(bus_id, None)
+                return []
+            packed = route_stops_cache.packed()
+            located = locate_buses([position.latitude], [position.longitude],
+                                   packed.rows([position.route_id]), packed)
+            segment = int(located.segment[0])
+            if segment < 0:
+                self.progress.pop(bus_id, None)
+                return []
+            along = float(located.along_m[0])
+            fix_epoch = to_epoch(position.last_updated) or time.time()
+
+            passages = []
+            anchor_stop, anchor_epoch = -1, 0.0
+            previous = self.progress.get(bus_id)
+            if previous is not None and previous.route_id == position.route_id \
+                    and previous.cache_version == self.routes_version:
+                anchor_stop, anchor_epoch = previous.anchor_stop, previous.anchor_epoch
+                dt = fix_epoch - previous.fix_epoch
+                dm = along - previous.along_m
+                if 0 < dt <= MAX_FIX_GAP_SECONDS and dm > 0:
+                    # Stops whose along-route offset lies in [previous, current)
+                    first = int(np.searchsorted(times.cum_m, previous.along_m, side="left"))
+                    last = int(np.searchsorted(times.cum_m, along, side="left"))
+                    for k in range(first, last):
+                        passed_at = previous.fix_epoch + (times.cum_m[k] - previous.along_m) / dm * dt
+                        if 0 <= anchor_stop < k:
+                            self._learn(times, anchor_stop, k, passed_at - anchor_epoch)
+                        anchor_stop, anchor_epoch = k, passed_at
+                        passages.append((k, float(passed_at)))
+                elif dt > MAX_FIX_GAP_SECONDS or dm < 0:
+                    anchor_stop, anchor_epoch = -1, 0.0
+
+            self.progress[bus_id] = BusProgress(
+                route_id=position.route_id,
+                cache_version=self.routes_version,
+                segment=segment,
+                fraction=float(located.fraction[0]),
+                along_m=along,
+                next_stop=int(located.next[0]),
+                fix_epoch=fix_epoch,
+                last_updated=position.last_updated,
+                anchor_stop=anchor_stop,
+                anchor_epoch=anchor_epoch,
+            )
+            return passages
+
+    # Lookups
+
+    def _current(self, bus_id: int) -> Tuple[BusProgress, RouteTimes]:
+        progress = self.progress.get(bus_id)
+        if progress is not None and progress.cache_version != route_stops_cache.version:
+            # Stops changed since the last fix: re-project the latest position
+            self.observe(bus_id, fleet_state.get(bus_id))
+            progress = self.progress.get(bus_id)
+        if progress is None:
+            raise EtaUnavailable("Bus is not active")
+        times = self.routes.get(progress.route_id)
+        if times is None:
+            raise EtaUnavailable("Bus route is not active")
+        return progress, times
+
+    def eta(self, bus_id: int, stop_id: int, now: Optional[float] = None) -> EtaEstimate:
+        """ETA of a bus at a stop on its route"""
+        with self.lock:
+            progress, times = self._current(bus_id)
+            target = times.stop_index.get(stop_id)
+            if target is None:
+                raise EtaUnavailable("Stop is not on this bus's route")
+            if progress.next_stop < 0 or target < progress.next_stop:
+                raise EtaUnavailable("Bus has already passed this stop")
+
+            position_time, position_var = times.offset(progress.segment, progress.fraction)
+            travel = max(float(times.cum_time[target] - position_time), 0.0)
+            variance = max(float(times.cum_var[target] - position_var), 0.0)
+            segments = target - progress.segment
+            learned = int(times.cum_learned[target] - times.cum_learned[min(progress.segment, target)])
+
+        age = max((now or time.time()) - progress.fix_epoch, 0.0)
+        seconds = max(travel - age, 0.0)
+        spread = Z_90 * variance ** 0.5
+        if segments <= 0 or learned == segments:
+            basis = "learned" if segments > 0 else "prior"
+        else:
+            basis = "mixed" if learned else "prior"
+        return EtaEstimate(
+            seconds=int(round(seconds)),
+            earliest_seconds=int(round(max(seconds - spread, 0.0))),
+            # A stale fix may mean the bus is held up, so its age widens the late side
+            latest_seconds=int(round(seconds + spread + age)),
+            fix_age_seconds=int(age),
+            last_updated=progress.last_updated,
+            basis=basis,
+        )
+
+    def upcoming(self, bus_id: int) -> Optional[Tuple[int, np.ndarray, np.ndarray]]:
+        """(route id, stop ids, expected arrival epochs) for the stops a bus has yet to reach"""
+        with self.lock:
+            try:
+                progress, times = self._current(bus_id)
+            except EtaUnavailable:
+                return None
+            if progress.next_stop < 0:
+                return progress.route_id, times.stop_ids[:0], np.zeros(0)
+            position_time, _ = times.offset(progress.segment, progress.fraction)
+            travel = np.maximum(times.cum_time[progress.next_stop:] - position_time, 0.0)
+            return progress.route_id, times.stop_ids[progress.next_stop:], progress.fix_epoch + travel
+
+    def stop_offsets(self, route_id: int, stop_ids: np.ndarray) -> np.ndarray:
+        """Along-route meters of the given stops; NaN for stops not (or no longer) on the route"""
+        with self.lock:
+            times = self._route_times(route_id)
+            if times is None:
+                return np.full(len(stop_ids), np.nan)
+            return np.array([
+                times.cum_m[times.stop_index[stop_id]] if stop_id in times.stop_index else np.nan
+                for stop_id in stop_ids.tolist()
+            ], dtype=np.float64)
+
+    def eta_matrix(self, stop_ids: Sequence[int], bus_ids: Optional[Sequence[int]] = None,
+                   now: Optional[float] = None) -> EtaMatrix:
+        """
+        ETAs of every bus at every stop in one pass. Without `bus_ids`, all active
+        buses still to reach at least one of the stops are returned, soonest first.
+        """
+        stop_ids = [int(stop_id) for stop_id in stop_ids]
+        with self.lock:
+            if bus_ids is None:
+                stop_routes = route_stops_cache.stops()
+                wanted = {stop_routes[stop_id][0] for stop_id in stop_ids if stop_id in stop_routes}
+                bus_ids = [bus_id for bus_id, progress in self.progress.items() if progress.route_id in wanted]
+                upcoming_only = True
+            else:
+                upcoming_only = False
+            bus_ids = [int(bus_id) for bus_id in bus_ids]
+
+            # Bus side: route, next stop and offset from the first stop
+            n_buses = len(bus_ids)
+            bus_route = np.full(n_buses, -1, dtype=np.int64)
+            bus_next = np.full(n_buses, -1, dtype=np.int64)
+            bus_time = np.zeros(n_buses)
+            bus_var = np.zeros(n_buses)
+            fix_epoch = np.full(n_buses, np.nan)
+            last_updated = [None] * n_buses
+            for b, bus_id in enumerate(bus_ids):
+                try:
+                    progress, times = self._current(bus_id)
+                except EtaUnavailable:
+                    continue
+                bus_route[b] = progress.route_id
+                bus_next[b] = progress.next_stop
+                bus_time[b], bus_var[b] = times.offset(progress.segment, progress.fraction)
+                fix_epoch[b] = progress.fix_epoch
+                last_updated[b] = progress.last_updated
+
+            # Stop side: route, index and prefix sums (resolved after the buses,
+            # whose re-projection may rebuild route times)
+            stop_routes = route_stops_cache.stops()
+            n_stops = len(stop_ids)
+            stop_route = np.full(n_stops, -2, dtype=np.int64)
+            stop_index = np.zeros(n_stops, dtype=np.int64)
+            stop_time = np.zeros(n_stops)
+            stop_var = np.zeros(n_stops)
+            for s, stop_id in enumerate(stop_ids):
+                found = stop_routes.get(stop_id)
+                times = self._route_times(found[0]) if found is not None else None
+                if times is None:
+                    continue
+                stop_route[s] = found[0]
+                stop_index[s] = found[1]
+                stop_time[s] = times.cum_time[found[1]]
+                stop_var[s] = times.cum_var[found[1]]
+
+        reachable = (
+            (bus_route[:, None] == stop_route[None, :])
+            & (bus_next[:, None] >= 0)
+            & (stop_index[None, :] >= bus_next[:, None])
+        )
+        age = np.maximum((now or time.time()) - fix_epoch, 0.0)
+        travel = np.maximum(stop_time[None, :] - bus_time[:, None], 0.0)
+        spread = Z_90 * np.sqrt(np.maximum(stop_var[None, :] - bus_var[:, None], 0.0))
+        seconds = np.maximum(travel - age[:, None], 0.0)
+        earliest = np.maximum(seconds - spread, 0.0)
+        latest = seconds + spread + age[:, None]
+        seconds, earliest, latest = (np.where(reachable, np.rint(m), np.nan) for m in (seconds, earliest, latest))
+
+        if upcoming_only:
+            keep = np.flatnonzero(reachable.any(axis=1))
+            keep = keep[np.argsort(np.nanmin(seconds[keep], axis=1), kind="stable")]
+            bus_ids = [bus_ids[b] for b in keep]
+            last_updated = [last_updated[b] for b in keep]
+            seconds, earliest, latest, age = seconds[keep], earliest[keep], latest[keep], age[keep]
+
+        return EtaMatrix(
+            bus_ids=bus_ids,
+            stop_ids=stop_ids,
+            seconds=seconds,
+            earliest=earliest,
+            latest=latest,
+            fix_age=np.floor(age),
+            last_updated=last_updated,
+        )
+
+
+# Global ETA engine instance, fed by every fleet position change
+eta_engine = EtaEngine()
+fleet_state.subscribe(eta_engine.observe)
@@ -0,0 +1,218 @@
+"""
+In-memory live fleet state: latest fix per active bus plus a spatial index
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.trip import Bus
+from app.services.spatial_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+
+def to_epoch(value: Optional[datetime]) -> float:
+    """Seconds since epoch; naive datetimes are treated as UTC"""
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@dataclass(frozen=True)
+class BusPosition:
+    """Latest known fix for one active bus"""
+    bus_id: int
+    bus_number: str
+    route_id: Optional[int]
+    latitude: float
+    longitude: float
+    speed: float = 0.0
+    heading: Optional[float] = None
+    occupancy: str = "low"
+    last_updated: Optional[datetime] = None
+    seq: int = 0  # fleet generation at which this entry last changed
+    synced: bool = False  # read back from the database by a re-sync rather than received by this worker
+
+
+# Called with (bus_id, position) after a change; position is None when the bus left the fleet
+FleetListener = Callable[[int, Optional[BusPosition]], None]
+
+
+class FleetState:
+    """
+    Live positions of active buses, indexed on a uniform grid.
+
+    The database stays the source of truth: the state is hydrated from the
+    `buses` table and periodically re-synced so that writes made outside this
+    process (seed scripts, other workers) are picked up. Fixes applied here are
+    only replaced by database rows that are newer.
+    """
+
+    def __init__(self, cell_deg: float = 0.01, resync_seconds: float = 30):
+        self.index = GridIndex(cell_deg)
+        self.positions: Dict[int, BusPosition] = {}
+        self.generation = 0
+        self.resync_seconds = resync_seconds
+        self.loaded_at = 0.0
+        self.lock = threading.RLock()
+        self.listeners: List[FleetListener] = []
+
+    def subscribe(self, listener: FleetListener) -> None:
+        """Register a callback run (outside the state lock) after every position change"""
+        self.listeners.append(listener)
+
+    def _notify(self, changes: List[Tuple[int, Optional[BusPosition]]]) -> None:
+        for bus_id, position in changes:
+            for listener in self.listeners:
+                try:
+                    listener(bus_id, position)
+                except Exception as e:
+                    logger.error(f"Fleet listener failed for bus {bus_id}: {e}")
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Hydrate on first use and re-sync once the resync interval has elapsed"""
+        if time.monotonic() - self.loaded_at >= self.resync_seconds:
+            self.load(db)
+
+    def load(self, db: Session) -> None:
+        """Merge active buses with known coordinates from the database"""
+        buses = db.query(Bus).filter(
+            Bus.is_active == True,
+            Bus.current_latitude.isnot(None),
+            Bus.current_longitude.isnot(None)
+        ).all()
+        changes = []
+        with self.lock:
+            active_ids = set()
+            for bus in buses:
+                active_ids.add(bus.id)
+                current = self.positions.get(bus.id)
+                if current is not None and to_epoch(current.last_updated) >= to_epoch(bus.last_updated):
+                    # The in-memory fix is as fresh or fresher (e.g. delivered over the socket)
+                    continue
+                position = self._store(replace(self._from_bus(bus), synced=True))
+                changes.append((bus.id, position))
+            for bus_id in list(self.positions):
+                if bus_id not in active_ids:
+                    self._drop(bus_id)
+                    changes.append((bus_id, None))
+            self.loaded_at = time.monotonic()
+        self._notify(changes)
+        logger.debug(f"Fleet state loaded: {len(self.positions)} active buses")
+
+    @staticmethod
+    def _from_bus(bus: Bus) -> BusPosition:
+        return BusPosition(
+            bus_id=bus.id,
+            bus_number=bus.bus_number,
+            route_id=bus.route_id,
+            latitude=bus.current_latitude,
+            longitude=bus.current_longitude,
+            speed=bus.speed or 0.0,
+            heading=bus.heading,
+            occupancy=bus.occupancy.value if bus.occupancy else "low",
+            last_updated=bus.last_updated,
+        )
+
+    def _store(self, position: BusPosition) -> BusPosition:
+        self.generation += 1
+        position = replace(position, seq=self.generation)
+        self.positions[position.bus_id] = position
+        self.index.upsert(position.bus_id, position.latitude, position.longitude)
+        return position
+
+    def _drop(self, bus_id: int) -> bool:
+        if self.positions.pop(bus_id, None) is None:
+            return False
+        self.generation += 1
+        self.index.remove(bus_id)
+        return True
+
+    def update_from_bus(self, bus: Bus) -> Optional[BusPosition]:
+        """Reflect a just-committed `Bus` row; inactive or unplaced buses are dropped"""
+        with self.lock:
+            if not bus.is_active or bus.current_latitude is None or bus.current_longitude is None:
+                position = None
+                changed = self._drop(bus.id)
+                if not changed:
+                    # Not tracked here, but the row itself changed (e.g. activated
+                    # without a fix yet): fleet-wide listings must still refresh
+                    self.generation += 1
+            else:
+                position = self._store(self._from_bus(bus))
+                changed = True
+        if changed:
+            self._notify([(bus.id, position)])
+        return position
+
+    def apply_fix(self, bus_id: int, latitude: float, longitude: float,
+                  speed: Optional[float] = None, heading: Optional[float] = None,
+                  timestamp: Optional[datetime] = None) -> Optional[BusPosition]:
+        """Apply a live fix to a bus already known to be active; unknown buses are ignored"""
+        with self.lock:
+            current = self.positions.get(bus_id)
+            if current is None:
+                return None
+            position = self._store(replace(
+                current,
+                latitude=latitude,
+                longitude=longitude,
+                speed=current.speed if speed is None else speed,
+                heading=current.heading if heading is None else heading,
+                last_updated=timestamp or datetime.utcnow(),
+                synced=False,
+            ))
+        self._notify([(bus_id, position)])
+        return position
+
+    def remove(self, bus_id: int) -> bool:
+        with self.lock:
+            removed = self._drop(bus_id)
+        if removed:
+            self._notify([(bus_id, None)])
+        return removed
+
+    def get(self, bus_id: int) -> Optional[BusPosition]:
+        return self.positions.get(bus_id)
+
+    def all(self) -> List[BusPosition]:
+        with self.lock:
+            return list(self.positions.values())
+
+    def nearby(self, lat: float, lng: float, radius_m: float, limit: Optional[int] = None) -> List[Tuple[float, BusPosition]]:
+        """Buses within radius sorted by distance, optionally only the `limit` nearest"""
+        with self.lock:
+            if limit is not None:
+                hits = self.index.nearest(lat, lng, limit, max_radius_m=radius_m)
+            else:
+                hits = self.index.query_radius(lat, lng, radius_m)
+            return [(distance, self.positions[bus_id]) for distance, bus_id in hits]
+
+    def nearby_version(self, lat: float, lng: float, radius_m: float) -> int:
+        """Changes whenever any bus inside the radius query window moved, changed or left"""
+        with self.lock:
+            return self.index.window_version(*self.index.radius_bbox(lat, lng, radius_m))
+
+    def bbox_version(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> int:
+        with self.lock:
+            return self.index.window_version(min_lat, min_lng, max_lat, max_lng)
+
+    def within_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[BusPosition]:
+        with self.lock:
+            return [self.positions[bus_id] for bus_id in self.index.query_bbox(min_lat, min_lng, max_lat, max_lng)]
+
+
+# Global fleet state instance
+fleet_state = FleetState(
+    cell_deg=settings.FLEET_GRID_CELL_DEG,
+    resync_seconds=settings.FLEET_RESYNC_SECONDS,
+)
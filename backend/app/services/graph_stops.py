@@ -0,0 +1,123 @@
+"""
+Cached stop nodes of the Neo4j transit graph
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GRAPH_STOPS_REFRESH_SECONDS = 600
+
+
+@dataclass(frozen=True)
+class GraphStop:
+    stop_id: str
+    name: str
+    latitude: float
+    longitude: float
+    stop_type: Optional[str]
+    facilities: Tuple[str, ...]
+
+
+class GraphStopsCache:
+    """
+    Every graph stop, reloaded by a refresher thread when `invalidate()` is
+    called (graph stop writes) or after GRAPH_STOPS_REFRESH_SECONDS, so
+    readers never wait on the graph: `all()` returns the stops of the last
+    load (none before the first). `version` only moves when a reload returns
+    different stops; listeners then run on the refresher thread, so derived
+    indexes can rebuild there. An unreachable graph yields no stops.
+    """
+
+    def __init__(self):
+        # (version, stops), replaced as one so readers never pair a version with other stops
+        self.current: Tuple[int, List[GraphStop]] = (0, [])
+        self.loaded_at: Optional[float] = None
+        self.listeners: List[Callable[[], None]] = []
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        """Register a callback run on the refresher thread after the stops change"""
+        self.listeners.append(listener)
+
+    def invalidate(self) -> None:
+        self.loaded_at = None
+        self.wake.set()
+
+    def _load(self) -> List[GraphStop]:
+        stops = []
+        try:
+            from app.db.neo4j import get_neo4j_session
+            from app.models.graph import GraphService
+
+            session = get_neo4j_session()
+            if session is not None:
+                with session:
+                    for stop in GraphService(session).get_all_stops():
+                        stops.append(GraphStop(
+                            stop_id=str(stop["stop_id"]),
+                            name=stop.get("stop_name") or "",
+                            latitude=float(stop["latitude"]),
+                            longitude=float(stop["longitude"]),
+                            stop_type=stop.get("stop_type"),
+                            facilities=tuple(stop.get("facilities") or ()),
+                        ))
+        except Exception as e:
+            logger.warning(f"Graph stops unavailable: {e}")
+        return stops
+
+    def refresh_if_stale(self) -> bool:
+        """Reload when invalidated or stale; returns whether the stops changed"""
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < GRAPH_STOPS_REFRESH_SECONDS:
+            return False
+        self.loaded_at = time.monotonic()
+        stops = self._load()
+        version, current = self.current
+        if stops == current:
+            return False
+        self.current = (version + 1, stops)
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Graph stops listener failed: {e}")
+        return True
+
+    @property
+    def version(self) -> int:
+        return self.current[0]
+
+    def all(self) -> List[GraphStop]:
+        """Stops of the last load; never touches the graph"""
+        return self.current[1]
+
+    def _run(self) -> None:
+        while not self.stopping.is_set():
+            self.wake.clear()
+            self.refresh_if_stale()
+            self.wake.wait(GRAPH_STOPS_REFRESH_SECONDS)
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="graph-stops", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.wake.set()
+        self.thread.join(timeout=5)
+        self.thread = None
+
+
+# Global graph stops cache
+graph_stops = GraphStopsCache()
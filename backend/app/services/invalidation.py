@@ -0,0 +1,125 @@
+"""
+Cross-worker cache invalidation through the cache_invalidations table
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.trip import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+# A transaction can commit after rows with higher ids were already seen, so
+# each poll looks back this many ids and skips the ones already applied
+REORDER_WINDOW = 100
+RETENTION = timedelta(days=1)
+PRUNE_EVERY_POLLS = 3600
+
+
+class CacheInvalidator:
+    """
+    In-process caches live per worker. A mutation calls `publish()` inside
+    its transaction, so the invalidation commits with the data, and
+    invalidates its own worker's cache directly after committing; every
+    worker's poller thread applies rows committed elsewhere within
+    INVALIDATION_POLL_SECONDS by calling the handler registered for the
+    row's scope with its key (None meaning the whole cache).
+    """
+
+    def __init__(self, poll_seconds: float = settings.INVALIDATION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.handlers: Dict[str, Callable[[Optional[int]], None]] = {}
+        self.last_id: Optional[int] = None
+        self.applied: Set[int] = set()
+        self.polls = 0
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def register(self, scope: str, handler: Callable[[Optional[int]], None]) -> None:
+        self.handlers[scope] = handler
+
+    def publish(self, db: Session, scope: str, key: Optional[int] = None) -> None:
+        """Record an invalidation in the caller's transaction"""
+        db.add(CacheInvalidation(scope=scope, key=key))
+
+    def poll(self, db: Session) -> int:
+        """Apply invalidations committed since the last poll; returns how many were applied"""
+        if self.last_id is None:
+            # Caches start empty, so only later invalidations matter
+            self.last_id = db.query(func.max(CacheInvalidation.id)).scalar() or 0
+            self.applied = {
+                row_id for (row_id,) in
+                db.query(CacheInvalidation.id).filter(CacheInvalidation.id > self.last_id - REORDER_WINDOW).all()
+            }
+            return 0
+        rows = (
+            db.query(CacheInvalidation.id, CacheInvalidation.scope, CacheInvalidation.key)
+            .filter(CacheInvalidation.id > self.last_id - REORDER_WINDOW)
+            .order_by(CacheInvalidation.id)
+            .all()
+        )
+        applied = 0
+        for row_id, scope, key in rows:
+            if row_id in self.applied:
+                continue
+            self.applied.add(row_id)
+            self.last_id = max(self.last_id, row_id)
+            handler = self.handlers.get(scope)
+            if handler is None:
+                continue
+            try:
+                handler(key)
+                applied += 1
+            except Exception as e:
+                logger.error(f"Cache invalidation {scope}/{key} failed: {e}")
+        self.applied = {row_id for row_id in self.applied if row_id > self.last_id - REORDER_WINDOW}
+        return applied
+
+    def prune(self, db: Session) -> None:
+        """Drop rows every worker has long since applied"""
+        db.query(CacheInvalidation).filter(
+            CacheInvalidation.created_at < datetime.now(timezone.utc) - RETENTION
+        ).delete(synchronize_session=False)
+        db.commit()
+
+    def _run(self) -> None:
+        from app.db.session import SessionLocal
+
+        while True:
+            db = SessionLocal()
+            try:
+                self.poll(db)
+                self.polls += 1
+                if self.polls % PRUNE_EVERY_POLLS == 0:
+                    self.prune(db)
+            except SQLAlchemyError as e:
+                logger.warning(f"Cache invalidation poll failed: {e}")
+            finally:
+                db.close()
+            if self.stopping.wait(self.poll_seconds):
+                return
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="cache-invalidator", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join(timeout=self.poll_seconds * 2)
+        self.thread = None
+
+
+# Global cache invalidator instance
+cache_invalidator = CacheInvalidator()
@@ -0,0 +1,373 @@
+"""
+On-time performance: stop arrivals scored against each route's scheduled
+headway, rolled up per route per UTC hour and day
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.trip import OnTimeRollup, StopArrival
+from app.services.eta import eta_engine
+from app.services.fleet_state import BusPosition
+from app.services.route_catalog import route_catalog
+
+logger = logging.getLogger(__name__)
+
+HOUR, DAY = "hour", "day"
+GRANULARITY_SECONDS = {HOUR: 3600, DAY: 86400}
+# An arrival this long after the previous one at its stop starts a new
+# service span (first bus of the day, a suspended route) and is not scored
+SERVICE_GAP_SECONDS = 3 * 3600
+FREQUENCY_REFRESH_SECONDS = 600
+
+
+def arrival_epoch(db: Session):
+    """`stop_arrivals.arrived_at` as seconds since epoch (UTC), computed by the database"""
+    if db.get_bind().dialect.name == "sqlite":
+        return (func.julianday(StopArrival.arrived_at) - 2440587.5) * 86400.0
+    return func.extract("epoch", StopArrival.arrived_at)
+
+
+def score_arrivals(route_ids: np.ndarray, stop_ids: np.ndarray, epochs: np.ndarray,
+                   limits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (scored, on_time) masks for arrivals given in any order. An arrival is
+    scored when the route's previous arrival at the same stop came at most
+    SERVICE_GAP_SECONDS earlier, and on time when that headway is within its
+    limit (scheduled headway plus tolerance, in seconds).
+    """
+    order = np.lexsort((epochs, stop_ids, route_ids))
+    r, s, e = route_ids[order], stop_ids[order], epochs[order]
+    headway = np.diff(e)
+    scored = np.zeros(len(order), dtype=bool)
+    scored[1:] = (r[1:] == r[:-1]) & (s[1:] == s[:-1]) & (headway <= SERVICE_GAP_SECONDS)
+    on_time = np.zeros(len(order), dtype=bool)
+    on_time[1:] = scored[1:] & (headway <= limits[order][1:])
+    scored_out = np.empty_like(scored)
+    on_time_out = np.empty_like(on_time)
+    scored_out[order] = scored
+    on_time_out[order] = on_time
+    return scored_out, on_time_out
+
+
+def rollup(route_ids: np.ndarray, epochs: np.ndarray, on_time: np.ndarray,
+           granularity: str) -> List[dict]:
+    """Arrival and on-time counts per (route, period) for scored arrivals"""
+    if len(route_ids) == 0:
+        return []
+    width = GRANULARITY_SECONDS[granularity]
+    periods = (epochs // width).astype(np.int64)
+    first = periods.min()
+    span = int(periods.max() - first) + 1
+    # One integer key per (route, period): a 1-D unique sorts far faster than unique(axis=1)
+    keys, inverse = np.unique(route_ids.astype(np.int64) * span + (periods - first), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    arrivals = np.bincount(inverse, minlength=len(keys))
+    punctual = np.bincount(inverse, weights=on_time, minlength=len(keys))
+    return [
+        {
+            "route_id": route_id,
+            "granularity": granularity,
+            "period_start": datetime.utcfromtimestamp(period * width),
+            "arrivals": count,
+            "on_time": int(hits),
+        }
+        for route_id, period, count, hits in zip((keys // span).tolist(), (keys % span + first).tolist(),
+                                                 arrivals.tolist(), punctual.tolist())
+    ]
+
+
+def _add_to_rollups(db: Session, rows: List[dict]) -> None:
+    """Add counts to existing rollup rows, creating missing ones, in the caller's transaction"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(OnTimeRollup).values(rows)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["route_id", "granularity", "period_start"],
+            set_={
+                "arrivals": OnTimeRollup.arrivals + statement.excluded.arrivals,
+                "on_time": OnTimeRollup.on_time + statement.excluded.on_time,
+            },
+        ))
+        return
+    for row in rows:
+        current = db.get(OnTimeRollup, (row["route_id"], row["granularity"], row["period_start"]))
+        if current is None:
+            db.add(OnTimeRollup(**row))
+        else:
+            current.arrivals += row["arrivals"]
+            current.on_time += row["on_time"]
+
+
+class RouteFrequencies:
+    """
+    Scheduled minutes between buses per route, from the graph `Route`
+    nodes matched by name or number (case-insensitive); routes the graph
+    does not know use ONTIME_DEFAULT_FREQUENCY_MINUTES, as does every route
+    until the first load or when the graph is unreachable. Loading is a
+    network call, so only the flusher thread and offline recomputes do it
+    (after FREQUENCY_REFRESH_SECONDS); request paths read the loaded map.
+    """
+
+    def __init__(self):
+        self.by_name: Dict[str, float] = {}
+        self.loaded_at: Optional[float] = None
+
+    def _load(self) -> Dict[str, float]:
+        by_name = {}
+        try:
+            from app.db.neo4j import get_neo4j_session
+            from app.models.graph import GraphService
+
+            session = get_neo4j_session()
+            if session is not None:
+                with session:
+                    for route in GraphService(session).get_route_frequencies():
+                        if not route.get("frequency"):
+                            continue
+                        for label in (route.get("name"), route.get("number")):
+                            if label:
+                                by_name[str(label).lower()] = float(route["frequency"])
+        except Exception as e:
+            logger.warning(f"Graph route frequencies unavailable, using the default: {e}")
+        return by_name
+
+    def refresh_if_stale(self) -> None:
+        """Reload from the graph when FREQUENCY_REFRESH_SECONDS have passed; readers keep the old map meanwhile"""
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < FREQUENCY_REFRESH_SECONDS:
+            return
+        self.by_name = self._load()
+        self.loaded_at = time.monotonic()
+
+    def headway_limits(self, db: Session, route_ids: np.ndarray) -> np.ndarray:
+        """Longest on-time headway in seconds for each arrival's route"""
+        by_name = self.by_name
+        routes = route_catalog.snapshot(db).by_id
+        unique, inverse = np.unique(route_ids, return_inverse=True)
+        minutes = np.array([
+            by_name.get(routes[route_id].name.lower(), settings.ONTIME_DEFAULT_FREQUENCY_MINUTES)
+            if route_id in routes else settings.ONTIME_DEFAULT_FREQUENCY_MINUTES
+            for route_id in unique.tolist()
+        ], dtype=np.float64)
+        return ((minutes + settings.ONTIME_TOLERANCE_MINUTES) * 60.0)[inverse.reshape(-1)]
+
+
+def _prior_arrivals(db: Session, route_ids: Optional[List[int]], start: float, end: Optional[float] = None,
+                    with_bus: bool = False) -> np.ndarray:
+    """
+    (route_id, stop_id, epoch) rows of stored arrivals on these routes from
+    `start`, as an [n, 3] array; with `with_bus`, [n, 4] with the bus id last
+    """
+    columns = [StopArrival.route_id, StopArrival.stop_id, arrival_epoch(db)]
+    if with_bus:
+        columns.append(StopArrival.bus_id)
+    query = select(*columns).where(
+        StopArrival.arrived_at >= datetime.utcfromtimestamp(start)
+    )
+    if route_ids is not None:
+        query = query.where(StopArrival.route_id.in_(route_ids))
+    if end is not None:
+        query = query.where(StopArrival.arrived_at < datetime.utcfromtimestamp(end))
+    # Plain numbers read off the DBAPI cursor and flattened straight into the
+    # array: ORM result processing and Row objects dominate at a month of rows
+    result = db.connection().execute(query)
+    rows = result.cursor.fetchall()
+    result.close()
+    width = len(columns)
+    return np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=width * len(rows)).reshape(-1, width)
+
+
+class OnTimeRecorder:
+    """
+    Buffers the stop passages the ETA engine detects in this worker's live
+    fixes; a flusher thread stores them every ONTIME_FLUSH_SECONDS and adds
+    their scores to the hourly and daily rollups in the same transaction.
+    Positions read back by a fleet re-sync are skipped: the worker that
+    received those fixes records them.
+
+    A headway is measured against the stored arrivals when the batch is
+    flushed, so an arrival flushed by another worker after a later one at
+    the same stop leaves that later score stale until `recompute_rollups`.
+    """
+
+    def __init__(self, flush_seconds: float = settings.ONTIME_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self.frequencies = RouteFrequencies()
+        self.pending: List[Tuple[int, int, int, float]] = []  # (route_id, stop_id, bus_id, epoch)
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def on_passages(self, bus_id: int, position: BusPosition, passages: List[Tuple[int, float]]) -> None:
+        """ETA engine passage listener"""
+        if position.synced:
+            return
+        with self.lock:
+            self.pending.extend((position.route_id, stop_id, bus_id, epoch) for stop_id, epoch in passages)
+
+    def pending_arrivals(self, bus_id: int) -> List[Tuple[int, int, float]]:
+        """(route_id, stop_id, epoch) passages of a bus buffered here and not stored yet"""
+        with self.lock:
+            return [(route_id, stop_id, epoch) for route_id, stop_id, bus, epoch in self.pending if bus == bus_id]
+
+    def flush(self, db: Session) -> int:
+        """Store buffered arrivals and roll up their scores; returns how many were stored"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        try:
+            new = np.array([(route_id, stop_id, epoch) for route_id, stop_id, _, epoch in batch], dtype=np.float64)
+            prior = _prior_arrivals(db, sorted({row[0] for row in batch}), float(new[:, 2].min()) - SERVICE_GAP_SECONDS)
+            arrivals = np.concatenate((prior, new))
+            route_ids = arrivals[:, 0].astype(np.int64)
+            scored, on_time = score_arrivals(
+                route_ids, arrivals[:, 1].astype(np.int64), arrivals[:, 2],
+                self.frequencies.headway_limits(db, route_ids),
+            )
+            # Only the new arrivals' scores are added; stored ones are already rolled up
+            mine = np.zeros(len(arrivals), dtype=bool)
+            mine[len(prior):] = True
+            mine &= scored
+            db.execute(insert(StopArrival), [
+                {"route_id": route_id, "stop_id": stop_id, "bus_id": bus_id,
+                 "arrived_at": datetime.utcfromtimestamp(epoch)}
+                for route_id, stop_id, bus_id, epoch in batch
+            ])
+            for granularity in (HOUR, DAY):
+                _add_to_rollups(db, rollup(route_ids[mine], arrivals[mine, 2], on_time[mine], granularity))
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self.lock:
+                self.pending[:0] = batch  # retried on the next flush
+            raise
+        return len(batch)
+
+    def _run(self) -> None:
+        from app.db.session import SessionLocal
+
+        while not self.stopping.wait(self.flush_seconds):
+            self.frequencies.refresh_if_stale()
+            db = SessionLocal()
+            try:
+                self.flush(db)
+            except SQLAlchemyError as e:
+                logger.warning(f"Stop arrival flush failed: {e}")
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="ontime-recorder", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher, storing what is still buffered"""
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join(timeout=self.flush_seconds * 2)
+        self.thread = None
+        from app.db.session import SessionLocal
+
+        db = SessionLocal()
+        try:
+            self.flush(db)
+        except SQLAlchemyError as e:
+            logger.warning(f"Final stop arrival flush failed: {e}")
+        finally:
+            db.close()
+
+
+def recompute_rollups(db: Session, start: datetime, end: datetime) -> int:
+    """
+    Rebuild the rollups of the UTC days overlapping [start, end) from the
+    stored arrivals in one vectorized pass, and commit. Returns the number
+    of arrivals scored. Arrivals up to SERVICE_GAP_SECONDS before the first
+    day are read for its first headways.
+    """
+    first = datetime(start.year, start.month, start.day)
+    last = datetime(end.year, end.month, end.day)
+    if last < end:
+        last += timedelta(days=1)
+    lower = (first - datetime(1970, 1, 1)).total_seconds()
+    upper = (last - datetime(1970, 1, 1)).total_seconds()
+
+    on_time_recorder.frequencies.refresh_if_stale()
+    arrivals = _prior_arrivals(db, None, lower - SERVICE_GAP_SECONDS, upper)
+    route_ids = arrivals[:, 0].astype(np.int64)
+    scored, on_time = score_arrivals(
+        route_ids, arrivals[:, 1].astype(np.int64), arrivals[:, 2],
+        on_time_recorder.frequencies.headway_limits(db, route_ids),
+    )
+    inside = scored & (arrivals[:, 2] >= lower)
+    db.query(OnTimeRollup).filter(
+        OnTimeRollup.period_start >= first, OnTimeRollup.period_start < last
+    ).delete(synchronize_session=False)
+    for granularity in (HOUR, DAY):
+        rows = rollup(route_ids[inside], arrivals[inside, 2], on_time[inside], granularity)
+        if rows:
+            db.connection().execute(OnTimeRollup.__table__.insert(), rows)
+    db.commit()
+    count = int(inside.sum())
+    logger.info(f"On-time rollups recomputed for {first:%Y-%m-%d} to {last:%Y-%m-%d}: {count} arrivals")
+    return count
+
+
+def bus_arrivals(db: Session, route_id: int, bus_id: int, start: float, end: float,
+                 pending: Sequence[Tuple[int, int, float]] = ()) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (stop ids, epochs, scored, on_time) of one bus's arrivals on a route
+    between `start` and `end` (inclusive), in time order: the stored ones
+    plus its `pending` (route_id, stop_id, epoch) passages not stored yet,
+    scored against the route's stored arrivals as the rollups score them
+    """
+    arrivals = _prior_arrivals(db, [route_id], start - SERVICE_GAP_SECONDS, end + 1.0, with_bus=True)
+    buffered = [(route, stop_id, epoch, bus_id) for route, stop_id, epoch in pending if route == route_id]
+    if buffered:
+        arrivals = np.concatenate((arrivals, np.array(buffered, dtype=np.float64)))
+    route_ids = arrivals[:, 0].astype(np.int64)
+    scored, on_time = score_arrivals(
+        route_ids, arrivals[:, 1].astype(np.int64), arrivals[:, 2],
+        on_time_recorder.frequencies.headway_limits(db, route_ids),
+    )
+    mine = (arrivals[:, 3] == bus_id) & (arrivals[:, 2] >= start) & (arrivals[:, 2] <= end)
+    order = np.argsort(arrivals[mine, 2], kind="stable")
+    return (arrivals[mine, 1].astype(np.int64)[order], arrivals[mine, 2][order],
+            scored[mine][order], on_time[mine][order])
+
+
+def on_time_rate(db: Session, hours: int = 24) -> Tuple[float, int]:
+    """(on-time percentage, scored arrivals) over the last `hours` hourly rollups, current hour included"""
+    now = datetime.utcnow()
+    since = datetime(now.year, now.month, now.day, now.hour) - timedelta(hours=hours - 1)
+    arrivals, on_time = db.query(func.sum(OnTimeRollup.arrivals), func.sum(OnTimeRollup.on_time)).filter(
+        OnTimeRollup.granularity == HOUR, OnTimeRollup.period_start >= since
+    ).one()
+    if not arrivals:
+        return 0.0, 0
+    return round(100.0 * on_time / arrivals, 1), int(arrivals)
+
+
+# Global on-time recorder, fed by the ETA engine's stop passages
+on_time_recorder = OnTimeRecorder()
+eta_engine.subscribe_passages(on_time_recorder.on_passages)
@@ -0,0 +1,197 @@
+"""
+Versioned, immutable snapshot of every route and stop, shared by all route listings
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.representation import DEFAULT_REPRESENTATION, Representation
+from app.core.serialization import FragmentCache
+from app.models.trip import CatalogChange, Route
+from app.services.invalidation import cache_invalidator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogStop:
+    id: int
+    route_id: int
+    name: str
+    latitude: float
+    longitude: float
+    sequence_order: int
+    is_active: bool
+
+
+@dataclass(frozen=True)
+class CatalogRoute:
+    id: int
+    name: str
+    description: Optional[str]
+    is_active: bool
+    stops: Tuple[CatalogStop, ...]         # every stop, in sequence order
+    active_stops: Tuple[CatalogStop, ...]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int                           # in-process invalidation counter
+    routes: Tuple[CatalogRoute, ...]       # every route, by id
+    active_routes: Tuple[CatalogRoute, ...]
+    by_id: Dict[int, CatalogRoute]
+    change_version: int                    # latest catalog change id: the version clients sync against
+    route_changes: Dict[int, int]          # route id -> id of its latest change (its own or a stop's)
+
+
+class RouteCatalog:
+    """
+    All routes with their stops, loaded with one eager (selectin) query into
+    an immutable snapshot. Authority route/stop mutations call
+    `invalidate()`, which bumps `version`; the next reader loads the new
+    snapshot once and every reader until the next mutation shares it
+    without touching the database.
+    """
+
+    def __init__(self):
+        self.current: Optional[CatalogSnapshot] = None
+        self.version = 0
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.current = None
+            self.version += 1
+
+    def _load(self, db: Session) -> CatalogSnapshot:
+        version = self.version
+        # Changes are read before routes, so a change committed in between is
+        # re-sent by the next delta instead of being skipped
+        route_changes = dict(
+            db.query(CatalogChange.route_id, func.max(CatalogChange.id))
+            .filter(CatalogChange.route_id.isnot(None))
+            .group_by(CatalogChange.route_id).all()
+        )
+        rows = db.query(Route).options(selectinload(Route.stops)).order_by(Route.id).all()
+        routes = []
+        for row in rows:
+            stops = tuple(
+                CatalogStop(
+                    id=stop.id,
+                    route_id=row.id,
+                    name=stop.name,
+                    latitude=stop.latitude,
+                    longitude=stop.longitude,
+                    sequence_order=stop.sequence_order,
+                    is_active=bool(stop.is_active),
+                )
+                for stop in sorted(row.stops, key=lambda stop: (stop.sequence_order, stop.id))
+            )
+            routes.append(CatalogRoute(
+                id=row.id,
+                name=row.name,
+                description=row.description,
+                is_active=bool(row.is_active),
+                stops=stops,
+                active_stops=tuple(stop for stop in stops if stop.is_active),
+            ))
+        snapshot = CatalogSnapshot(
+            version=version,
+            routes=tuple(routes),
+            active_routes=tuple(route for route in routes if route.is_active),
+            by_id={route.id: route for route in routes},
+            change_version=max(route_changes.values(), default=0),
+            route_changes=route_changes,
+        )
+
+        with self.lock:
+            # Only publish if nothing was invalidated while we were reading
+            if self.version == version:
+                self.current = snapshot
+        logger.debug(f"Route catalog v{version} loaded: {len(routes)} routes")
+        return snapshot
+
+    def snapshot(self, db: Optional[Session] = None) -> CatalogSnapshot:
+        """The current snapshot; loads with `db` (or a short-lived session) when stale"""
+        snapshot = self.current
+        if snapshot is not None:
+            return snapshot
+        with self.load_lock:
+            snapshot = self.current
+            if snapshot is not None:
+                return snapshot
+            if db is not None:
+                return self._load(db)
+            from app.db.session import SessionLocal
+            session = SessionLocal()
+            try:
+                return self._load(session)
+            finally:
+                session.close()
+
+
+# Global route catalog instance
+route_catalog = RouteCatalog()
+cache_invalidator.register("route_catalog", lambda key: route_catalog.invalidate())
+
+# Serialized public route objects keyed by route id
+public_route_fragments = FragmentCache()
+
+
+def _public_route(snapshot: CatalogSnapshot, route: CatalogRoute, rep: Representation) -> bytes:
+    return rep.convert(public_route_fragments, route.id, snapshot.version, public_route_fragments.get(
+        route.id, snapshot.version, lambda: {
+            "id": route.id,
+            "name": route.name,
+            "description": route.description,
+            "stops": [
+                {
+                    "id": stop.id,
+                    "name": stop.name,
+                    "latitude": stop.latitude,
+                    "longitude": stop.longitude,
+                    "sequence_order": stop.sequence_order
+                }
+                for stop in route.active_stops
+            ]
+        }
+    ))
+
+
+def build_public_routes(snapshot: CatalogSnapshot, rep: Representation = DEFAULT_REPRESENTATION) -> bytes:
+    """Serialized active routes with their active stops; fragments are reused for a whole catalog version"""
+    return rep.array(_public_route(snapshot, route, rep) for route in snapshot.active_routes)
+
+
+def build_public_routes_delta(snapshot: CatalogSnapshot, since: int,
+                              rep: Representation = DEFAULT_REPRESENTATION) -> bytes:
+    """
+    Active routes added or changed (including their stops) after catalog
+    version `since`, and the ids of routes deleted or deactivated since.
+    A `since` ahead of the log (e.g. a reset database) gets the full catalog.
+    """
+    if since > snapshot.change_version:
+        return rep.object(
+            version=snapshot.change_version, full=True, routes=build_public_routes(snapshot, rep), removedRouteIds=[]
+        )
+    changed = sorted(route_id for route_id, change in snapshot.route_changes.items() if change > since)
+    current = [snapshot.by_id[route_id] for route_id in changed
+               if route_id in snapshot.by_id and snapshot.by_id[route_id].is_active]
+    current_ids = {route.id for route in current}
+    return rep.object(
+        version=snapshot.change_version,
+        full=False,
+        routes=rep.array(_public_route(snapshot, route, rep) for route in current),
+        removedRouteIds=[route_id for route_id in changed if route_id not in current_ids],
+    )
+
+
+def public_routes_json(db: Optional[Session]) -> bytes:
+    """`/api/routes` body for the current catalog version"""
+    return build_public_routes(route_catalog.snapshot(db))
@@ -0,0 +1,115 @@
+"""
+Per-route active stop sequences as compact NumPy arrays, derived from the route catalog
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.route_catalog import CatalogSnapshot, route_catalog
+from app.services.stop_locator import PackedRoutes, pack_routes
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RouteStops:
+    """Ordered active stops of one active route"""
+    route_id: int
+    route_name: str
+    stop_ids: np.ndarray     # int64, in sequence order
+    names: Tuple[str, ...]
+    latitudes: np.ndarray    # float64
+    longitudes: np.ndarray   # float64
+
+    def __len__(self) -> int:
+        return len(self.stop_ids)
+
+
+class RouteStopsCache:
+    """
+    All active routes with their ordered active stops, derived from the
+    route catalog snapshot. `version` is the catalog version; authority
+    route/stop mutations call `invalidate()` and the arrays are rebuilt
+    from the next snapshot.
+    """
+
+    def __init__(self):
+        self.source: Optional[CatalogSnapshot] = None
+        self.routes: Optional[Dict[int, RouteStops]] = None
+        self.packed_routes: Optional[PackedRoutes] = None
+        self.stop_locations: Optional[Dict[int, Tuple[int, int]]] = None
+        self.lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return route_catalog.version
+
+    def invalidate(self) -> None:
+        route_catalog.invalidate()
+
+    def all(self, db: Optional[Session] = None) -> Dict[int, RouteStops]:
+        """All active routes; loads the catalog with `db` (or a short-lived session) when stale"""
+        snapshot = route_catalog.snapshot(db)
+        routes = self.routes
+        if self.source is snapshot and routes is not None:
+            return routes
+
+        routes = {
+            route.id: RouteStops(
+                route_id=route.id,
+                route_name=route.name,
+                stop_ids=np.array([stop.id for stop in route.active_stops], dtype=np.int64),
+                names=tuple(stop.name for stop in route.active_stops),
+                latitudes=np.array([stop.latitude for stop in route.active_stops], dtype=np.float64),
+                longitudes=np.array([stop.longitude for stop in route.active_stops], dtype=np.float64),
+            )
+            for route in snapshot.active_routes
+        }
+        with self.lock:
+            if self.source is not snapshot:
+                self.source = snapshot
+                self.routes = routes
+                self.packed_routes = None
+                self.stop_locations = None
+            routes = self.routes
+        logger.debug(f"Route stops derived from catalog v{snapshot.version}: {len(routes)} routes")
+        return routes
+
+    def get(self, db: Optional[Session], route_id: int) -> Optional[RouteStops]:
+        """Stops of an active route, or None if the route is unknown or inactive"""
+        return self.all(db).get(route_id)
+
+    def packed(self, db: Optional[Session] = None) -> PackedRoutes:
+        """All routes packed for `locate_buses`, built once per cache load"""
+        packed = self.packed_routes
+        if packed is None:
+            routes = self.all(db)
+            packed = pack_routes(routes.values())
+            with self.lock:
+                if self.routes is routes:
+                    self.packed_routes = packed
+        return packed
+
+    def stops(self, db: Optional[Session] = None) -> Dict[int, Tuple[int, int]]:
+        """stop id -> (route id, position in the route) for every active stop"""
+        locations = self.stop_locations
+        if locations is None:
+            routes = self.all(db)
+            locations = {
+                int(stop_id): (route.route_id, i)
+                for route in routes.values()
+                for i, stop_id in enumerate(route.stop_ids)
+            }
+            with self.lock:
+                if self.routes is routes:
+                    self.stop_locations = locations
+        return locations
+
+
+# Global route stops cache instance
+route_stops_cache = RouteStopsCache()
@@ -0,0 +1,196 @@
+"""
+Uniform grid spatial index for live positions
+"""
+
+import heapq
+import math
+from typing import Dict, Hashable, Iterator, List, Set, Tuple
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = 111320.0
+
+Cell = Tuple[int, int]
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters between two WGS84 points"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    Points bucketed into fixed-size lat/lng cells.
+
+    Moves are O(1); radius and bbox queries only touch the cells overlapping
+    the query window, so their cost follows the number of nearby points
+    rather than the total number of points indexed.
+
+    Every write stamps the cells it touches with a new index version, so the
+    highest stamp inside a window changes exactly when something in that
+    window did (see `window_version`).
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        self.cells: Dict[Cell, Set[Hashable]] = {}
+        self.points: Dict[Hashable, Tuple[float, float, Cell]] = {}
+        self.version = 0
+        self.cell_versions: Dict[Cell, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.points
+
+    def cell_of(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def _stamp(self, cell: Cell) -> None:
+        self.version += 1
+        self.cell_versions[cell] = self.version
+
+    def upsert(self, key: Hashable, lat: float, lng: float) -> None:
+        """Insert a point or move it to a new position"""
+        cell = self.cell_of(lat, lng)
+        previous = self.points.get(key)
+        if previous is not None and previous[2] != cell:
+            self._discard_from_cell(key, previous[2])
+            self._stamp(previous[2])
+        if previous is None or previous[2] != cell:
+            self.cells.setdefault(cell, set()).add(key)
+        self.points[key] = (lat, lng, cell)
+        self._stamp(cell)
+
+    def remove(self, key: Hashable) -> bool:
+        previous = self.points.pop(key, None)
+        if previous is None:
+            return False
+        self._discard_from_cell(key, previous[2])
+        self._stamp(previous[2])
+        return True
+
+    def _discard_from_cell(self, key: Hashable, cell: Cell) -> None:
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self.cells[cell]
+
+    def cells_in_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> Iterator[Cell]:
+        """Occupied cells overlapping a bounding box"""
+        lo_y, lo_x = self.cell_of(min_lat, min_lng)
+        hi_y, hi_x = self.cell_of(max_lat, max_lng)
+        span = (hi_y - lo_y + 1) * (hi_x - lo_x + 1)
+        if span > len(self.cells):
+            # Sparse fleet relative to the window: scan occupied cells instead
+            for cell in list(self.cells):
+                if lo_y <= cell[0] <= hi_y and lo_x <= cell[1] <= hi_x:
+                    yield cell
+            return
+        for y in range(lo_y, hi_y + 1):
+            for x in range(lo_x, hi_x + 1):
+                if (y, x) in self.cells:
+                    yield (y, x)
+
+    def window_version(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> int:
+        """Highest write stamp of any cell overlapping a bounding box, including emptied cells"""
+        lo_y, lo_x = self.cell_of(min_lat, min_lng)
+        hi_y, hi_x = self.cell_of(max_lat, max_lng)
+        if (hi_y - lo_y + 1) * (hi_x - lo_x + 1) > len(self.cell_versions):
+            stamps = (
+                stamp for (y, x), stamp in self.cell_versions.items()
+                if lo_y <= y <= hi_y and lo_x <= x <= hi_x
+            )
+        else:
+            stamps = (
+                self.cell_versions.get((y, x), 0)
+                for y in range(lo_y, hi_y + 1)
+                for x in range(lo_x, hi_x + 1)
+            )
+        return max(stamps, default=0)
+
+    def radius_bbox(self, lat: float, lng: float, radius_m: float) -> Tuple[float, float, float, float]:
+        """(min_lat, min_lng, max_lat, max_lng) enclosing a circle"""
+        dlat = radius_m / METERS_PER_DEG_LAT
+        dlng = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+    def query_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Hashable]:
+        """Keys of all points inside a bounding box"""
+        result = []
+        for cell in self.cells_in_bbox(min_lat, min_lng, max_lat, max_lng):
+            for key in self.cells[cell]:
+                lat, lng, _ = self.points[key]
+                if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                    result.append(key)
+        return result
+
+    def query_radius(self, lat: float, lng: float, radius_m: float) -> List[Tuple[float, Hashable]]:
+        """(distance_m, key) pairs within radius, sorted by true distance"""
+        result = []
+        for cell in self.cells_in_bbox(*self.radius_bbox(lat, lng, radius_m)):
+            for key in self.cells[cell]:
+                plat, plng, _ = self.points[key]
+                distance = haversine_m(lat, lng, plat, plng)
+                if distance <= radius_m:
+                    result.append((distance, key))
+        result.sort(key=lambda item: item[0])
+        return result
+
+    def nearest(self, lat: float, lng: float, k: int, max_radius_m: float = None) -> List[Tuple[float, Hashable]]:
+        """k nearest (distance_m, key) pairs, expanding rings of cells outward"""
+        if k <= 0 or not self.points:
+            return []
+        cy, cx = self.cell_of(lat, lng)
+        # Smallest ground distance covered by one ring of cells
+        ring_m = self.cell_deg * METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01)
+        best: List[Tuple[float, Hashable]] = []  # max-heap via negated distance
+
+        def consider(cell: Cell) -> int:
+            members = self.cells.get(cell, ())
+            for key in members:
+                plat, plng, _ = self.points[key]
+                distance = haversine_m(lat, lng, plat, plng)
+                if max_radius_m is not None and distance > max_radius_m:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, key))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, key))
+            return len(members)
+
+        seen = 0
+        ring = 0
+        while seen < len(self.points):
+            if len(best) == k and (ring - 1) * ring_m > -best[0][0]:
+                break
+            if max_radius_m is not None and (ring - 1) * ring_m > max_radius_m:
+                break
+            if 8 * ring > len(self.cells):
+                # Rings are now larger than the occupied set: finish with one scan
+                for cell in list(self.cells):
+                    if max(abs(cell[0] - cy), abs(cell[1] - cx)) >= ring:
+                        consider(cell)
+                break
+            for cell in self._ring_cells(cy, cx, ring):
+                seen += consider(cell)
+            ring += 1
+        return sorted(((-d, key) for d, key in best), key=lambda item: item[0])
+
+    @staticmethod
+    def _ring_cells(cy: int, cx: int, ring: int) -> Iterator[Cell]:
+        if ring == 0:
+            yield (cy, cx)
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield (cy - ring, x)
+            yield (cy + ring, x)
+        for y in range(cy - ring + 1, cy + ring):
+            yield (y, cx - ring)
+            yield (y, cx + ring)
@@ -0,0 +1,190 @@
+"""
+Vectorized nearest-stop / next-stop computation for batches of buses
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from app.services.spatial_index import EARTH_RADIUS_M
+
+# Upper bound on bus x stop cells evaluated per chunk, to bound temporaries
+MAX_CELLS_PER_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class PackedRoutes:
+    """
+    Stops of all routes packed into padded [route, stop] matrices.
+
+    Padding cells are NaN. `cum_m[r, i]` is the along-route distance from the
+    first stop to stop i (haversine between consecutive stops).
+    """
+    row_of: Dict[int, int]   # route_id -> row
+    route_ids: np.ndarray    # int64 [R]
+    counts: np.ndarray       # int64 [R]
+    latitudes: np.ndarray    # float64 [R, S]
+    longitudes: np.ndarray   # float64 [R, S]
+    cum_m: np.ndarray        # float64 [R, S]
+
+    def rows(self, route_ids: Iterable) -> np.ndarray:
+        """Rows for route ids; unknown routes map to -1"""
+        return np.array([self.row_of.get(route_id, -1) for route_id in route_ids], dtype=np.int64)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Element-wise great-circle distance in meters"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def pack_routes(routes) -> PackedRoutes:
+    """Pack `RouteStops` entries (see app.services.route_stops) into padded matrices"""
+    routes = list(routes)
+    width = max([len(route) for route in routes] + [1])
+    count = len(routes)
+    latitudes = np.full((count, width), np.nan)
+    longitudes = np.full((count, width), np.nan)
+    cum_m = np.full((count, width), np.nan)
+    counts = np.zeros(count, dtype=np.int64)
+    for row, route in enumerate(routes):
+        n = len(route)
+        counts[row] = n
+        if not n:
+            continue
+        latitudes[row, :n] = route.latitudes
+        longitudes[row, :n] = route.longitudes
+        cum_m[row, 0] = 0.0
+        if n > 1:
+            segments = haversine_m(route.latitudes[:-1], route.longitudes[:-1], route.latitudes[1:], route.longitudes[1:])
+            cum_m[row, 1:n] = np.cumsum(segments)
+    return PackedRoutes(
+        row_of={route.route_id: row for row, route in enumerate(routes)},
+        route_ids=np.array([route.route_id for route in routes], dtype=np.int64),
+        counts=counts,
+        latitudes=latitudes,
+        longitudes=longitudes,
+        cum_m=cum_m,
+    )
+
+
+@dataclass(frozen=True)
+class StopLocation:
+    """
+    Per-bus result arrays of `locate_buses`. Index -1 means "not available"
+    (unknown route, route without stops, or no stop ahead).
+    """
+    nearest: np.ndarray      # index of the closest stop
+    next: np.ndarray         # index of the next stop the bus will reach
+    distance_m: np.ndarray   # distance to the closest stop
+    segment: np.ndarray      # index of the stop that starts the segment the bus is on
+    fraction: np.ndarray     # progress along that segment, 0..1
+    along_m: np.ndarray      # distance travelled along the route from the first stop
+
+    def labels(self, i: int, names: Tuple[str, ...]) -> Tuple[str, str]:
+        """(current stop, next stop) display names for bus i"""
+        nearest = int(self.nearest[i])
+        if nearest < 0:
+            return "Route Start", "Route End"
+        upcoming = max(int(self.next[i]), nearest + 1)
+        return names[nearest], names[upcoming] if upcoming < len(names) else "Route End"
+
+    def all_labels(self, names: Iterable[Tuple[str, ...]]) -> List[Tuple[str, str]]:
+        """`labels` for every bus at once; `names` yields each bus's route stop names"""
+        pairs = []
+        for nearest, upcoming, stop_names in zip(self.nearest.tolist(), self.next.tolist(), names):
+            if nearest < 0:
+                pairs.append(("Route Start", "Route End"))
+                continue
+            upcoming = max(upcoming, nearest + 1)
+            pairs.append((stop_names[nearest], stop_names[upcoming] if upcoming < len(stop_names) else "Route End"))
+        return pairs
+
+
+def locate_buses(latitudes, longitudes, rows, packed: PackedRoutes) -> StopLocation:
+    """
+    Locate each bus against the stops of its route.
+
+    `rows` are packed route rows (see `PackedRoutes.rows`). Distances use an
+    equirectangular projection centred on each bus, which is accurate to well
+    under a meter at stop-spacing scales.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.int64)
+    total = len(rows)
+    out = {
+        "nearest": np.full(total, -1, dtype=np.int64),
+        "next": np.full(total, -1, dtype=np.int64),
+        "distance_m": np.full(total, np.nan),
+        "segment": np.full(total, -1, dtype=np.int64),
+        "fraction": np.zeros(total),
+        "along_m": np.full(total, np.nan),
+    }
+    if not total or not len(packed.route_ids):
+        return StopLocation(**out)
+
+    width = packed.latitudes.shape[1]
+    chunk = max(1, MAX_CELLS_PER_CHUNK // width)
+    for start in range(0, total, chunk):
+        stop = min(start + chunk, total)
+        _locate_chunk(latitudes[start:stop], longitudes[start:stop], rows[start:stop], packed,
+                      {key: value[start:stop] for key, value in out.items()})
+    return StopLocation(**out)
+
+
+def _locate_chunk(bus_lat, bus_lng, rows, packed: PackedRoutes, out) -> None:
+    usable = (rows >= 0)
+    usable[usable] = packed.counts[rows[usable]] > 0
+    if not usable.any():
+        return
+    idx = np.nonzero(usable)[0]
+    rows = rows[idx]
+    bus_lat = bus_lat[idx]
+    bus_lng = bus_lng[idx]
+    counts = packed.counts[rows]
+    ar = np.arange(len(idx))
+
+    # Stops in a local metric frame centred on each bus: [B, S]
+    cos_lat = np.cos(np.radians(bus_lat))[:, None]
+    x = np.radians(packed.longitudes[rows] - bus_lng[:, None]) * cos_lat * EARTH_RADIUS_M
+    y = np.radians(packed.latitudes[rows] - bus_lat[:, None]) * EARTH_RADIUS_M
+    d2 = x * x + y * y
+    d2[np.isnan(d2)] = np.inf
+    nearest = d2.argmin(axis=1)
+
+    # Has the bus already passed its nearest stop? Check the outbound segment.
+    after = np.minimum(nearest + 1, counts - 1)
+    ax, ay = x[ar, nearest], y[ar, nearest]
+    passed = (after > nearest) & ((-ax) * (x[ar, after] - ax) + (-ay) * (y[ar, after] - ay) > 0)
+
+    # Segment the bus is on: leaving `nearest`, or approaching it from the previous stop
+    segment = np.where(passed, nearest, np.maximum(nearest - 1, 0))
+    seg_end = np.minimum(segment + 1, counts - 1)
+    sx, sy = x[ar, segment], y[ar, segment]
+    dx, dy = x[ar, seg_end] - sx, y[ar, seg_end] - sy
+    length2 = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraction = np.where(length2 > 0, ((-sx) * dx + (-sy) * dy) / length2, 0.0)
+    fraction = np.clip(fraction, 0.0, 1.0)
+
+    cum = packed.cum_m[rows]
+    seg_start_m = cum[ar, segment]
+    along = seg_start_m + fraction * (cum[ar, seg_end] - seg_start_m)
+
+    next_stop = np.where(passed, nearest + 1, nearest)
+    before_start = (nearest == 0) & ~passed
+    next_stop = np.where(before_start, 0, next_stop)
+    fraction = np.where(before_start, 0.0, fraction)
+    at_end = (nearest == counts - 1) & ~passed & (fraction >= 1.0)
+    next_stop = np.where(at_end | (next_stop >= counts), -1, next_stop)
+
+    out["nearest"][idx] = nearest
+    out["next"][idx] = next_stop
+    out["distance_m"][idx] = np.sqrt(d2[ar, nearest])
+    out["segment"][idx] = segment
+    out["fraction"][idx] = fraction
+    out["along_m"][idx] = along
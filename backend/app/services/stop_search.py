@@ -0,0 +1,249 @@
+"""
+In-memory stop name search: word-prefix autocomplete, trigram fallback and facility bitsets
+"""
+
+import bisect
+import heapq
+import logging
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.graph_stops import GraphStop, graph_stops
+from app.services.route_stops import RouteStops, route_stops_cache
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM_MIN_SIMILARITY = 0.4  # share of the query's trigrams a fuzzy match must contain
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words separated by single spaces"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class StopEntry:
+    source: str                  # "route" (Postgres) or "graph" (Neo4j)
+    stop_id: str
+    name: str
+    latitude: float
+    longitude: float
+    route_id: Optional[int] = None
+    route_name: Optional[str] = None
+    stop_type: Optional[str] = None
+    facilities: Tuple[str, ...] = ()
+
+
+class StopSearchIndex:
+    """
+    Immutable search structures over a set of stops, which are numbered in
+    name order so every candidate set comes out alphabetically by index:
+
+    - a sorted (word, stop) list; a query word matches the stops whose name
+      has a word starting with it (bisect to the range)
+    - trigram posting lists, for substring and misspelling matches when
+      prefixes find too few
+    - one bitset per facility, bit i set when stop i has it; a facility
+      filter is the AND of the requested bitsets
+    """
+
+    def __init__(self, stops: Iterable[StopEntry]):
+        keyed = sorted((normalize(stop.name), stop.source, stop.stop_id, stop) for stop in stops)
+        self.entries: List[StopEntry] = [item[3] for item in keyed]
+        self.names: List[str] = [item[0] for item in keyed]
+        self.name_words: List[Tuple[str, ...]] = [tuple(set(name.split())) for name in self.names]
+
+        words = []
+        postings: Dict[str, List[int]] = {}
+        self.facility_ids: Dict[str, int] = {}
+        self.stop_facilities: List[int] = []  # per stop, bit f set for facility id f
+        members: List[bytearray] = []         # per facility, bit i set for stop i
+        for i, entry in enumerate(self.entries):
+            words.extend((word, i) for word in self.name_words[i])
+            for gram in trigrams(self.names[i]):
+                postings.setdefault(gram, []).append(i)
+            bits = 0
+            for facility in entry.facilities:
+                f = self.facility_ids.setdefault(facility.lower(), len(self.facility_ids))
+                if f == len(members):
+                    members.append(bytearray((len(self.entries) + 7) // 8))
+                members[f][i >> 3] |= 1 << (i & 7)
+                bits |= 1 << f
+            self.stop_facilities.append(bits)
+        words.sort()
+        self.words = [word for word, _ in words]
+        self.word_stops = [i for _, i in words]
+        self.trigram_postings = {gram: np.array(stops, dtype=np.int32) for gram, stops in postings.items()}
+        self.facility_bits = [int.from_bytes(member, "little") for member in members]
+        self.all_bits = (1 << len(self.entries)) - 1
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _required(self, facilities: Sequence[str]) -> Optional[int]:
+        """Facility id bits every result must have; None if a facility is unknown"""
+        required = 0
+        for facility in facilities:
+            f = self.facility_ids.get(facility.lower())
+            if f is None:
+                return None
+            required |= 1 << f
+        return required
+
+    def _word_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect.bisect_left(self.words, prefix)
+        return start, bisect.bisect_left(self.words, prefix + "\x7f", start)
+
+    def _word_matches(self, words: List[str]) -> set:
+        """Stops with, for every query word, a name word starting with it"""
+        # Scan the narrowest word range and test the other words per candidate
+        ranges = sorted((self._word_range(word), word) for word in set(words))
+        (start, end), narrowest = min(ranges, key=lambda item: item[0][1] - item[0][0])
+        candidates = set(self.word_stops[start:end])
+        others = [word for _, word in ranges if word != narrowest]
+        if others:
+            candidates = {
+                i for i in candidates
+                if all(any(name_word.startswith(word) for name_word in self.name_words[i]) for word in others)
+            }
+        return candidates
+
+    def _trigram_matches(self, query: str) -> List[int]:
+        """Stops sharing enough of the query's trigrams, most shared first"""
+        grams = trigrams(query)
+        lists = [self.trigram_postings[gram] for gram in grams if gram in self.trigram_postings]
+        if not lists:
+            return []
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.entries))
+        candidates = np.flatnonzero(counts >= TRIGRAM_MIN_SIMILARITY * len(grams))
+        return candidates[np.lexsort((candidates, -counts[candidates]))].tolist()
+
+    def search(self, query: str, facilities: Sequence[str] = (), limit: int = 10) -> List[StopEntry]:
+        """Stops ranked exact name, name prefix, word prefixes, then trigram similarity"""
+        required = self._required(facilities)
+        if required is None:
+            return []
+        query = normalize(query)
+        if not query:
+            # Facility-only filter: AND the facility bitsets, then walk the set
+            # bits, which are already in name order
+            mask = self.all_bits
+            for f in range(len(self.facility_bits)):
+                if required >> f & 1:
+                    mask &= self.facility_bits[f]
+            found = []
+            while mask and len(found) < limit:
+                low = mask & -mask
+                found.append(self.entries[low.bit_length() - 1])
+                mask ^= low
+            return found
+
+        facilities_of = self.stop_facilities
+        allowed = lambda i: facilities_of[i] & required == required
+
+        # Names starting with the query are one run of the sorted names, exact matches first
+        start = bisect.bisect_left(self.names, query)
+        end = bisect.bisect_left(self.names, query + "\x7f", start)
+        found = list(islice((i for i in range(start, end) if allowed(i)), limit))
+        if len(found) < limit:
+            pool = self._word_matches(query.split())
+            pool.difference_update(range(start, end))
+            if required:
+                pool = {i for i in pool if allowed(i)}
+            found.extend(heapq.nsmallest(limit - len(found), pool))
+        if len(found) < limit and len(query) >= 3:
+            seen = set(found)
+            fuzzy = (i for i in self._trigram_matches(query) if i not in seen and allowed(i))
+            found.extend(islice(fuzzy, limit - len(found)))
+        return [self.entries[i] for i in found]
+
+
+class StopSearch:
+    """
+    Search index over active route stops (Postgres) and graph stops
+    (Neo4j, with facilities), rebuilt whenever either source's version
+    moves: stop CRUD invalidates the route stops cache, graph stop writes
+    invalidate the graph stops cache, whose refresher thread rebuilds the
+    index. A rebuild happens beside the index in use, which is swapped
+    out only once the new one is complete; searches arriving meanwhile use
+    the previous index.
+    """
+
+    def __init__(self):
+        # (source versions, index), replaced as one
+        self.built: Tuple[Optional[Tuple[int, int]], StopSearchIndex] = (None, StopSearchIndex(()))
+        self.build_lock = threading.Lock()
+
+    def _build(self, routes: Dict[int, RouteStops], stops: List[GraphStop]) -> StopSearchIndex:
+        entries = [
+            StopEntry(
+                source="route",
+                stop_id=str(stop_id),
+                name=name,
+                latitude=lat,
+                longitude=lng,
+                route_id=route.route_id,
+                route_name=route.route_name,
+            )
+            for route in routes.values()
+            for stop_id, name, lat, lng in zip(
+                route.stop_ids.tolist(), route.names, route.latitudes.tolist(), route.longitudes.tolist()
+            )
+        ]
+        entries.extend(
+            StopEntry(
+                source="graph",
+                stop_id=stop.stop_id,
+                name=stop.name,
+                latitude=stop.latitude,
+                longitude=stop.longitude,
+                stop_type=stop.stop_type,
+                facilities=stop.facilities,
+            )
+            for stop in stops
+        )
+        logger.info(f"Stop search index built over {len(entries)} stops")
+        return StopSearchIndex(entries)
+
+    def current(self, db: Optional[Session] = None) -> StopSearchIndex:
+        routes = route_stops_cache.all(db)
+        graph_version, stops = graph_stops.current
+        version = (route_stops_cache.version, graph_version)
+        built_version, index = self.built
+        if version == built_version:
+            return index
+        # Only the first build makes searches wait; later ones serve the previous index
+        if not self.build_lock.acquire(blocking=built_version is None):
+            return index
+        try:
+            built_version, index = self.built
+            if version != built_version:
+                index = self._build(routes, stops)
+                self.built = (version, index)
+            return index
+        finally:
+            self.build_lock.release()
+
+    def search(self, db: Optional[Session], query: str, facilities: Sequence[str] = (),
+               limit: int = 10) -> List[StopEntry]:
+        return self.current(db).search(query, facilities, limit)
+
+
+# Global stop search instance, rebuilt on the graph refresher thread when graph stops change
+stop_search = StopSearch()
+graph_stops.subscribe(stop_search.current)
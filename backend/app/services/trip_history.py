@@ -0,0 +1,61 @@
+"""
+Trip history: trips joined with their route and driver names in one column-projected query
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from app.models.trip import Route, Trip
+from app.models.user import User
+
+
+def trip_history_query(db: Session) -> Query:
+    """
+    trips ⋈ routes ⋈ users selecting only the columns history listings
+    show; outer joins keep trips whose route or driver has been removed
+    """
+    return (
+        db.query(
+            Trip.id,
+            Trip.trip_id,
+            Trip.route_id,
+            Trip.driver_id,
+            Trip.start_time,
+            Trip.end_time,
+            Trip.status,
+            Trip.distance_traveled,
+            Route.name.label("route_name"),
+            User.name.label("driver_name"),
+        )
+        .outerjoin(Route, Route.id == Trip.route_id)
+        .outerjoin(User, User.id == Trip.driver_id)
+    )
+
+
+def _utc(moment: datetime) -> datetime:
+    # Stored times are UTC; some drivers return them without tzinfo
+    return moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def duration_seconds(start_time: Optional[datetime], end_time: Optional[datetime]) -> Optional[float]:
+    """Trip duration, None while the trip has not ended"""
+    if start_time is None or end_time is None:
+        return None
+    return (_utc(end_time) - _utc(start_time)).total_seconds()
+
+
+def trip_history_item(row: Any) -> dict:
+    """History item for a `trip_history_query` row"""
+    return {
+        "id": row.id,
+        "tripId": row.trip_id,
+        "routeName": row.route_name or f"Route {row.route_id}",
+        "driverName": row.driver_name or f"Driver {row.driver_id}",
+        "startTime": row.start_time.isoformat() if row.start_time else None,
+        "endTime": row.end_time.isoformat() if row.end_time else None,
+        "durationSeconds": duration_seconds(row.start_time, row.end_time),
+        "status": row.status.value if hasattr(row.status, "value") else str(row.status),
+        "distance": row.distance_traveled or 0.0,
+    }
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Live fleet listing benchmark: `/authority/buses` body at 5,000 active buses
+
+Builds a SQLite database (default 5,000 active buses on 200 routes x 40
+stops, each on an active trip with a driver, plus 200,000 past trips) and
+times the listing build: the narrow roster query (buses ⋈ active trip ⋈ driver),
+live positions from the fleet state, route names from the catalog and one
+vectorized nearest / next stop pass.
+
+- cold: no cached fragments
+- warm: nothing changed since the last build
+- 10% / 100% moved: that share of buses got a new live fix
+
+Example:
+
+    python benchmarks/authority_buses.py --buses 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the router module creates the app engine; the benchmark uses its own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DEBUG", "False")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.routes.authority import _live_buses_body, active_bus_fragments
+from app.core.representation import DEFAULT_REPRESENTATION, MSGPACK, Representation
+from app.db.base import Base
+from app.models.trip import Bus, OccupancyLevel, Route, Stop, Trip, TripStatus
+from app.models.user import User, UserRole
+from app.services.fleet_state import fleet_state
+
+
+def build_database(buses: int, routes: int, stops: int, past_trips: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    origins = {r: (26.75 + random.uniform(0, 0.2), 80.85 + random.uniform(0, 0.2)) for r in range(1, routes + 1)}
+    with engine.begin() as conn:
+        conn.execute(Route.__table__.insert(), [
+            {"id": r, "name": f"Route {r} Charbagh - Gomti Nagar", "is_active": True} for r in range(1, routes + 1)
+        ])
+        conn.execute(Stop.__table__.insert(), [
+            {"route_id": r, "name": f"Stop {r}-{s}", "latitude": origins[r][0] + s * 0.003,
+             "longitude": origins[r][1] + s * 0.002, "sequence_order": s, "is_active": True}
+            for r in range(1, routes + 1) for s in range(stops)
+        ])
+        conn.execute(User.__table__.insert(), [
+            {"id": d, "email": f"driver{d}@example.com", "password_hash": "x", "role": UserRole.DRIVER,
+             "name": f"Driver {d} Kumar", "is_active": True}
+            for d in range(1, buses + 1)
+        ])
+        bus_rows = []
+        for b in range(1, buses + 1):
+            route_id = random.randrange(1, routes + 1)
+            s = random.uniform(0, stops - 1)
+            bus_rows.append({
+                "id": b, "bus_number": f"UP32-{b:05d}", "route_id": route_id, "is_active": True,
+                "current_latitude": origins[route_id][0] + s * 0.003, "current_longitude": origins[route_id][1] + s * 0.002,
+                "speed": random.uniform(0, 40), "occupancy": OccupancyLevel.LOW, "last_updated": now,
+            })
+        conn.execute(Bus.__table__.insert(), bus_rows)
+        conn.execute(Trip.__table__.insert(), [
+            {"trip_id": f"past_{i:08x}", "driver_id": random.randrange(1, buses + 1), "bus_id": random.randrange(1, buses + 1),
+             "route_id": random.randrange(1, routes + 1), "status": TripStatus.COMPLETED,
+             "start_time": now - timedelta(minutes=i), "end_time": now - timedelta(minutes=i - 30)}
+            for i in range(past_trips)
+        ])
+        conn.execute(Trip.__table__.insert(), [
+            {"trip_id": f"live_{b:08x}", "driver_id": b, "bus_id": b, "route_id": row["route_id"],
+             "status": TripStatus.ACTIVE, "start_time": now}
+            for b, row in zip(range(1, buses + 1), bus_rows)
+        ])
+        conn.execute(text("ANALYZE"))
+    return engine
+
+
+def median_of(repeat: int, fn, before=None):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live fleet listing benchmark")
+    parser.add_argument("--buses", type=int, default=5000)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--stops", type=int, default=40)
+    parser.add_argument("--past-trips", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=21)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    engine = build_database(args.buses, args.routes, args.stops, args.past_trips)
+    db = sessionmaker(bind=engine)()
+    fleet_state.load(db)
+    _live_buses_body(db, DEFAULT_REPRESENTATION)  # load the catalog and packed stops
+
+    bus_ids = list(fleet_state.positions)
+
+    def move(share: float):
+        def apply():
+            for bus_id in random.sample(bus_ids, int(len(bus_ids) * share)):
+                position = fleet_state.positions[bus_id]
+                fleet_state.apply_fix(bus_id, position.latitude + 0.0003, position.longitude + 0.0002, speed=25.0)
+        return apply
+
+    build = lambda rep=DEFAULT_REPRESENTATION: _live_buses_body(db, rep)
+    msgpack = Representation(media_type=MSGPACK)
+    cases = [
+        ("cold", build, active_bus_fragments.clear),
+        ("warm", build, None),
+        ("10% moved", build, move(0.1)),
+        ("100% moved", build, move(1.0)),
+        ("msgpack, 10% moved", lambda: build(msgpack), move(0.1)),
+    ]
+    roster, _ = median_of(args.repeat, lambda: db.execute(text(
+        "SELECT buses.id, users.name FROM buses "
+        "LEFT OUTER JOIN trips ON trips.bus_id = buses.id AND trips.status = 'ACTIVE' "
+        "LEFT OUTER JOIN users ON users.id = trips.driver_id WHERE buses.is_active = 1"
+    )).all())
+
+    print(f"📊 {len(bus_ids)} active buses, {args.routes} routes x {args.stops} stops, "
+          f"{args.past_trips:,} past trips")
+    print(f"   roster query alone:   {roster * 1000:7.2f} ms")
+    for label, fn, before in cases:
+        latency, body = median_of(args.repeat, fn, before)
+        print(f"   {label + ':':<22}{latency * 1000:7.2f} ms  {len(body) / 1024:6.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
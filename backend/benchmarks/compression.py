@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Catalog compression benchmark: per-request compression vs precompressed bodies
+
+Builds a synthetic `/api/routes` catalog (default 200 routes x 40 stops) and
+reports, for identity, gzip and brotli (when installed):
+
+- payload size
+- per-request compression cost, as the middleware does for dynamic responses
+- precompression cost, paid once per catalog version
+- a warm `precompressed_response` hit, which is what repeat requests pay
+
+Example:
+
+    python benchmarks/compression.py --routes 200 --stops 40
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request
+
+from app.core.compression import brotli, compress, compressed_bodies, precompressed_response
+from app.core.representation import DEFAULT_REPRESENTATION
+from app.core.serialization import dumps
+
+
+def build_catalog(routes: int, stops: int) -> bytes:
+    return dumps([
+        {
+            "id": r,
+            "name": f"Route {r}",
+            "description": f"Route {r} via Charbagh and Hazratganj",
+            "stops": [
+                {
+                    "id": r * stops + s,
+                    "name": f"Stop {r}-{s}",
+                    "latitude": 26.85 + random.uniform(-0.2, 0.2),
+                    "longitude": 80.95 + random.uniform(-0.2, 0.2),
+                    "sequence_order": s,
+                }
+                for s in range(stops)
+            ],
+        }
+        for r in range(routes)
+    ])
+
+
+def median_of(repeat: int, fn):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], value
+
+
+def request_for(encoding: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/api/routes", "query_string": b"",
+                    "headers": [(b"accept-encoding", encoding.encode())]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog compression benchmark")
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--stops", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=21)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    body = build_catalog(args.routes, args.stops)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+
+    print(f"📊 Catalog of {args.routes} routes x {args.stops} stops: {len(body) / 1024:.0f} KiB identity")
+    if brotli is None:
+        print("   (brotli not installed: gzip only)")
+    for encoding in encodings:
+        per_request, compressed = median_of(args.repeat, lambda: compress(body, encoding))
+        once, precompressed = median_of(3, lambda: compress(body, encoding, precompressed=True))
+        request = request_for(encoding)
+        compressed_bodies.clear()
+        precompressed_response(request, DEFAULT_REPRESENTATION, "routes", 1, lambda: body)
+        warm, _ = median_of(args.repeat * 10, lambda: precompressed_response(
+            request, DEFAULT_REPRESENTATION, "routes", 1, lambda: body
+        ))
+        print(f"   {encoding}:")
+        print(f"      per request: {len(compressed) / 1024:7.1f} KiB  {per_request * 1000:8.2f} ms")
+        print(f"      precompress: {len(precompressed) / 1024:7.1f} KiB  {once * 1000:8.2f} ms once per version")
+        print(f"      warm hit:                 {warm * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
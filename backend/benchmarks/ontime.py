@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+On-time rollup benchmark: recomputing a month of stop arrivals, flushing a live batch
+
+Builds a SQLite stop_arrivals table (default 30 days of trips every ~15
+minutes from 06:00 to 22:00 on 50 routes x 20 stops: about 1.9M arrivals)
+and times:
+
+- loop: per-arrival Python scoring (last arrival per route and stop in a dict)
+- vectorized: `score_arrivals` on the same arrays
+- recompute: `recompute_rollups` over the whole month (read, score, roll up, write)
+- flush: one recorder flush of a 500-arrival live batch
+- dashboard: `on_time_rate` over the last 24 hourly rollups
+
+Example:
+
+    python benchmarks/ontime.py --days 30 --routes 50 --stops 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DEBUG", "False")
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.models.trip import Route, StopArrival
+from app.services.fleet_state import BusPosition
+from app.services.ontime import (
+    SERVICE_GAP_SECONDS, OnTimeRecorder, on_time_rate, recompute_rollups, score_arrivals,
+)
+
+
+def build_arrivals(days: int, routes: int, stops: int, headway_minutes: float, seed: int):
+    """Trips every `headway_minutes` (jittered) from 06:00 to 22:00, passing each stop two minutes apart"""
+    rng = np.random.default_rng(seed)
+    trips_per_day = int(16 * 60 / headway_minutes)
+    n_trips = days * routes * trips_per_day
+    route_ids = np.repeat(np.arange(1, routes + 1), days * trips_per_day)
+    day = np.tile(np.repeat(np.arange(days), trips_per_day), routes)
+    slot = np.tile(np.arange(trips_per_day), days * routes)
+    departures = day * 86400 + 6 * 3600 + slot * headway_minutes * 60 + rng.normal(0, 4 * 60, n_trips)
+    delays = rng.exponential(90, (n_trips, stops)).cumsum(axis=1)
+    epochs = (departures[:, None] + np.arange(stops)[None, :] * 120 + delays).ravel()
+    return np.repeat(route_ids, stops), np.tile(np.arange(1, stops + 1), n_trips), epochs
+
+
+def build_database(days: int, routes: int, stops: int, headway_minutes: float, seed: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    route_ids, stop_ids, epochs = build_arrivals(days, routes, stops, headway_minutes, seed)
+    with engine.begin() as conn:
+        conn.execute(Route.__table__.insert(), [
+            {"id": r, "name": f"Route {r} Charbagh - Gomti Nagar", "is_active": True} for r in range(1, routes + 1)
+        ])
+        for i in range(0, len(epochs), 100_000):
+            conn.execute(StopArrival.__table__.insert(), [
+                {"route_id": route_id, "stop_id": stop_id, "bus_id": 1,
+                 "arrived_at": start + timedelta(seconds=epoch)}
+                for route_id, stop_id, epoch in zip(route_ids[i:i + 100_000].tolist(), stop_ids[i:i + 100_000].tolist(),
+                                                    epochs[i:i + 100_000].tolist())
+            ])
+        conn.execute(text("ANALYZE"))
+    return engine, start, end, (route_ids, stop_ids, epochs)
+
+
+def loop_scores(route_ids, stop_ids, epochs, limits):
+    order = sorted(range(len(epochs)), key=epochs.__getitem__)
+    last = {}
+    scored = on_time = 0
+    for i in order:
+        key = (route_ids[i], stop_ids[i])
+        previous = last.get(key)
+        if previous is not None and epochs[i] - previous <= SERVICE_GAP_SECONDS:
+            scored += 1
+            on_time += epochs[i] - previous <= limits[i]
+        last[key] = epochs[i]
+    return scored, on_time
+
+
+def median_of(repeat: int, fn, before=None):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="On-time rollup benchmark")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--routes", type=int, default=50)
+    parser.add_argument("--stops", type=int, default=20)
+    parser.add_argument("--headway", type=float, default=15.0, help="minutes between trips")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    started = time.perf_counter()
+    engine, start, end, (route_ids, stop_ids, epochs) = build_database(args.days, args.routes, args.stops, args.headway, args.seed)
+    print(f"📊 {len(epochs):,} stop arrivals over {args.days} days, {args.routes} routes x {args.stops} stops "
+          f"every ~{args.headway:g} min (built in {time.perf_counter() - started:.0f} s)")
+    db = sessionmaker(bind=engine)()
+
+    limits = np.full(len(epochs), (args.headway + 5) * 60.0)
+    lists = (route_ids.tolist(), stop_ids.tolist(), epochs.tolist(), limits.tolist())
+
+    loop, counts = median_of(1, lambda: loop_scores(*lists))
+    print(f"   scoring, per-arrival loop:  {loop * 1000:9.1f} ms  ({counts[0]:,} scored)")
+    vectorized, (scored, _) = median_of(args.repeat, lambda: score_arrivals(route_ids, stop_ids, epochs, limits))
+    print(f"   scoring, vectorized:        {vectorized * 1000:9.1f} ms  ({int(scored.sum()):,} scored)")
+
+    recompute, scored = median_of(args.repeat, lambda: recompute_rollups(db, start, end))
+    print(f"   recompute {args.days} days:         {recompute * 1000:9.1f} ms  ({scored:,} scored)")
+
+    recorder = OnTimeRecorder()
+    now = time.time()
+
+    def enqueue():
+        for _ in range(500):
+            position = BusPosition(bus_id=1, bus_number="B1", route_id=random.randrange(1, args.routes + 1),
+                                   latitude=0.0, longitude=0.0)
+            recorder.on_passages(1, position, [(random.randrange(1, args.stops + 1), now - random.uniform(0, 10))])
+
+    flush, _ = median_of(args.repeat, lambda: recorder.flush(db), enqueue)
+    print(f"   flush 500 live arrivals:    {flush * 1000:9.1f} ms")
+    dashboard, (rate, _) = median_of(args.repeat * 4, lambda: on_time_rate(db))
+    print(f"   dashboard on-time rate:     {dashboard * 1000:9.1f} ms  ({rate}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+List serialization benchmark: Pydantic models + response_model + stdlib json
+vs orjson with cached per-bus fragments
+
+Times the nearby-buses payload at 1,000 and 10,000 rows through:
+
+- before: one `BusResponse` per row, FastAPI's `serialize_response` against
+  `List[BusResponse]`, then `JSONResponse.render`
+- orjson cold: dicts serialized with orjson into fresh fragments
+- orjson warm: every fragment cached (no bus moved), only `distance` appended
+- orjson 10% moved: a tenth of the fragments are rebuilt
+- representations: `fields=id,latitude,longitude` and/or MessagePack,
+  derived from the cached fragments (warm)
+
+Example:
+
+    python benchmarks/serialization.py --rows 1000 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the router module creates the engine; no database is touched
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DEBUG", "False")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.routes.commuter import BusResponse
+from app.core.representation import MSGPACK, Representation
+from app.core.serialization import FragmentCache, json_array, with_fields
+
+REPRESENTATIONS = [
+    ("fields projection", Representation("id,latitude,longitude")),
+    ("msgpack", Representation(None, MSGPACK)),
+    ("msgpack + fields", Representation("id,latitude,longitude", MSGPACK)),
+]
+
+
+def make_rows(count: int):
+    now = datetime.utcnow()
+    return [
+        {
+            "id": i,
+            "routeName": f"Route {i % 40}",
+            "currentStop": f"Stop {random.randrange(60)}",
+            "nextStop": f"Stop {random.randrange(60)}",
+            "latitude": 26.8 + random.random() / 10,
+            "longitude": 80.9 + random.random() / 10,
+            "speed": random.uniform(0, 40),
+            "occupancy": random.choice(["low", "medium", "high"]),
+            "lastUpdated": now.isoformat(),
+            "distance": round(random.uniform(0, 5000), 1),
+        }
+        for i in range(count)
+    ]
+
+
+def before(rows, field) -> bytes:
+    models = [BusResponse(**row) for row in rows]
+    content = asyncio.run(serialize_response(field=field, response_content=models))
+    return JSONResponse(content).body
+
+
+def after(rows, cache: FragmentCache, versions) -> bytes:
+    return json_array(
+        with_fields(
+            cache.get(row["id"], versions[row["id"]], lambda: {k: v for k, v in row.items() if k != "distance"}),
+            distance=row["distance"],
+        )
+        for row in rows
+    )
+
+
+def represented(rows, cache: FragmentCache, versions, rep: Representation) -> bytes:
+    return rep.array(
+        rep.with_fields(
+            rep.convert(cache, row["id"], versions[row["id"]],
+                        cache.get(row["id"], versions[row["id"]], lambda: {k: v for k, v in row.items() if k != "distance"})),
+            distance=row["distance"],
+        )
+        for row in rows
+    )
+
+
+def best_of(repeat: int, fn, setup=None):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List serialization benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    field = create_response_field(name="response", type_=List[BusResponse])
+
+    for count in args.rows:
+        rows = make_rows(count)
+        versions = [0] * count
+        cache = FragmentCache()
+
+        before_time, before_body = best_of(args.repeat, lambda: before(rows, field))
+        cold_time, after_body = best_of(args.repeat, lambda: after(rows, cache, versions), setup=cache.clear)
+        warm_time, _ = best_of(args.repeat, lambda: after(rows, cache, versions))
+
+        def move_tenth():
+            for i in random.sample(range(count), count // 10):
+                versions[i] += 1
+        moved_time, _ = best_of(args.repeat, lambda: after(rows, cache, versions), setup=move_tenth)
+
+        assert json.loads(before_body) == json.loads(after_body), "payloads differ"
+
+        print(f"📊 {count} rows ({len(before_body) / 1024:.0f} KiB)")
+        print(f"   pydantic + response_model + json: {before_time * 1000:8.2f} ms")
+        print(f"   orjson, cold fragments:           {cold_time * 1000:8.2f} ms  ({before_time / cold_time:.1f}x)")
+        print(f"   orjson, 10% of buses moved:       {moved_time * 1000:8.2f} ms  ({before_time / moved_time:.1f}x)")
+        print(f"   orjson, all fragments cached:     {warm_time * 1000:8.2f} ms  ({before_time / warm_time:.1f}x)")
+        for name, rep in REPRESENTATIONS:
+            rep_time, rep_body = best_of(args.repeat, lambda: represented(rows, cache, versions, rep))
+            print(f"   {name + ', cached:':<34}{rep_time * 1000:8.2f} ms  ({before_time / rep_time:.1f}x)"
+                  f"  {len(rep_body) / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
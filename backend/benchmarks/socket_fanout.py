@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Socket.IO fan-out load benchmark
+
+Boots `app.main:asgi` with uvicorn on localhost, connects N commuter/authority
+sockets, drives M simulated buses through `driver_location_update` and reports
+emit throughput, end-to-end latency percentiles and server CPU / RSS.
+
+Each simulated bus is driven by driver N on an active trip with bus N, and
+its socket authenticates with that driver's access token. With `--url`, the
+server must share this environment's JWT_SECRET and have drivers 1..M on
+active trips.
+
+Runs fully offline on a single Linux box. Requires the async Socket.IO client:
+
+    pip install "python-socketio[asyncio_client]"
+
+Example:
+
+    python benchmarks/socket_fanout.py --clients 500 --buses 200 --interval 2 --duration 30
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def read_proc_cpu_seconds(pid: int) -> float:
+    """User + system CPU seconds consumed by a process (from /proc)"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def read_proc_rss_mb(pid: int) -> float:
+    """Resident set size of a process in MiB (from /proc)"""
+    with open(f"/proc/{pid}/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * PAGE_SIZE / (1024 * 1024)
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def prepare_database(env: dict, buses: int) -> None:
+    """Create the schema in a throwaway SQLite database with M drivers on active trips"""
+    code = (
+        "from app.db.session import engine\n"
+        "from app.db.base import Base\n"
+        "import app.models\n"
+        "from app.models.trip import Bus, OccupancyLevel, Route, Trip, TripStatus\n"
+        "from app.models.user import User, UserRole\n"
+        "Base.metadata.create_all(bind=engine)\n"
+        f"buses = {buses}\n"
+        "with engine.begin() as conn:\n"
+        "    conn.execute(Route.__table__.insert(), [{'id': 1, 'name': 'Route 1', 'is_active': True}])\n"
+        "    conn.execute(User.__table__.insert(), [{'id': b, 'email': f'driver{b}@example.com', 'password_hash': 'x',\n"
+        "        'role': UserRole.DRIVER, 'name': f'Driver {b}', 'is_active': True} for b in range(1, buses + 1)])\n"
+        "    conn.execute(Bus.__table__.insert(), [{'id': b, 'bus_number': f'BENCH-{b}', 'route_id': 1, 'is_active': True,\n"
+        "        'current_latitude': 26.8467, 'current_longitude': 80.9462, 'speed': 0.0,\n"
+        "        'occupancy': OccupancyLevel.LOW} for b in range(1, buses + 1)])\n"
+        "    conn.execute(Trip.__table__.insert(), [{'trip_id': f'bench_{b}', 'driver_id': b, 'bus_id': b,\n"
+        "        'route_id': 1, 'status': TripStatus.ACTIVE} for b in range(1, buses + 1)])\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_server(port: int, env: dict, log_path: str) -> subprocess.Popen:
+    """Launch uvicorn serving app.main:asgi on localhost"""
+    log_file = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:asgi",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited early, see {log_path}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return proc
+        except Exception:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"Server did not become healthy, see {log_path}")
+
+
+class Stats:
+    """Latency / delivery counters shared by all benchmark clients"""
+
+    def __init__(self):
+        self.latencies = []
+        self.sent = 0
+        self.received = 0
+        self.recording = False
+
+    def on_location(self, data):
+        if not self.recording or not isinstance(data, dict) or "sent_at" not in data:
+            return
+        self.received += 1
+        self.latencies.append(time.time() - data["sent_at"])
+
+
+async def connect_listener(url: str, room: str, user_id: int, stats: Stats):
+    import socketio
+
+    client = socketio.AsyncClient(reconnection=False)
+    client.on("bus:location", stats.on_location)
+    await client.connect(url, transports=["websocket"])
+    await client.emit("join_room", {"user_type": room, "user_id": user_id, "timestamp": time.time()})
+    return client
+
+
+async def drive_bus(client, bus_id: int, interval: float, stop_at: float, stats: Stats, center):
+    lat = center[0] + random.uniform(-0.05, 0.05)
+    lng = center[1] + random.uniform(-0.05, 0.05)
+    # Spread buses over the interval so fixes do not arrive in lock-step
+    await asyncio.sleep(random.uniform(0, interval))
+    while time.time() < stop_at:
+        lat += random.uniform(-0.0005, 0.0005)
+        lng += random.uniform(-0.0005, 0.0005)
+        await client.emit("driver_location_update", {
+            "bus_id": bus_id,
+            "latitude": lat,
+            "longitude": lng,
+            "speed": random.uniform(10, 40),
+            "heading": random.uniform(0, 360),
+            "sent_at": time.time(),
+        })
+        if stats.recording:
+            stats.sent += 1
+        await asyncio.sleep(interval)
+
+
+async def run_benchmark(args, url: str, server_pid: int):
+    import socketio
+
+    stats = Stats()
+    rooms = [r.strip() for r in args.rooms.split(",") if r.strip()]
+
+    print(f"🔌 Connecting {args.clients} listeners to rooms {rooms} ...")
+    listeners = []
+    for start in range(0, args.clients, args.connect_batch):
+        batch = [
+            connect_listener(url, rooms[i % len(rooms)], i, stats)
+            for i in range(start, min(start + args.connect_batch, args.clients))
+        ]
+        listeners.extend(await asyncio.gather(*batch))
+
+    from app.core.security import create_access_token
+
+    drivers = []
+    for bus_id in range(1, args.buses + 1):
+        client = socketio.AsyncClient(reconnection=False)
+        await client.connect(url, transports=["websocket"], auth={"token": create_access_token(bus_id)})
+        drivers.append(client)
+
+    # Let connection churn settle before measuring
+    await asyncio.sleep(1.0)
+
+    cpu_start = read_proc_cpu_seconds(server_pid)
+    rss_start = read_proc_rss_mb(server_pid)
+    rss_peak = rss_start
+    wall_start = time.time()
+    stop_at = wall_start + args.duration
+    stats.recording = True
+
+    print(f"🚌 Driving {args.buses} buses every {args.interval}s for {args.duration}s ...")
+    tasks = [
+        asyncio.create_task(drive_bus(drivers[i], i + 1, args.interval, stop_at, stats, (args.lat, args.lng)))
+        for i in range(args.buses)
+    ]
+    while time.time() < stop_at:
+        await asyncio.sleep(0.5)
+        rss_peak = max(rss_peak, read_proc_rss_mb(server_pid))
+    await asyncio.gather(*tasks)
+
+    # Allow in-flight deliveries to drain before sampling
+    await asyncio.sleep(args.drain)
+    stats.recording = False
+    wall = time.time() - wall_start
+    cpu = read_proc_cpu_seconds(server_pid) - cpu_start
+    rss_end = read_proc_rss_mb(server_pid)
+
+    for client in listeners + drivers:
+        await client.disconnect()
+
+    receiving = sum(1 for i in range(args.clients) if rooms[i % len(rooms)] in ("commuters", "authority"))
+    expected = stats.sent * receiving
+    latencies = sorted(stats.latencies)
+
+    print()
+    print("📊 Socket fan-out results")
+    print(f"   listeners:            {args.clients} ({receiving} in broadcast rooms)")
+    print(f"   simulated buses:      {args.buses}")
+    print(f"   location updates:     {stats.sent} ({stats.sent / wall:.1f}/s)")
+    print(f"   deliveries:           {stats.received} of {expected} expected "
+          f"({(100.0 * stats.received / expected) if expected else 0:.1f}%)")
+    print(f"   emit throughput:      {stats.received / wall:.1f} msgs/s")
+    if latencies:
+        print(f"   latency p50/p90/p99:  {percentile(latencies, 50) * 1000:.1f} / "
+              f"{percentile(latencies, 90) * 1000:.1f} / {percentile(latencies, 99) * 1000:.1f} ms")
+        print(f"   latency mean/max:     {statistics.mean(latencies) * 1000:.1f} / {latencies[-1] * 1000:.1f} ms")
+    print(f"   server CPU:           {cpu:.2f}s ({100.0 * cpu / wall:.1f}% of one core)")
+    print(f"   server RSS:           start {rss_start:.1f} MiB, peak {rss_peak:.1f} MiB, end {rss_end:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Socket.IO fan-out load benchmark")
+    parser.add_argument("--clients", type=int, default=200, help="number of listening sockets (N)")
+    parser.add_argument("--buses", type=int, default=50, help="number of simulated buses (M)")
+    parser.add_argument("--rooms", default="commuters", help="comma-separated rooms listeners join round-robin")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between fixes per bus")
+    parser.add_argument("--duration", type=float, default=20.0, help="measurement window in seconds")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for in-flight deliveries")
+    parser.add_argument("--connect-batch", type=int, default=50, help="listeners connected concurrently")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="benchmark an already running server instead of booting one")
+    parser.add_argument("--pid", type=int, help="server PID for CPU/RSS sampling when using --url")
+    parser.add_argument("--lat", type=float, default=26.8467)
+    parser.add_argument("--lng", type=float, default=80.9462)
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.pid:
+            parser.error("--pid is required with --url")
+        asyncio.run(run_benchmark(args, args.url, args.pid))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="saarthi_fanout_")
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    log_path = os.path.join(workdir, "server.log")
+
+    prepare_database(env, args.buses)
+    print(f"🚀 Starting server on 127.0.0.1:{args.port} (log: {log_path})")
+    server = start_server(args.port, env, log_path)
+    try:
+        asyncio.run(run_benchmark(args, f"http://127.0.0.1:{args.port}", server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
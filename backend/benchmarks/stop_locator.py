@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Nearest-stop / next-stop benchmark: per-bus Python loop vs the vectorized locator
+
+Builds synthetic routes (default 100 routes x 50 stops) and places 5,000 buses
+along them, then times the old double loop against `locate_buses`.
+
+Example:
+
+    python benchmarks/stop_locator.py --buses 5000 --stops 50
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services.route_stops import RouteStops
+from app.services.spatial_index import haversine_m
+from app.services.stop_locator import locate_buses, pack_routes
+
+
+def build_routes(route_count: int, stops_per_route: int, center=(26.8467, 80.9462)):
+    routes = []
+    for route_id in range(1, route_count + 1):
+        lat = center[0] + random.uniform(-0.2, 0.2)
+        lng = center[1] + random.uniform(-0.2, 0.2)
+        bearing = random.uniform(0, 2 * math.pi)
+        lats, lngs = [], []
+        for _ in range(stops_per_route):
+            lats.append(lat)
+            lngs.append(lng)
+            bearing += random.uniform(-0.4, 0.4)
+            step = random.uniform(300, 800) / 111320.0
+            lat += step * math.cos(bearing)
+            lng += step * math.sin(bearing) / math.cos(math.radians(lat))
+        routes.append(RouteStops(
+            route_id=route_id,
+            route_name=f"Route {route_id}",
+            stop_ids=np.arange(stops_per_route, dtype=np.int64) + route_id * 1000,
+            names=tuple(f"R{route_id} Stop {i}" for i in range(stops_per_route)),
+            latitudes=np.array(lats),
+            longitudes=np.array(lngs),
+        ))
+    return routes
+
+
+def place_buses(routes, bus_count: int):
+    buses = []
+    for _ in range(bus_count):
+        route = random.choice(routes)
+        i = random.randrange(len(route) - 1)
+        t = random.random()
+        lat = route.latitudes[i] + t * (route.latitudes[i + 1] - route.latitudes[i]) + random.gauss(0, 0.0001)
+        lng = route.longitudes[i] + t * (route.longitudes[i + 1] - route.longitudes[i]) + random.gauss(0, 0.0001)
+        buses.append((float(lat), float(lng), route))
+    return buses
+
+
+def python_loop(buses):
+    """The original per-bus / per-stop loop, with haversine distances"""
+    result = []
+    for lat, lng, route in buses:
+        lats = route.latitudes.tolist()
+        lngs = route.longitudes.tolist()
+        best, best_i = float("inf"), 0
+        for i in range(len(lats)):
+            d = haversine_m(lat, lng, lats[i], lngs[i])
+            if d < best:
+                best, best_i = d, i
+        result.append((best_i, best_i + 1 if best_i + 1 < len(lats) else -1))
+    return result
+
+
+def best_of(repeat: int, fn):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest/next stop benchmark")
+    parser.add_argument("--buses", type=int, default=5000)
+    parser.add_argument("--stops", type=int, default=50, help="stops per route")
+    parser.add_argument("--routes", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    routes = build_routes(args.routes, args.stops)
+    buses = place_buses(routes, args.buses)
+    lats = np.array([b[0] for b in buses])
+    lngs = np.array([b[1] for b in buses])
+
+    pack_time, packed = best_of(args.repeat, lambda: pack_routes(routes))
+    rows = packed.rows(b[2].route_id for b in buses)
+
+    loop_time, loop_result = best_of(max(1, args.repeat // 2), lambda: python_loop(buses))
+    kernel_time, located = best_of(args.repeat, lambda: locate_buses(lats, lngs, rows, packed))
+
+    agree = sum(1 for i, (nearest, _) in enumerate(loop_result) if nearest == located.nearest[i])
+
+    print(f"📊 {args.buses} buses x {args.stops} stops ({args.routes} routes)")
+    print(f"   python loop:        {loop_time * 1000:8.1f} ms")
+    print(f"   vectorized locate:  {kernel_time * 1000:8.1f} ms  ({loop_time / kernel_time:.0f}x faster)")
+    print(f"   pack routes (once per catalog change): {pack_time * 1000:.1f} ms")
+    print(f"   nearest-stop agreement with haversine loop: {100.0 * agree / len(buses):.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Stop search benchmark: autocomplete latency of the in-memory stop index
+
+Builds a synthetic catalog (default 20,000 stops with random facilities) and
+times keystroke-by-keystroke prefix queries, multi-word queries, misspellings
+(trigram fallback) and facility filters, plus the index build itself, which
+runs at startup and after each stop change.
+
+Example:
+
+    python benchmarks/stop_search.py --stops 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.stop_search import StopEntry, StopSearchIndex
+
+AREAS = ["Aminabad", "Alambagh", "Charbagh", "Hazratganj", "Gomti Nagar", "Indira Nagar", "Vikas Nagar",
+         "Kapoorthala", "Lalbagh", "Mahanagar", "Nishatganj", "Rajajipuram", "Chowk", "Aliganj"]
+FEATURES = ["Central", "Market", "Gate", "Chauraha", "Road", "Colony", "Station", "Park", "Crossing",
+            "Bazaar", "Metro", "Sector", "Depot", "Hospital"]
+FACILITIES = ["shelter", "wifi", "ticket_counter", "ramp", "toilet", "cctv"]
+
+QUERIES = [
+    ("first keystroke", "c", ()),
+    ("second keystroke", "ch", ()),
+    ("word prefix", "charb", ()),
+    ("full word", "charbagh", ()),
+    ("two words", "gomti nagar sec", ()),
+    ("later word only", "hospital", ()),
+    ("misspelled", "hazratgnj", ()),
+    ("prefix + facility", "ali", ("wifi",)),
+    ("facilities only", "", ("shelter", "ramp")),
+]
+
+
+def build_stops(count: int):
+    return [
+        StopEntry(
+            source="graph",
+            stop_id=str(i),
+            name=f"{random.choice(AREAS)} {random.choice(FEATURES)} {random.randrange(1, 40)}",
+            latitude=26.85 + random.uniform(-0.2, 0.2),
+            longitude=80.95 + random.uniform(-0.2, 0.2),
+            facilities=tuple(random.sample(FACILITIES, random.randrange(len(FACILITIES)))),
+        )
+        for i in range(count)
+    ]
+
+
+def median_of(repeat: int, fn):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stop search benchmark")
+    parser.add_argument("--stops", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=101)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    stops = build_stops(args.stops)
+    build_time, index = median_of(3, lambda: StopSearchIndex(stops))
+
+    print(f"📊 {args.stops} stops, {len(FACILITIES)} facilities (limit {args.limit})")
+    print(f"   index build (startup / stop change): {build_time * 1000:.0f} ms")
+    for label, query, facilities in QUERIES:
+        latency, results = median_of(args.repeat, lambda: index.search(query, facilities, args.limit))
+        top = results[0].name if results else "-"
+        filters = f" [{','.join(facilities)}]" if facilities else ""
+        print(f"   {label + ':':<19}{f'{query!r}{filters}':<28}{latency * 1e6:7.0f} µs  {len(results):2d} hits, top {top!r}")
+
+
+if __name__ == "__main__":
+    main()
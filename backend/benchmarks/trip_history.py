@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Trip history benchmark: per-row name lookups vs the joined, column-projected query
+
+Builds a SQLite trips table (default 1,000,000 trips over 200 routes and
+2,000 drivers, with the pagination indexes) and times a 50-row history page:
+
+- before: ORM `Trip` rows, then a route and a driver lookup per row (N+1)
+- joined: one trips ⋈ routes ⋈ users query selecting only listed columns
+- joined, one driver / one route / a date range
+- deep page: OFFSET at half the table vs a keyset cursor at the same depth
+
+Example:
+
+    python benchmarks/trip_history.py --trips 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.pagination import encode_cursor, keyset_page
+from app.db.base import Base
+from app.models.trip import Route, Trip, TripStatus
+from app.models.user import User, UserRole
+from app.services.trip_history import trip_history_item, trip_history_query
+
+PAGE = 50
+
+
+def build_database(trips: int, routes: int, drivers: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Route.__table__.insert(), [
+            {"id": r, "name": f"Route {r} Charbagh - Gomti Nagar", "is_active": True} for r in range(1, routes + 1)
+        ])
+        conn.execute(User.__table__.insert(), [
+            {"id": d, "email": f"driver{d}@example.com", "password_hash": "x", "role": UserRole.DRIVER,
+             "name": f"Driver {d} Kumar", "is_active": True}
+            for d in range(1, drivers + 1)
+        ])
+        moment = start
+        chunk = []
+        for i in range(1, trips + 1):
+            moment += timedelta(seconds=random.randrange(1, 60))
+            chunk.append({
+                "id": i,
+                "trip_id": f"trip_{i:08x}",
+                "driver_id": random.randrange(1, drivers + 1),
+                "route_id": random.randrange(1, routes + 1),
+                "status": TripStatus.COMPLETED,
+                "start_time": moment,
+                "end_time": moment + timedelta(minutes=random.randrange(20, 90)),
+                "distance_traveled": random.uniform(5, 40),
+            })
+            if len(chunk) == 50_000:
+                conn.execute(Trip.__table__.insert(), chunk)
+                chunk = []
+        if chunk:
+            conn.execute(Trip.__table__.insert(), chunk)
+        conn.execute(text("ANALYZE"))
+    return engine, start, moment
+
+
+def median_of(repeat: int, fn):
+    timings = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trip history benchmark")
+    parser.add_argument("--trips", type=int, default=1_000_000)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--drivers", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=21)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    started = time.perf_counter()
+    engine, first, last = build_database(args.trips, args.routes, args.drivers)
+    print(f"📊 {args.trips:,} trips, {args.routes} routes, {args.drivers} drivers "
+          f"(built in {time.perf_counter() - started:.0f} s); {PAGE}-row pages")
+
+    queries = [0]
+    event.listen(engine, "before_cursor_execute", lambda *a: queries.__setitem__(0, queries[0] + 1))
+    Session = sessionmaker(bind=engine)
+
+    def before():
+        db = Session()
+        try:
+            items = []
+            for trip in db.query(Trip).order_by(Trip.start_time.desc()).limit(PAGE).all():
+                route = db.query(Route).filter(Route.id == trip.route_id).first()
+                driver = db.query(User).filter(User.id == trip.driver_id).first()
+                items.append((trip.id, route.name, driver.name, trip.distance_traveled))
+            return items
+        finally:
+            db.close()
+
+    def joined(*filters, cursor=None):
+        db = Session()
+        try:
+            rows, _ = keyset_page(trip_history_query(db).filter(*filters), (Trip.start_time, Trip.id),
+                                  cursor, PAGE, descending=True)
+            return [trip_history_item(row) for row in rows]
+        finally:
+            db.close()
+
+    def offset_page(depth):
+        db = Session()
+        try:
+            rows = (trip_history_query(db).order_by(Trip.start_time.desc(), Trip.id.desc())
+                    .offset(depth).limit(PAGE).all())
+            return [trip_history_item(row) for row in rows]
+        finally:
+            db.close()
+
+    depth = args.trips // 2
+    with engine.connect() as conn:
+        anchor = conn.execute(
+            text("SELECT start_time, id FROM trips ORDER BY start_time DESC, id DESC LIMIT 1 OFFSET :n"), {"n": depth - 1}
+        ).one()
+    cursor = encode_cursor([datetime.fromisoformat(str(anchor[0])), anchor[1]])
+    window = last - (last - first) / 3
+
+    cases = [
+        ("before (N+1 lookups)", before),
+        ("joined", lambda: joined()),
+        ("joined, one driver", lambda: joined(Trip.driver_id == 42)),
+        ("joined, one route", lambda: joined(Trip.route_id == 7)),
+        ("joined, date range", lambda: joined(Trip.start_time >= window - timedelta(days=7), Trip.start_time < window)),
+        (f"OFFSET {depth:,}", lambda: offset_page(depth)),
+        (f"cursor at {depth:,}", lambda: joined(cursor=cursor)),
+    ]
+    for label, fn in cases:
+        queries[0] = 0
+        fn()
+        per_call = queries[0]
+        latency, rows = median_of(args.repeat, fn)
+        print(f"   {label + ':':<26}{latency * 1000:8.2f} ms  {per_call:3d} queries  {len(rows)} rows")
+
+
+if __name__ == "__main__":
+    main()
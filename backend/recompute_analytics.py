@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script to recount the analytics counters from the trips, buses and feedbacks tables
+(after seeding or any other writes that bypass the API) and to rebuild the on-time
+rollups from the stored stop arrivals
+"""
+import argparse
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.session import SessionLocal
+from app.services.analytics import recompute_counters
+from app.services.ontime import recompute_rollups
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute analytics counters and on-time rollups")
+    parser.add_argument("--ontime-days", type=int, default=30, help="UTC days of on-time rollups to rebuild (0 to skip)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        counts = recompute_counters(db)
+        for name, value in counts.items():
+            print(f"   {name}: {value}")
+        print("✅ Analytics counters recomputed")
+        if args.ontime_days > 0:
+            now = datetime.utcnow()
+            scored = recompute_rollups(db, now - timedelta(days=args.ontime_days - 1), now)
+            print(f"✅ On-time rollups rebuilt for the last {args.ontime_days} days ({scored} arrivals scored)")
+    except Exception as e:
+        print(f"❌ Error recomputing analytics: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
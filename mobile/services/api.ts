@@ -43,6 +43,20 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints return pages (100 items by default); follow X-Next-Cursor
+// until the last page and return the first response with every item as data
+export async function getAllPages(url: string, params: Record<string, unknown> = {}): Promise<AxiosResponse> {
+  const first = await api.get(url, { params: { ...params, limit: 500 } });
+  const items = [...first.data];
+  let cursor: string | undefined = first.headers['x-next-cursor'];
+  while (cursor) {
+    const res = await api.get(url, { params: { ...params, limit: 500, cursor } });
+    items.push(...res.data);
+    cursor = res.headers['x-next-cursor'];
+  }
+  return { ...first, data: items };
+}
+
 // API endpoints - conditionally use mock or real backend
 export const apiEndpoints = {
   // Auth endpoints
@@ -117,7 +131,7 @@ export const apiEndpoints = {
   getAllBuses: () =>
     USE_MOCK_API 
       ? mockApiEndpoints.getNearbyBuses()
-      : api.get('/api/v1/authority/buses/all'),
+      : getAllPages('/api/v1/authority/buses/all'),
   
   getAnalytics: (dateRange?: { start: string; end: string }) =>
     USE_MOCK_API 